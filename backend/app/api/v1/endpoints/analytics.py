@@ -3,6 +3,7 @@ import uuid
 from models.ai_models_model import AiModels
 from models.request_model import AiModel
 from services.management_service import ManagementService
+from core.metrics import all_cache_stats, all_pool_stats
 from fastapi import APIRouter, Depends, HTTPException, Query
 from dependencies.auth_dependencies import get_current_user
 
@@ -104,3 +105,13 @@ async def get_analytics_home_data(
         return await management_service.get_analytics_home_data()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/cache_stats", response_model=List[Dict[str, Any]])
+async def get_cache_stats():
+    return all_cache_stats()
+
+
+@router.get("/pool_stats", response_model=List[Dict[str, Any]])
+async def get_pool_stats():
+    return all_pool_stats()
@@ -26,6 +26,23 @@ async def upload_document(
         raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
 
 
+@router.post("/attach")
+async def attach_document(
+    file_id: uuid.UUID,
+    chat_id: Optional[uuid.UUID] = Query(None),
+    payload: dict = Depends(get_current_user),
+    document_service: DocumentService = Depends(get_doc_service),
+):
+    try:
+        return await document_service.attach_file(
+            user_id=uuid.UUID(payload["user_id"]), file_id=file_id, chat_id=chat_id
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"File attach failed: {str(e)}")
+
+
 @router.get("/files")
 async def get_all_files(
     payload: dict = Depends(get_current_user),
@@ -0,0 +1,161 @@
+"""
+Throughput of BestMatchService: the previous per-candidate scorer
+(SequenceMatcher + fuzzywuzzy, one candidate at a time) against the batch
+scorer (rapidfuzz cdist over all candidates at once).
+
+Synthetic media titles (random words, some with a year, a share carrying
+media_type) are scored against queries drawn from them. Reports candidates per
+second for each scorer and how often both pick the same best match, plus the
+largest difference between the two among scores that reach the match
+threshold, since the batch scorer approximates SequenceMatcher with the Indel
+ratio.
+
+Run from backend/app:
+    python -m benchmarks.best_match --candidates 10000 --queries 20
+"""
+
+import argparse
+import asyncio
+import random
+import re
+from difflib import SequenceMatcher
+from typing import List, Tuple
+import numpy as np
+from fuzzywuzzy import fuzz
+from benchmarks.common import timer
+from utils.best_match import NO_MEDIA_TYPE, BestMatchService, QueryFeatures
+
+WORDS = [
+    "the", "dark", "night", "return", "of", "king", "star", "wars", "empire",
+    "strikes", "back", "lost", "city", "ocean", "fire", "blood", "moon", "rising",
+    "house", "dragon", "game", "thrones", "breaking", "bad", "better", "call",
+    "saul", "office", "friends", "matrix", "reloaded", "revolutions", "alien",
+]  # fmt: skip
+STOPWORDS = {"a", "an", "the", "and", "or", "but", "of", "in", "on", "at", "to", "for", "with", "by"}  # fmt: skip
+
+
+def legacy_scores(query: str, search_results: list, media_type) -> List[float]:
+    """
+    Per-candidate similarity of BestMatchService.find_match before batching.
+    """
+    query = query.lower().strip()
+    query_words = set(re.findall(r"\b\w+\b", query))
+    scores = []
+    for item in search_results:
+        title = item["title"].lower()
+        title_words = set(re.findall(r"\b\w+\b", title))
+        seq_similarity = SequenceMatcher(None, query, title).ratio()
+        fuzz_similarity = fuzz.ratio(query, title) / 100.0
+        token_similarity = fuzz.token_sort_ratio(query, title) / 100.0
+        word_overlap = len(query_words.intersection(title_words))
+        word_overlap_ratio = word_overlap / len(query_words) if query_words else 0
+        core_query_words = [
+            w for w in query_words if w not in STOPWORDS and len(w) > 2
+        ]
+        core_title_words = [
+            w for w in title_words if w not in STOPWORDS and len(w) > 2
+        ]
+        if not core_query_words:
+            core_match_ratio = seq_similarity
+        else:
+            core_matches = sum(1 for w in core_query_words if w in core_title_words)
+            core_match_ratio = core_matches / len(core_query_words)
+        similarity = (
+            seq_similarity * 0.2
+            + fuzz_similarity * 0.2
+            + token_similarity * 0.3
+            + word_overlap_ratio * 0.1
+            + core_match_ratio * 0.2
+        )
+        if "media_type" in item and item["media_type"] == str(media_type):
+            similarity *= 1.2
+        elif (
+            "media_type" not in item
+            and media_type == 1
+            and similarity > 0.0
+            and re.search(r"\b\d{4}\b", item["title"])
+        ):
+            similarity *= 1.2
+        if query in title:
+            similarity *= 1.3
+        len_ratio = min(len(query), len(title)) / max(len(query), len(title))
+        if len_ratio < 0.5:
+            similarity *= 0.9
+        for word in query_words:
+            if word not in title and similarity > 0.3:
+                similarity *= 0.5
+        if "showbox" in title_words:
+            similarity *= 1.01
+        scores.append(similarity)
+    return scores
+
+
+def make_candidates(rng: random.Random, count: int) -> list:
+    items = []
+    for i in range(count):
+        title = " ".join(rng.choices(WORDS, k=rng.randint(1, 6)))
+        if rng.random() < 0.3:
+            title += f" ({rng.randint(1950, 2025)})"
+        item = {"title": title.title(), "url": f"https://example.com/{i}"}
+        if rng.random() < 0.5:
+            item["media_type"] = str(rng.randint(1, 2))
+        items.append(item)
+    return items
+
+
+def make_queries(
+    rng: random.Random, candidates: list, count: int
+) -> List[Tuple[str, int]]:
+    queries = []
+    for _ in range(count):
+        words = candidates[rng.randrange(len(candidates))]["title"].split()
+        query = " ".join(words[: rng.randint(1, len(words))])
+        queries.append((query, rng.randint(1, 2)))
+    return queries
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    candidates = make_candidates(rng, args.candidates)
+    queries = make_queries(rng, candidates, args.queries)
+    titles = [item["title"].lower() for item in candidates]
+    media_types = [item.get("media_type", NO_MEDIA_TYPE) for item in candidates]
+
+    agree, worst_diff = 0, 0.0
+    legacy_seconds = batch_seconds = 0.0
+    for query, media_type in queries:
+        with timer() as elapsed:
+            old = legacy_scores(query, candidates, media_type)
+        legacy_seconds += elapsed[0]
+        with timer() as elapsed:
+            new = BestMatchService.score_titles(
+                QueryFeatures(query), titles, media_types, media_type
+            )
+        batch_seconds += elapsed[0]
+        old_best, new_best = int(np.argmax(old)), int(np.argmax(new))
+        # Same pick, or an equally scored one under the old scorer
+        agree += old_best == new_best or old[new_best] == old[old_best]
+        old = np.asarray(old)
+        # Scores that can decide a match; below the threshold, a small difference
+        # may flip the 0.3 keyword penalty without changing any result
+        relevant = np.maximum(old, new) >= args.threshold
+        if relevant.any():
+            worst_diff = max(worst_diff, float(np.max(np.abs(old - new)[relevant])))
+
+    scored = args.candidates * len(queries)
+    print(f"{args.candidates} candidates x {len(queries)} queries")
+    print(f"legacy  {scored / legacy_seconds:>12,.0f} candidates/s")
+    print(f"batch   {scored / batch_seconds:>12,.0f} candidates/s")
+    print(
+        f"same best match for {agree}/{len(queries)} queries, "
+        f"max score difference {worst_diff:.4f} (scores >= {args.threshold})"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--candidates", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--threshold", type=float, default=0.4)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,79 @@
+"""
+Rows/sec for persisting the chunks of one large document.
+
+Compares the old ORM path (session.add_all + flush) with the COPY path used by
+DocumentService. Everything runs in a transaction that is rolled back.
+
+Run from backend/app against a database initialised by the app:
+    python -m benchmarks.bulk_insert --rows 50000
+"""
+
+import argparse
+import asyncio
+import random
+from core.database import AsyncSessionLocal, PostgreSQLDatabase
+from models.document_chunk_model import DocumentChunk
+from repositories.document_chunk_repository import DocumentChunkRepository
+from services.document_service import COPY_BATCH_ROWS
+from benchmarks.common import (
+    create_scratch_document,
+    random_text,
+    random_vector,
+    timer,
+)
+
+
+async def run_orm(rows: list[dict]) -> float:
+    async with AsyncSessionLocal() as session:
+        _, _, file_id = await create_scratch_document(session)
+        keys = {"file_id": file_id}
+        with timer() as elapsed:
+            session.add_all(DocumentChunk(**keys, **row) for row in rows)
+            await session.flush()
+        await session.rollback()
+    return elapsed[0]
+
+
+async def run_copy(rows: list[dict]) -> float:
+    async with AsyncSessionLocal() as session:
+        _, _, file_id = await create_scratch_document(session)
+        keys = {"file_id": file_id}
+        with timer() as elapsed:
+            for start in range(0, len(rows), COPY_BATCH_ROWS):
+                batch = rows[start : start + COPY_BATCH_ROWS]
+                await DocumentChunkRepository.copy_rows(
+                    session, [{**keys, **row} for row in batch]
+                )
+        await session.rollback()
+    return elapsed[0]
+
+
+async def main(row_count: int, seed: int):
+    await PostgreSQLDatabase.initialize()
+    rng = random.Random(seed)
+    rows = [
+        {
+            "ordinal": ordinal,
+            "chunk_metadata": {},
+            "content": random_text(rng),
+            "embedding": random_vector(rng),
+        }
+        for ordinal in range(row_count)
+    ]
+    try:
+        for name, runner in (("orm add_all", run_orm), ("copy", run_copy)):
+            seconds = await runner(rows)
+            print(
+                f"{name:<12} {row_count} rows in {seconds:.2f}s "
+                f"-> {row_count / seconds:,.0f} rows/sec"
+            )
+    finally:
+        await PostgreSQLDatabase.close_all_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.seed))
@@ -0,0 +1,75 @@
+# benchmarks/common.py
+import pickle
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.config import settings
+from models.users_model import Users
+from models.chat_history_model import ChatHistory
+from models.user_document_model import UserDocument
+from models.stored_file_model import StoredFile
+
+
+@contextmanager
+def timer() -> Iterator[List[float]]:
+    """
+    Yields a one-element list that holds the elapsed seconds once the block exits.
+    """
+    elapsed = [0.0]
+    start = time.perf_counter()
+    try:
+        yield elapsed
+    finally:
+        elapsed[0] = time.perf_counter() - start
+
+
+def random_vector(rng: random.Random, dimensions: int = settings.EMBEDDING_DIMENSIONS):
+    return [rng.uniform(-1.0, 1.0) for _ in range(dimensions)]
+
+
+def random_text(rng: random.Random, length: int = 512) -> str:
+    words = ["alpha", "beta", "gamma", "delta", "invoice", "contract", "clause"]
+    text = []
+    while sum(len(w) + 1 for w in text) < length:
+        text.append(rng.choice(words))
+    return " ".join(text)[:length]
+
+
+async def create_scratch_document(
+    session: AsyncSession,
+) -> Tuple[uuid.UUID, uuid.UUID, uuid.UUID]:
+    """
+    Insert a throwaway user -> chat -> stored file chain inside the caller's
+    transaction. Benchmarks roll the transaction back when they are done.
+
+    Returns:
+        (user_id, chat_id, file_id)
+    """
+    user = Users(email=f"bench-{uuid.uuid4()}@example.com", first_name="bench")
+    session.add(user)
+    await session.flush()
+    chat = ChatHistory(
+        user_id=user.user_id, history_blob=pickle.dumps({}), chat_title="bench"
+    )
+    session.add(chat)
+    await session.flush()
+    stored_file = StoredFile(
+        user_id=user.user_id,
+        content_digest=uuid.uuid4().hex,
+        file_name="bench.txt",
+    )
+    session.add(stored_file)
+    await session.flush()
+    session.add(
+        UserDocument(
+            user_id=user.user_id,
+            chat_id=chat.chat_id,
+            file_id=stored_file.file_id,
+            file_name="bench.txt",
+        )
+    )
+    await session.flush()
+    return user.user_id, chat.chat_id, stored_file.file_id
@@ -0,0 +1,128 @@
+"""
+Recall and latency of per-chat vector search as the total corpus grows.
+
+For every corpus size the benchmark spreads chunks over many scratch chats,
+then queries one chat at a time with:
+  - exact:      filter-first exact search (also the ground truth)
+  - hnsw:       HNSW with iterative scan and the configured ef_search
+  - hnsw-post:  HNSW with iterative scan off (the old global-index plan)
+
+Everything runs inside one transaction that is rolled back.
+
+Run from backend/app against a database initialised by the app:
+    python -m benchmarks.filtered_search --sizes 10000 100000 --per-chat 2000
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import numpy as np
+from sqlalchemy import text
+from core.config import settings
+from core.database import AsyncSessionLocal, PostgreSQLDatabase
+from models.document_chunk_model import DocumentChunk
+from repositories.document_chunk_repository import DocumentChunkRepository
+from services.document_service import COPY_BATCH_ROWS, DocumentService
+from benchmarks.common import create_scratch_document, timer
+
+
+def clustered_vectors(rng: np.random.Generator, count: int, dimensions: int):
+    """
+    Unit vectors drawn around a handful of centres, so neighbours are meaningful.
+    """
+    centres = rng.standard_normal((16, dimensions))
+    vectors = centres[rng.integers(0, 16, count)] + 0.3 * rng.standard_normal(
+        (count, dimensions)
+    )
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def search(session, service, query, filters, top_k, exact):
+    stmt = service._vector_search_stmt(query, top_k, filters, exact)
+    with timer() as elapsed:
+        rows = (await session.execute(stmt)).all()
+    return [row.chunk_id for row in rows], elapsed[0]
+
+
+async def run_size(total, per_chat, queries, top_k, seed):
+    service = DocumentService()
+    rng = np.random.default_rng(seed)
+    dimensions = settings.EMBEDDING_DIMENSIONS
+    async with AsyncSessionLocal() as session:
+        files = []
+        for _ in range(max(total // per_chat, 1)):
+            _, _, file_id = await create_scratch_document(session)
+            files.append(file_id)
+            vectors = clustered_vectors(rng, per_chat, dimensions)
+            rows = [
+                {
+                    "file_id": file_id,
+                    "ordinal": i,
+                    "chunk_metadata": {},
+                    "content": f"chunk {i}",
+                    "embedding": vector,
+                }
+                for i, vector in enumerate(vectors)
+            ]
+            for start in range(0, len(rows), COPY_BATCH_ROWS):
+                await DocumentChunkRepository.copy_rows(
+                    session, rows[start : start + COPY_BATCH_ROWS]
+                )
+        await session.execute(text("ANALYZE document_chunks"))
+
+        await session.execute(
+            text("SELECT set_config('hnsw.ef_search', :value, true)"),
+            {"value": str(settings.HNSW_EF_SEARCH)},
+        )
+        latencies = {"exact": [], "hnsw": [], "hnsw-post": []}
+        recalls = {"hnsw": [], "hnsw-post": []}
+        picker = random.Random(seed)
+        for _ in range(queries):
+            filters = (DocumentChunk.file_id.in_([picker.choice(files)]),)
+            query = clustered_vectors(rng, 1, dimensions)[0].tolist()
+
+            truth, seconds = await search(session, service, query, filters, top_k, True)
+            latencies["exact"].append(seconds)
+            for plan, mode in (
+                ("hnsw", settings.HNSW_ITERATIVE_SCAN or "relaxed_order"),
+                ("hnsw-post", "off"),
+            ):
+                await session.execute(
+                    text("SELECT set_config('hnsw.iterative_scan', :value, true)"),
+                    {"value": mode},
+                )
+                found, seconds = await search(
+                    session, service, query, filters, top_k, False
+                )
+                latencies[plan].append(seconds)
+                recalls[plan].append(len(set(found) & set(truth)) / max(len(truth), 1))
+        await session.rollback()
+
+    for plan, samples in latencies.items():
+        samples.sort()
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        recall = statistics.mean(recalls[plan]) if plan in recalls else 1.0
+        print(
+            f"{total:>9} chunks  {plan:<10} recall@{top_k}={recall:.3f}  "
+            f"p50={statistics.median(samples) * 1000:.1f}ms  p99={p99 * 1000:.1f}ms"
+        )
+
+
+async def main(args):
+    await PostgreSQLDatabase.initialize()
+    try:
+        for total in args.sizes:
+            await run_size(total, args.per_chat, args.queries, args.top_k, args.seed)
+    finally:
+        await PostgreSQLDatabase.close_all_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--per-chat", type=int, default=2_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,196 @@
+"""
+HTML extraction: the previous inline BeautifulSoup("html.parser") converter
+against utils.html_extract (lxml, main-content extraction, off-loop).
+
+For every page of the corpus (saved pages from --pages, *.html / *.htm, or
+synthetic pages of --synthetic-sizes characters with a nav bar, sidebar, link
+footer and article body) the benchmark reports:
+
+  per-page   p50/p99 conversion time of each implementation, run inline
+  output     total Markdown characters produced (nav links dropped -> smaller)
+  loop lag   worst event-loop stall while all pages are converted and split
+             concurrently: legacy runs on the loop, as crawl_url_list used to;
+             the new path goes through extract_page_chunks (thread / worker
+             processes)
+
+Run from backend/app:
+    python -m benchmarks.html_extract --pages ~/saved-pages
+    python -m benchmarks.html_extract --synthetic-sizes 20000 500000 2000000
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from pathlib import Path
+from typing import List, Tuple
+from bs4 import BeautifulSoup, Tag
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from benchmarks.common import timer
+from utils.html_extract import (
+    extract_markdown,
+    extract_page_chunks,
+    shutdown_html_pool,
+)
+
+WORDS = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit"]
+
+
+def legacy_markdown(html_content: str, page_url: str) -> str:
+    """
+    WebSearchService.markdown_html_content before the move to lxml.
+    """
+    soup = BeautifulSoup(html_content, "html.parser")
+    for tag in soup(["script", "style", "nav", "footer", "header", "form", "aside"]):
+        tag.decompose()
+    title = soup.title.string if soup.title else "No Title Found"
+    main_section = soup.find("body")
+    if main_section:
+        main_content = " ".join(main_section.stripped_strings)
+    else:
+        main_content = "No Main Content Found"
+    links = []
+    for a_tag in soup.find_all("a", href=True):
+        if isinstance(a_tag, Tag):
+            link_text = a_tag.get_text(strip=True)
+            if link_text:
+                links.append(f"- [{link_text}]({a_tag['href']})")
+    return (
+        f"## Title:**{title}**\n\n## Page URL:{page_url}\n\n"
+        f"## Main Content:{main_content}\n\n## Navigation Links\n" + "\n".join(links)
+    )
+
+
+def synthetic_page(rng: random.Random, size: int) -> str:
+    def sentence():
+        return " ".join(rng.choices(WORDS, k=12)) + "."
+
+    def link_list(count):
+        return "".join(
+            f'<li><a href="/page/{rng.randrange(10**6)}">{sentence()[:20]}</a></li>'
+            for _ in range(count)
+        )
+
+    nav = f"<nav><ul>{link_list(40)}</ul></nav>"
+    sidebar = f'<div class="sidebar"><ul>{link_list(60)}</ul></div>'
+    footer = f'<div class="footer-links"><ul>{link_list(80)}</ul></div>'
+    paragraphs = []
+    length = len(nav) + len(sidebar) + len(footer)
+    while length < size:
+        paragraph = f"<p>{' '.join(sentence() for _ in range(8))}</p>"
+        paragraphs.append(paragraph)
+        length += len(paragraph)
+    return (
+        "<html><head><title>Synthetic page</title><script>var x = 1;</script></head>"
+        f'<body>{nav}<div class="layout">{sidebar}'
+        f'<div class="content"><h1>Heading</h1>{"".join(paragraphs)}</div>'
+        f"</div>{footer}</body></html>"
+    )
+
+
+def load_pages(args) -> List[Tuple[str, str]]:
+    if args.pages:
+        root = Path(args.pages).expanduser()
+        files = sorted(p for p in root.rglob("*") if p.suffix in (".html", ".htm"))
+        return [
+            (f"https://saved.local/{p.relative_to(root)}", p.read_text(errors="replace"))
+            for p in files
+        ]
+    rng = random.Random(args.seed)
+    return [
+        (f"https://synthetic.local/{size}/{i}", synthetic_page(rng, size))
+        for size in args.synthetic_sizes
+        for i in range(args.per_size)
+    ]
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def inline(pages, convert) -> Tuple[List[float], int]:
+    latencies, chars = [], 0
+    for url, html in pages:
+        with timer() as elapsed:
+            chars += len(convert(html, url))
+        latencies.append(elapsed[0])
+    return latencies, chars
+
+
+async def worst_loop_lag(work) -> Tuple[float, float]:
+    """
+    Run `work` while a ticker measures how late the loop wakes it up.
+
+    Returns:
+        (worst stall seconds, wall seconds of `work`)
+    """
+    worst = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal worst
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            worst = max(worst, time.perf_counter() - start - 0.001)
+
+    tick = asyncio.create_task(ticker())
+    with timer() as elapsed:
+        await work()
+    done.set()
+    await tick
+    return worst, elapsed[0]
+
+
+async def main(args):
+    pages = load_pages(args)
+    if not pages:
+        raise SystemExit("no pages found")
+    total_chars = sum(len(html) for _, html in pages)
+    print(f"{len(pages)} pages, {total_chars / 1e6:.1f}M characters of HTML")
+
+    for name, convert in (("legacy", legacy_markdown), ("lxml", extract_markdown)):
+        latencies, chars = inline(pages, convert)
+        print(
+            f"{name:<7} inline  p50={statistics.median(latencies) * 1000:.1f}ms  "
+            f"p99={percentile(latencies, 0.99) * 1000:.1f}ms  "
+            f"total={sum(latencies):.2f}s  output={chars / 1e3:.0f}k chars"
+        )
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=100)
+
+    async def legacy_on_loop():
+        async def one(url, html):
+            await asyncio.sleep(0)
+            splitter.split_text(legacy_markdown(html, url))
+
+        await asyncio.gather(*(one(url, html) for url, html in pages))
+
+    async def offloaded():
+        await asyncio.gather(
+            *(extract_page_chunks(html, url, 800, 100) for url, html in pages)
+        )
+
+    try:
+        await offloaded()  # start the worker processes outside the measurement
+        for name, work in (("legacy", legacy_on_loop), ("lxml", offloaded)):
+            lag, wall = await worst_loop_lag(work)
+            print(
+                f"{name:<7} concurrent  wall={wall:.2f}s  "
+                f"worst loop stall={lag * 1000:.1f}ms"
+            )
+    finally:
+        shutdown_html_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", help="directory of saved .html pages")
+    parser.add_argument(
+        "--synthetic-sizes", type=int, nargs="+", default=[20_000, 200_000, 2_000_000]
+    )
+    parser.add_argument("--per-size", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,61 @@
+# benchmarks/local_embeddings.py
+import hashlib
+import re
+from functools import lru_cache
+from typing import List
+import numpy as np
+from core.config import settings
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=200_000)
+def token_vector(token: str, dimensions: int) -> np.ndarray:
+    """
+    Fixed pseudo-random direction for a token, derived from its hash only, so
+    every process (and every run) maps a token to the same vector.
+    """
+    seed = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest())
+    return np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+
+
+class LocalHashEmbeddings:
+    """
+    Deterministic, offline stand-in for AzureOpenAIEmbeddings.
+
+    A text embeds to the normalized sum of its token vectors: texts sharing words
+    are close in cosine distance, which is enough structure to measure ANN recall
+    and end-to-end latency without network calls or token costs. Exposes the
+    attributes the embedding caches key on (endpoint, deployment, dimensions).
+    """
+
+    azure_endpoint = "local"
+
+    def __init__(
+        self,
+        dimensions: int = settings.EMBEDDING_DIMENSIONS,
+        deployment: str = "local-hash",
+    ):
+        self.dimensions = dimensions
+        self.deployment = deployment
+        self.model = deployment
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in TOKEN_RE.findall(text.lower()):
+                vectors[row] += token_vector(token, self.dimensions)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
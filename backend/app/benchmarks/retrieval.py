@@ -0,0 +1,297 @@
+"""
+End-to-end benchmark of DocumentService.get_relevant_docs on synthetic corpora.
+
+Embeddings come from LocalHashEmbeddings (deterministic, offline), so no Azure
+calls are made. For every corpus size the benchmark:
+
+  1. generates topic-structured chunks spread over scratch chats (one library
+     file per chat) and COPYs them in with their file/section centroids,
+     committed, as store_file would;
+  2. rebuilds the HNSW index for every --index configuration (m:ef_construction)
+     and reports its build time;
+  3. runs the same query set through get_relevant_docs for every search pattern
+     and --ef-search value, reporting:
+       hit@k     share of queries whose source chunk is returned
+       recall@k  overlap with exact (filter-first, full scan) cosine top-k
+       p50/p99   end-to-end latency
+
+Every query is built from words of one "source" chunk plus that chunk's unique
+reference token, which gives each query a ground-truth answer for all patterns.
+
+The scratch rows are deleted at the end and the index is restored to the
+configured default. Run from backend/app against a dedicated benchmark database,
+never a live one, because the benchmark rebuilds the document_chunks HNSW index:
+    python -m benchmarks.retrieval --sizes 10000 100000 --index 16:64 32:128
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import uuid
+from typing import List, Tuple
+from sqlalchemy import delete, text
+from core.config import settings
+from core.database import AsyncSessionLocal, PostgreSQLDatabase, engine
+from core.embedding_storage import (
+    BINARY_HNSW_INDEX_NAME,
+    HNSW_INDEX_NAME,
+    hnsw_index_ddl,
+)
+from models.document_chunk_model import DocumentChunk
+from models.file_section_model import FileSection
+from models.users_model import Users
+from repositories.document_chunk_repository import DocumentChunkRepository
+from services.document_service import COPY_BATCH_ROWS, DocumentService
+from benchmarks.common import create_scratch_document, timer
+from benchmarks.local_embeddings import LocalHashEmbeddings
+from utils.centroids import CentroidBuilder
+
+PATTERNS = ["cosine", "simple_keyword_search", "hybrid", "two_stage"]
+TOPICS = 64
+TOPIC_WORDS = 40
+GENERAL_WORDS = 2000
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "qu", "ba", "do"]
+
+
+class LocalDocumentService(DocumentService):
+    """
+    DocumentService with the active embedding model replaced by the local stub.
+    """
+
+    embeddings = LocalHashEmbeddings()
+
+    async def get_llm_from_model(self):
+        return self.embeddings
+
+
+def make_word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+class SyntheticCorpus:
+    """
+    Chunks of ~30 words: mostly from one topic's vocabulary, some general words,
+    plus a unique reference token ("ref<file>x<ordinal>").
+    """
+
+    def __init__(self, seed: int):
+        rng = random.Random(seed)
+        self.topics = [
+            [make_word(rng) for _ in range(TOPIC_WORDS)] for _ in range(TOPICS)
+        ]
+        self.general = [make_word(rng) for _ in range(GENERAL_WORDS)]
+
+    def chunk(self, rng: random.Random, file_index: int, ordinal: int) -> str:
+        topic = self.topics[rng.randrange(TOPICS)]
+        words = rng.choices(topic, k=20) + rng.choices(self.general, k=10)
+        rng.shuffle(words)
+        return " ".join(words) + f" ref{file_index}x{ordinal}"
+
+    @staticmethod
+    def query_for(rng: random.Random, content: str) -> str:
+        words = content.split()
+        return " ".join(rng.sample(words[:-1], 6) + [words[-1]])
+
+
+async def load_corpus(
+    corpus: SyntheticCorpus,
+    embeddings: LocalHashEmbeddings,
+    total: int,
+    per_chat: int,
+    queries: int,
+    seed: int,
+):
+    """
+    Load exactly `total` chunks, in chats of at most `per_chat` each.
+
+    Returns:
+        (scratch user ids, [(state, query, (file_id, ordinal)) ...])
+    """
+    rng = random.Random(seed)
+    per_chat = max(min(per_chat, total), 1)
+    chats = -(-total // per_chat)  # the last chat holds the remainder
+    query_chats = set(rng.sample(range(chats), min(chats, queries)))
+    users, samples = [], []
+    for file_index in range(chats):
+        async with AsyncSessionLocal() as session:
+            user_id, chat_id, file_id = await create_scratch_document(session)
+            users.append(user_id)
+            count = min(per_chat, total - file_index * per_chat)
+            texts = [corpus.chunk(rng, file_index, i) for i in range(count)]
+            centroids = CentroidBuilder(settings.SECTION_CHUNKS)
+            for start in range(0, count, COPY_BATCH_ROWS):
+                batch = texts[start : start + COPY_BATCH_ROWS]
+                vectors = embeddings.embed_array(batch)
+                rows = [
+                    {
+                        "file_id": file_id,
+                        "ordinal": start + i,
+                        "chunk_metadata": {},
+                        "content": content,
+                        "embedding": vector,
+                    }
+                    for i, (content, vector) in enumerate(zip(batch, vectors))
+                ]
+                await DocumentChunkRepository.copy_rows(session, rows)
+                for i, vector in enumerate(vectors):
+                    centroids.add(start + i, vector)
+            file_centroid, sections = centroids.finish()
+            session.add(
+                FileSection(file_id=file_id, level=FileSection.FILE_LEVEL, **file_centroid)
+            )
+            session.add_all(
+                FileSection(file_id=file_id, level=FileSection.SECTION_LEVEL, **section)
+                for section in sections
+            )
+            await session.commit()
+        if file_index in query_chats:
+            state = {"user_id": user_id, "chat_id": str(chat_id)}
+            for _ in range(max(queries // len(query_chats), 1)):
+                ordinal = rng.randrange(count)
+                query = corpus.query_for(rng, texts[ordinal])
+                samples.append((state, query, (file_id, ordinal)))
+    async with engine.begin() as conn:
+        await conn.execute(text("ANALYZE document_chunks"))
+    return users, samples
+
+
+async def rebuild_index(m: int, ef_construction: int) -> float:
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP INDEX IF EXISTS {HNSW_INDEX_NAME}"))
+        await conn.execute(text(f"DROP INDEX IF EXISTS {BINARY_HNSW_INDEX_NAME}"))
+        await conn.execute(text("SET LOCAL maintenance_work_mem = '1GB'"))
+        with timer() as elapsed:
+            await conn.execute(
+                text(hnsw_index_ddl(m=m, ef_construction=ef_construction))
+            )
+    return elapsed[0]
+
+
+async def rebuild_index_default():
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP INDEX IF EXISTS {HNSW_INDEX_NAME}"))
+        await conn.execute(text(f"DROP INDEX IF EXISTS {BINARY_HNSW_INDEX_NAME}"))
+        await conn.execute(text(hnsw_index_ddl()))
+
+
+async def exact_top_k(service: DocumentService, state: dict, query: str, top_k: int):
+    """
+    Ground truth for recall@k: filter-first exact cosine search.
+    """
+    embedding = await service.embeddings.aembed_query(query)
+    async with AsyncSessionLocal() as session:
+        file_ids = await service._chat_file_ids(
+            session, state["user_id"], uuid.UUID(state["chat_id"])
+        )
+        stmt = service._vector_search_stmt(
+            embedding, top_k, (DocumentChunk.file_id.in_(file_ids),), True
+        )
+        rows = (await session.execute(stmt)).all()
+    return {(row.file_id, row.ordinal) for row in rows}
+
+
+def returned_keys(docs) -> List[Tuple[uuid.UUID, int]]:
+    return [
+        (uuid.UUID(doc.metadata["file_id"]), doc.metadata["ordinal"]) for doc in docs
+    ]
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def run_patterns(service, samples, truths, top_k, label):
+    for pattern in PATTERNS:
+        latencies: List[float] = []
+        hits: List[float] = []
+        recalls: List[float] = []
+        for (state, query, source), truth in zip(samples, truths):
+            with timer() as elapsed:
+                docs = await service.get_relevant_docs(
+                    query, top_k=top_k, search_pattern=pattern, state=state
+                )
+            latencies.append(elapsed[0])
+            found = returned_keys(docs)
+            hits.append(float(source in found))
+            if pattern == "cosine":
+                recalls.append(len(truth & set(found)) / max(len(truth), 1))
+        recall = f"{statistics.mean(recalls):.3f}" if recalls else "  -  "
+        print(
+            f"{label}  {pattern:<21} hit@{top_k}={statistics.mean(hits):.3f}  "
+            f"recall@{top_k}={recall}  "
+            f"p50={statistics.median(latencies) * 1000:.1f}ms  "
+            f"p99={percentile(latencies, 0.99) * 1000:.1f}ms"
+        )
+
+
+async def run_size(args, total: int):
+    service = LocalDocumentService()
+    corpus = SyntheticCorpus(args.seed)
+    with timer() as load_time:
+        users, samples = await load_corpus(
+            corpus, service.embeddings, total, args.per_chat, args.queries, args.seed
+        )
+    print(f"{total:>9} chunks loaded in {load_time[0]:.1f}s ({len(samples)} queries)")
+    try:
+        truths = [
+            await exact_top_k(service, state, query, args.top_k)
+            for state, query, _ in samples
+        ]
+        for config in args.index:
+            m, ef_construction = (int(part) for part in config.split(":"))
+            build_seconds = await rebuild_index(m, ef_construction)
+            print(
+                f"{total:>9} chunks  index m={m} ef_construction={ef_construction} "
+                f"built in {build_seconds:.1f}s"
+            )
+            for ef_search in args.ef_search:
+                settings.HNSW_EF_SEARCH = ef_search
+                label = (
+                    f"{total:>9} chunks  m={m:<3} ef_c={ef_construction:<4} "
+                    f"ef_s={ef_search:<4}"
+                )
+                await run_patterns(service, samples, truths, args.top_k, label)
+    finally:
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(Users).where(Users.user_id.in_(users)))
+            await session.commit()
+
+
+async def main(args):
+    await PostgreSQLDatabase.initialize()
+    default_ef_search = settings.HNSW_EF_SEARCH
+    default_exact_max = settings.EXACT_SEARCH_MAX_CHUNKS
+    # Let --per-chat decide between the exact and the HNSW plan
+    settings.EXACT_SEARCH_MAX_CHUNKS = args.exact_max_chunks
+    try:
+        for total in args.sizes:
+            await run_size(args, total)
+    finally:
+        settings.HNSW_EF_SEARCH = default_ef_search
+        settings.EXACT_SEARCH_MAX_CHUNKS = default_exact_max
+        await rebuild_index_default()
+        await PostgreSQLDatabase.close_all_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--per-chat", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument(
+        "--index", nargs="+", default=["16:64"], help="HNSW m:ef_construction"
+    )
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[40, 100, 200])
+    parser.add_argument(
+        "--exact-max-chunks",
+        type=int,
+        default=settings.EXACT_SEARCH_MAX_CHUNKS,
+        help="chats up to this size use the exact plan (0 = always HNSW)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,169 @@
+"""
+Size / recall / latency trade-off of the EMBEDDING_STORAGE modes.
+
+Loads the same clustered corpus into one temporary table per mode, builds the
+mode's HNSW index, and compares every mode against exact float32 search:
+
+    vector        float32, vector_cosine_ops
+    halfvec       float16, halfvec_cosine_ops
+    binary        1-bit hamming index + float32 re-rank
+    vector-<D>    float32 truncated to D dims and re-normalized
+
+Run from backend/app (app tables are only read, with --sample-db):
+    python -m benchmarks.storage_modes --rows 100000 --reduced 512 256
+"""
+
+import argparse
+import asyncio
+import statistics
+import numpy as np
+from sqlalchemy import text
+from core.config import settings
+from core.database import engine
+from repositories.document_chunk_repository import vector_literal
+from benchmarks.common import timer
+from benchmarks.filtered_search import clustered_vectors
+
+
+def mode_plan(mode: str, dimensions: int, top_k: int, rerank_factor: int):
+    """
+    (column type, index DDL template, query SQL) for a storage mode.
+    Queries take :q (full vector literal) and return ids ordered by relevance.
+    """
+    if mode == "halfvec":
+        return (
+            f"halfvec({dimensions})",
+            "USING hnsw (embedding halfvec_cosine_ops)",
+            f"SELECT id FROM {{table}} ORDER BY embedding <=> CAST(:q AS halfvec({dimensions})) LIMIT {top_k}",
+        )
+    if mode == "binary":
+        code = f"binary_quantize(embedding)::bit({dimensions})"
+        return (
+            f"vector({dimensions})",
+            f"USING hnsw (({code}) bit_hamming_ops)",
+            f"SELECT id FROM (SELECT id, embedding FROM {{table}} "
+            f"ORDER BY {code} <~> binary_quantize(CAST(:q AS vector({dimensions})))::bit({dimensions}) "
+            f"LIMIT {top_k * rerank_factor}) candidates "
+            f"ORDER BY embedding <=> CAST(:q AS vector({dimensions})) LIMIT {top_k}",
+        )
+    return (
+        f"vector({dimensions})",
+        "USING hnsw (embedding vector_cosine_ops)",
+        f"SELECT id FROM {{table}} ORDER BY embedding <=> CAST(:q AS vector({dimensions})) LIMIT {top_k}",
+    )
+
+
+def exact_neighbours(corpus: np.ndarray, queries: np.ndarray, top_k: int):
+    scores = queries @ corpus.T  # unit vectors: max dot == min cosine distance
+    return [set(np.argsort(-row)[:top_k].tolist()) for row in scores]
+
+
+async def run_mode(conn, name, mode, corpus, queries, truth, args):
+    dimensions = corpus.shape[1]
+    table = f"bench_storage_{name.replace('-', '_')}"
+    column_type, index_using, query_sql = mode_plan(
+        mode, dimensions, args.top_k, settings.BINARY_RERANK_FACTOR
+    )
+    await conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    await conn.execute(
+        text(f"CREATE TEMP TABLE {table} (id integer PRIMARY KEY, embedding {column_type})")
+    )
+    for start in range(0, len(corpus), 5000):
+        await conn.execute(
+            text(f"INSERT INTO {table} (id, embedding) VALUES (:id, CAST(:e AS {column_type}))"),
+            [
+                {"id": start + i, "e": vector_literal(v)}
+                for i, v in enumerate(corpus[start : start + 5000])
+            ],
+        )
+    with timer() as build:
+        await conn.execute(text(f"CREATE INDEX ON {table} {index_using}"))
+    size = (
+        await conn.execute(text(f"SELECT pg_total_relation_size('{table}')"))
+    ).scalar_one()
+
+    await conn.execute(
+        text("SELECT set_config('hnsw.ef_search', :value, false)"),
+        {"value": str(settings.HNSW_EF_SEARCH)},
+    )
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        with timer() as elapsed:
+            rows = (
+                await conn.execute(
+                    text(query_sql.format(table=table)), {"q": vector_literal(query)}
+                )
+            ).all()
+        latencies.append(elapsed[0])
+        recalls.append(len({row.id for row in rows} & expected) / args.top_k)
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{name:<12} size={size / 1024 / 1024:8.1f}MB build={build[0]:6.1f}s "
+        f"recall@{args.top_k}={statistics.mean(recalls):.3f} "
+        f"p50={statistics.median(latencies) * 1000:.2f}ms p99={p99 * 1000:.2f}ms"
+    )
+    await conn.execute(text(f"DROP TABLE {table}"))
+
+
+async def sample_stored_embeddings(count: int) -> np.ndarray:
+    """
+    Real chunk embeddings give meaningful reduced-dimension numbers; synthetic
+    vectors are not Matryoshka-trained, so truncating them understates recall.
+    """
+    async with engine.connect() as conn:
+        rows = (
+            await conn.execute(
+                text(
+                    "SELECT embedding::vector::text FROM document_chunks "
+                    "ORDER BY random() LIMIT :n"
+                ),
+                {"n": count},
+            )
+        ).scalars()
+        vectors = np.array([np.array(row.strip("[]").split(","), float) for row in rows])
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def main(args):
+    rng = np.random.default_rng(args.seed)
+    dimensions = settings.EMBEDDING_DIMENSIONS
+    if args.sample_db:
+        stored = await sample_stored_embeddings(args.rows + args.queries)
+        corpus, queries = stored[args.queries :], stored[: args.queries]
+    else:
+        corpus = clustered_vectors(rng, args.rows, dimensions)
+        queries = clustered_vectors(rng, args.queries, dimensions)
+    truth = exact_neighbours(corpus, queries, args.top_k)
+
+    async with engine.connect() as conn:
+        for mode in ("vector", "halfvec", "binary"):
+            await run_mode(conn, mode, mode, corpus, queries, truth, args)
+        for reduced in args.reduced:
+            # Ground truth stays the full-dimension neighbours
+            short = corpus[:, :reduced]
+            short = short / np.linalg.norm(short, axis=1, keepdims=True)
+            short_queries = queries[:, :reduced]
+            short_queries = short_queries / np.linalg.norm(
+                short_queries, axis=1, keepdims=True
+            )
+            await run_mode(
+                conn, f"vector-{reduced}", "vector", short, short_queries, truth, args
+            )
+        await conn.rollback()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--reduced", type=int, nargs="*", default=[512, 256])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--sample-db",
+        action="store_true",
+        help="use embeddings sampled from document_chunks instead of synthetic ones",
+    )
+    asyncio.run(main(parser.parse_args()))
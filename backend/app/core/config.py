@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 from pathlib import Path
+from typing import Dict, List, Literal
 
 # Load environment variables from .env file
 load_dotenv()
@@ -36,6 +37,84 @@ class Settings(BaseSettings):
     AZURE_OPENAI_ENDPOINT: str = "YOUR_AZURE_OPENAI_API_BASE"
     AZURE_OPENAI_API_KEY: str = "YOUR_AZURE_OPENAI_API_KEY"
     AZURE_OPENAI_API_VERSION: str = "2025-04-01-preview"
+    EMBEDDING_DIMENSIONS: int = 1536
+    EMBEDDING_STORAGE: Literal["vector", "halfvec", "binary"] = "vector"
+    BINARY_RERANK_FACTOR: int = 4  # binary mode: candidates = top_k * factor
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 200_000
+    QUERY_EMBEDDING_CACHE_SIZE: int = 2048
+    QUERY_EMBEDDING_CACHE_TTL: int = 3600  # seconds
+    QUERY_EMBEDDING_BATCH_WINDOW_MS: int = 5
+    QUERY_EMBEDDING_MAX_BATCH: int = 64
+    HNSW_EF_SEARCH: int = 100
+    HNSW_ITERATIVE_SCAN: str = "relaxed_order"  # "" for pgvector < 0.8
+    EXACT_SEARCH_MAX_CHUNKS: int = 20_000
+    MMR_FETCH_FACTOR: int = 4  # candidates fetched = top_k * factor
+    MMR_LAMBDA: float = 0.5  # 1 = pure relevance, 0 = pure diversity
+    SECTION_CHUNKS: int = 32  # chunks per section centroid
+    COARSE_TOP_FILES: int = 5  # two_stage: files kept when a chat has more
+    COARSE_TOP_SECTIONS: int = 8  # two_stage: sections whose chunks are searched
+    PDF_TEXT_MIN_CHARS: int = 50  # pages with less text than this are OCR'd
+    PDF_OCR_WORKERS: int = 2
+    PDF_OCR_DPI: int = 300
+    UPLOAD_SPOOL_MAX_BYTES: int = 2 * 1024 * 1024  # larger uploads spill to a temp file
+    REAPER_BATCH_ROWS: int = 1000  # chunks deleted per transaction
+    REAPER_BATCH_PAUSE_MS: int = 50  # pause between batches to let other writers in
+    REAPER_MAX_BATCHES: int = 600  # per scheduled run
+    WEB_SEARCH_CACHE_SIZE: int = 1024  # in-process entries; Redis holds the rest
+    # Fresh lifetime (seconds) of cached search results per `latest_by` filter
+    WEB_SEARCH_CACHE_TTLS: Dict[str, int] = {
+        "d": 600,
+        "w": 3600,
+        "m": 6 * 3600,
+        "y": 24 * 3600,
+        "": 6 * 3600,
+    }
+    WEB_SEARCH_STALE_FACTOR: float = 1.0  # stale window = ttl * factor
+    CRAWL_CACHE_MAX_CHARS: int = 64 * 1024 * 1024  # extracted text held in process
+    CRAWL_CACHE_TTL: int = 3600  # seconds before a page is revalidated
+    # Per-domain TTL overrides; a domain also covers its subdomains
+    CRAWL_CACHE_DOMAIN_TTLS: Dict[str, int] = {}
+    CRAWL_URL_TIMEOUT: float = 10.0  # seconds per page, including the wait for a slot
+    CRAWL_DEADLINE: float = 20.0  # seconds per crawl_url_list call
+    CRAWL_MAX_CONCURRENCY: int = 16  # requests in flight across all crawls
+    CRAWL_MAX_PER_HOST: int = 2
+    CRAWL_MAX_BYTES: int = 2 * 1024 * 1024  # bodies are cut off beyond this
+    # Checked from the response headers before the body is read
+    CRAWL_CONTENT_TYPES: List[str] = ["text/html", "application/xhtml+xml", "text/plain"]
+    CRAWL_TOP_CHUNKS: int = 6  # most relevant chunks kept per crawled page
+    CRAWL_PAGE_MAX_CHARS: int = 4000  # character budget per crawled page
+    HTTP_MAX_CONNECTIONS: int = 32  # concurrent requests of the shared HTTP client
+    HTTP_MAX_PER_HOST: int = 6  # connections libcurl opens to one host
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_READ_TIMEOUT: float = 15.0  # max seconds without receiving any data
+    HTTP_DNS_CACHE_SECONDS: int = 300
+    HTML_PARSE_WORKERS: int = 2
+    HTML_OFFLOAD_MIN_CHARS: int = 64 * 1024  # smaller pages are parsed on a thread
+    TOOL_MEMO_TTL: int = 300  # seconds a tool result is reused within a chat
+    TOOL_MEMO_CACHE_SIZE: int = 512  # in-process entries; Redis holds the rest
+    SANDBOX_WORKERS: int = 2  # warm runner processes; also the max concurrent jobs
+    SANDBOX_CPU_SECONDS: int = 10  # CPU time of one job
+    SANDBOX_TIMEOUT: float = 15.0  # wall-clock seconds of one job
+    SANDBOX_MEMORY_MB: int = 1024  # address space of a runner, imports included
+    SANDBOX_MAX_OUTPUT: int = 64 * 1024  # bytes of output kept; the job is stopped beyond
+    SANDBOX_MAX_FILE_BYTES: int = 16 * 1024 * 1024  # largest file a job may write
+    # First of 2 * SANDBOX_WORKERS uids (each with a same-numbered group) that
+    # runners take one apiece; they need no account, but the server must be
+    # root. 0 runs runners as the server's own user, able to read what it can
+    SANDBOX_UID_BASE: int = 0
+    # Imported by every runner before it takes a job; missing ones are skipped
+    SANDBOX_PREIMPORTS: List[str] = [
+        "collections",
+        "datetime",
+        "itertools",
+        "json",
+        "math",
+        "random",
+        "re",
+        "statistics",
+        "numpy",
+        "pandas",
+    ]
 
     class Config:
         env_file = ".env"
@@ -1,17 +1,72 @@
+import math, time
 from contextlib import asynccontextmanager
 from typing import Any, AsyncGenerator, Optional, Dict
+from curl_cffi import AsyncCurl, CurlHttpVersion, CurlMOpt, CurlOpt
 from curl_cffi.requests import AsyncSession
+from core.config import settings
+from core.metrics import PoolStats, get_pool_stats
+
+
+class ManagedAsyncSession(AsyncSession):
+    """
+    AsyncSession that reports how many of its curl handles are in use and how
+    long requests waited for a free one.
+    """
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    async def pop_curl(self):
+        start = time.perf_counter()
+        curl = await super().pop_curl()
+        self.stats.record_acquire(time.perf_counter() - start)
+        return curl
+
+    def push_curl(self, curl):
+        self.stats.record_release()
+        super().push_curl(curl)
 
 
 class CurlCFFIAsyncSession:
-    _session: Optional[AsyncSession] = None
+    _session: Optional[ManagedAsyncSession] = None
 
     @classmethod
     async def initialize(cls, headers: Optional[Dict[str, str]] = None):
         """
-        Create a new AsyncSession with optional headers.
+        Create the shared client with optional headers.
+
+        One libcurl multi handle backs every request, so connections (HTTP/2 where
+        the server offers it) and DNS answers are reused across tool calls:
+        - HTTP_MAX_CONNECTIONS concurrent requests; more wait for a free handle
+        - HTTP_MAX_PER_HOST connections to any one host; more queue in libcurl
+        - idle connections kept alive in a cache of the same size
+        - a connect timeout, and a read timeout that only fires when no data
+          arrives for HTTP_READ_TIMEOUT seconds: a slow but active transfer is
+          never cut off (curl_cffi's own (connect, read) timeout caps the whole
+          request at connect + read instead, unless it is streamed)
         """
-        cls._session = AsyncSession(headers=headers)
+        multi = AsyncCurl()
+        multi.setopt(CurlMOpt.MAX_TOTAL_CONNECTIONS, settings.HTTP_MAX_CONNECTIONS)
+        multi.setopt(CurlMOpt.MAX_HOST_CONNECTIONS, settings.HTTP_MAX_PER_HOST)
+        multi.setopt(CurlMOpt.MAXCONNECTS, settings.HTTP_MAX_CONNECTIONS)
+        cls._session = ManagedAsyncSession(
+            get_pool_stats("http_client", settings.HTTP_MAX_CONNECTIONS),
+            async_curl=multi,
+            max_clients=settings.HTTP_MAX_CONNECTIONS,
+            headers=headers,
+            timeout=None,  # no total limit; see the curl options below
+            http_version=CurlHttpVersion.V2TLS,
+            # Applied after each request's own timeout settings
+            curl_options={
+                CurlOpt.CONNECTTIMEOUT_MS: int(settings.HTTP_CONNECT_TIMEOUT * 1000),
+                # Under 1 byte/s for the whole window counts as idle
+                CurlOpt.LOW_SPEED_LIMIT: 1,
+                CurlOpt.LOW_SPEED_TIME: math.ceil(settings.HTTP_READ_TIMEOUT),
+                CurlOpt.DNS_CACHE_TIMEOUT: settings.HTTP_DNS_CACHE_SECONDS,
+                CurlOpt.TCP_KEEPALIVE: 1,
+            },
+        )
 
     @classmethod
     @asynccontextmanager
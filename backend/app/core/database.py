@@ -6,6 +6,11 @@ from sqlalchemy.ext.asyncio import async_sessionmaker
 from contextlib import asynccontextmanager
 from core.config import settings
 from models.base import Base
+from core.embedding_storage import (
+    hnsw_index_ddl,
+    stale_hnsw_index_ddl,
+    verify as verify_embedding_storage,
+)
 from typing import AsyncGenerator, Any
 from urllib.parse import quote_plus
 
@@ -25,6 +30,126 @@ AsyncSessionLocal = async_sessionmaker(
     class_=AsyncSession,
 )
 
+# Idempotent DDL for tables that already exist (create_all never alters them).
+SCHEMA_UPGRADES = [
+    # Let bulk loaders (COPY) rely on server-side ids and timestamps
+    "ALTER TABLE document_chunks ALTER COLUMN chunk_id SET DEFAULT gen_random_uuid()",
+    "ALTER TABLE document_chunks ALTER COLUMN created_at SET DEFAULT timezone('utc', now())",
+    # Full-text search column + GIN index for keyword / hybrid retrieval
+    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_document_chunks_content_tsv "
+    "ON document_chunks USING gin (content_tsv)",
+    # Chunk position + source metadata; legacy rows are numbered by insertion time
+    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS ordinal integer",
+    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS chunk_metadata jsonb "
+    "NOT NULL DEFAULT '{}'::jsonb",
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'document_chunks'
+              AND column_name = 'ordinal'
+              AND is_nullable = 'YES'
+        ) THEN
+            UPDATE document_chunks c
+            SET ordinal = numbered.ordinal
+            FROM (
+                SELECT chunk_id,
+                       row_number() OVER (
+                           PARTITION BY document_id ORDER BY created_at, chunk_id
+                       ) - 1 AS ordinal
+                FROM document_chunks
+            ) numbered
+            WHERE c.chunk_id = numbered.chunk_id AND c.ordinal IS NULL;
+            ALTER TABLE document_chunks ALTER COLUMN ordinal SET NOT NULL;
+        END IF;
+    END $$
+    """,
+    # Shared file store: chunks belong to stored_files, chats link to them via
+    # user_documents. Every legacy upload becomes its own library file (its bytes
+    # are gone, so the placeholder digest never matches a new upload).
+    "ALTER TABLE user_documents ADD COLUMN IF NOT EXISTS file_id uuid",
+    "ALTER TABLE user_documents ALTER COLUMN file_path DROP NOT NULL",
+    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS file_id uuid",
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'document_chunks' AND column_name = 'document_id'
+        ) THEN
+            INSERT INTO stored_files (
+                file_id, user_id, content_digest, file_name, size_bytes,
+                chunk_count, created_at
+            )
+            SELECT d.document_id, d.user_id, 'legacy-' || d.document_id,
+                   d.file_name, 0,
+                   (SELECT count(*) FROM document_chunks c
+                    WHERE c.document_id = d.document_id),
+                   d.uploaded_at
+            FROM user_documents d
+            ON CONFLICT DO NOTHING;
+            UPDATE user_documents SET file_id = document_id WHERE file_id IS NULL;
+            UPDATE document_chunks SET file_id = document_id WHERE file_id IS NULL;
+            ALTER TABLE document_chunks DROP COLUMN document_id;
+            ALTER TABLE document_chunks DROP COLUMN IF EXISTS user_id;
+            ALTER TABLE document_chunks DROP COLUMN IF EXISTS chat_id;
+            ALTER TABLE document_chunks ALTER COLUMN file_id SET NOT NULL;
+            ALTER TABLE document_chunks ADD CONSTRAINT document_chunks_file_id_fkey
+                FOREIGN KEY (file_id) REFERENCES stored_files (file_id) ON DELETE CASCADE;
+            ALTER TABLE user_documents ALTER COLUMN file_id SET NOT NULL;
+            ALTER TABLE user_documents ADD CONSTRAINT user_documents_file_id_fkey
+                FOREIGN KEY (file_id) REFERENCES stored_files (file_id) ON DELETE CASCADE;
+            ALTER TABLE user_documents ADD CONSTRAINT uq_user_documents_chat_file
+                UNIQUE (chat_id, file_id);
+        END IF;
+    END $$
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_document_chunks_file_ordinal "
+    "ON document_chunks (file_id, ordinal)",
+    "CREATE INDEX IF NOT EXISTS ix_user_documents_file_id "
+    "ON user_documents (file_id)",
+    # Soft-deleted library files: dedupe only against live rows, reaper queue
+    "ALTER TABLE stored_files ADD COLUMN IF NOT EXISTS deleted_at timestamptz",
+    "ALTER TABLE stored_files DROP CONSTRAINT IF EXISTS uq_stored_files_user_digest",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_stored_files_user_digest_live "
+    "ON stored_files (user_id, content_digest) WHERE deleted_at IS NULL",
+    "CREATE INDEX IF NOT EXISTS ix_stored_files_deleted_at "
+    "ON stored_files (deleted_at) WHERE deleted_at IS NOT NULL",
+    # File / section centroids for files ingested before they existed (or after
+    # an embedding storage migration). avg() needs no re-normalizing for cosine.
+    f"""
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM stored_files f
+            WHERE f.chunk_count > 0
+              AND NOT EXISTS (SELECT 1 FROM file_sections s WHERE s.file_id = f.file_id)
+        ) THEN
+            WITH pending AS (
+                SELECT f.file_id FROM stored_files f
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM file_sections s WHERE s.file_id = f.file_id
+                )
+            )
+            INSERT INTO file_sections (file_id, level, ordinal_start, ordinal_end, embedding)
+            SELECT c.file_id, 1, min(c.ordinal), max(c.ordinal), avg(c.embedding)
+            FROM document_chunks c JOIN pending p ON p.file_id = c.file_id
+            GROUP BY c.file_id, c.ordinal / {settings.SECTION_CHUNKS}
+            UNION ALL
+            SELECT c.file_id, 0, min(c.ordinal), max(c.ordinal), avg(c.embedding)
+            FROM document_chunks c JOIN pending p ON p.file_id = c.file_id
+            GROUP BY c.file_id;
+        END IF;
+    END $$
+    """,
+    # ANN index for the configured EMBEDDING_STORAGE mode, and only that one
+    stale_hnsw_index_ddl(),
+    hnsw_index_ddl(),
+]
+
 
 class PostgreSQLDatabase:
     @classmethod
@@ -41,6 +166,11 @@ class PostgreSQLDatabase:
                 await conn.execute(text('CREATE EXTENSION IF NOT EXISTS "vector";'))
                 # Create all tables defined in the ORM models
                 await conn.run_sync(Base.metadata.create_all)
+                # Stored embeddings must match EMBEDDING_STORAGE / EMBEDDING_DIMENSIONS
+                await verify_embedding_storage(conn)
+                # Bring existing tables up to date with the ORM models
+                for statement in SCHEMA_UPGRADES:
+                    await conn.execute(text(statement))
             logger.info("Database connection initialized successfully.")
         except Exception as e:
             logger.error(f"Failed to initialize database: {e}")
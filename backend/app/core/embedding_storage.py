@@ -0,0 +1,180 @@
+# core/embedding_storage.py
+"""
+Storage modes for DocumentChunk.embedding.
+
+    EMBEDDING_STORAGE=vector   float32 vector(D), HNSW on vector_cosine_ops (default)
+    EMBEDDING_STORAGE=halfvec  float16 halfvec(D), HNSW on halfvec_cosine_ops (half the size)
+    EMBEDDING_STORAGE=binary   float32 vector(D), HNSW on binary_quantize(embedding)::bit(D)
+                               with hamming distance; candidates are re-ranked by
+                               exact cosine distance on the full-precision vectors
+
+EMBEDDING_DIMENSIONS can be lowered (e.g. 512) for text-embedding-3 models; their
+embeddings stay valid when truncated and re-normalized.
+
+Switching modes or dimensions on an existing database:
+    python -m core.embedding_storage
+"""
+
+import asyncio
+import logging
+import re
+from typing import Optional, Tuple
+from sqlalchemy import cast, func, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from pgvector.sqlalchemy import BIT, HALFVEC, Vector
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HNSW_INDEX_NAME = "ix_document_chunks_embedding_hnsw"
+BINARY_HNSW_INDEX_NAME = "ix_document_chunks_embedding_bq_hnsw"
+HNSW_M = 16  # defaults tuned for medium corpora
+HNSW_EF_CONSTRUCTION = 64
+
+
+def column_type_name(mode: str = settings.EMBEDDING_STORAGE) -> str:
+    return "halfvec" if mode == "halfvec" else "vector"
+
+
+def embedding_column_type(
+    mode: str = settings.EMBEDDING_STORAGE,
+    dimensions: int = settings.EMBEDDING_DIMENSIONS,
+):
+    return HALFVEC(dimensions) if mode == "halfvec" else Vector(dimensions)
+
+
+def quantized(expr, dimensions: int = settings.EMBEDDING_DIMENSIONS):
+    """
+    1-bit code of an embedding; must match the binary HNSW index expression.
+    """
+    return cast(func.binary_quantize(expr), BIT(dimensions))
+
+
+def hnsw_index_ddl(
+    mode: str = settings.EMBEDDING_STORAGE,
+    dimensions: int = settings.EMBEDDING_DIMENSIONS,
+    m: int = HNSW_M,
+    ef_construction: int = HNSW_EF_CONSTRUCTION,
+) -> str:
+    with_clause = f"WITH (m = {m}, ef_construction = {ef_construction})"
+    if mode == "binary":
+        return (
+            f"CREATE INDEX IF NOT EXISTS {BINARY_HNSW_INDEX_NAME} ON document_chunks "
+            f"USING hnsw ((binary_quantize(embedding)::bit({dimensions})) bit_hamming_ops) "
+            f"{with_clause}"
+        )
+    return (
+        f"CREATE INDEX IF NOT EXISTS {HNSW_INDEX_NAME} ON document_chunks "
+        f"USING hnsw (embedding {column_type_name(mode)}_cosine_ops) {with_clause}"
+    )
+
+
+def stale_hnsw_index_ddl(mode: str = settings.EMBEDDING_STORAGE) -> str:
+    """
+    Drop the ANN index of the other index kind, left behind when
+    EMBEDDING_STORAGE switches between binary and a full-precision mode
+    without a migration (the column type stays valid, so `verify` passes).
+    """
+    stale = HNSW_INDEX_NAME if mode == "binary" else BINARY_HNSW_INDEX_NAME
+    return f"DROP INDEX IF EXISTS {stale}"
+
+
+async def current_column(conn: AsyncConnection) -> Optional[Tuple[str, int]]:
+    """
+    (type name, dimensions) of document_chunks.embedding, or None if the table is missing.
+    """
+    result = await conn.execute(
+        text(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = to_regclass('document_chunks') AND attname = 'embedding'"
+        )
+    )
+    row = result.first()
+    if row is None:
+        return None
+    match = re.fullmatch(r"(\w+)\((\d+)\)", row[0])
+    if match is None:
+        raise RuntimeError(f"Unexpected embedding column type: {row[0]}")
+    return match.group(1), int(match.group(2))
+
+
+async def verify(conn: AsyncConnection) -> None:
+    """
+    Refuse to start when the stored embeddings do not match the configured mode.
+    """
+    current = await current_column(conn)
+    expected = (column_type_name(), settings.EMBEDDING_DIMENSIONS)
+    if current is not None and current != expected:
+        raise RuntimeError(
+            f"document_chunks.embedding is {current[0]}({current[1]}) but settings "
+            f"expect {expected[0]}({expected[1]}). Run `python -m core.embedding_storage`."
+        )
+
+
+async def migrate(
+    mode: str = settings.EMBEDDING_STORAGE,
+    dimensions: int = settings.EMBEDDING_DIMENSIONS,
+) -> None:
+    """
+    Re-encode existing chunk embeddings into `mode`/`dimensions` and rebuild the
+    ANN index. Runs in one transaction; the table is rewritten once.
+    """
+    from core.database import engine
+
+    async with engine.begin() as conn:
+        current = await current_column(conn)
+        if current is None:
+            logger.info("document_chunks does not exist yet, nothing to migrate")
+            return
+        current_type, current_dimensions = current
+        if dimensions > current_dimensions:
+            raise ValueError(
+                f"Cannot grow embeddings from {current_dimensions} to {dimensions} "
+                "dimensions without re-embedding"
+            )
+        target_type = f"{column_type_name(mode)}({dimensions})"
+
+        await conn.execute(text(f"DROP INDEX IF EXISTS {HNSW_INDEX_NAME}"))
+        await conn.execute(text(f"DROP INDEX IF EXISTS {BINARY_HNSW_INDEX_NAME}"))
+
+        if dimensions < current_dimensions:
+            # Matryoshka-style truncation: keep the leading dimensions, re-normalize
+            using = f"l2_normalize(subvector(embedding, 1, {dimensions}))::{target_type}"
+            # Cached vectors have the old width and are keyed by it anyway
+            await conn.execute(text("TRUNCATE embedding_cache"))
+            await conn.execute(
+                text(
+                    f"ALTER TABLE embedding_cache ALTER COLUMN embedding "
+                    f"TYPE vector({dimensions})"
+                )
+            )
+        else:
+            using = f"embedding::{target_type}"
+        if (current_type, current_dimensions) != (column_type_name(mode), dimensions):
+            logger.info(
+                f"Re-encoding document_chunks.embedding from "
+                f"{current_type}({current_dimensions}) to {target_type}"
+            )
+            await conn.execute(
+                text(
+                    f"ALTER TABLE document_chunks ALTER COLUMN embedding "
+                    f"TYPE {target_type} USING {using}"
+                )
+            )
+            # Centroids are rebuilt from the re-encoded chunks at next startup
+            await conn.execute(text("TRUNCATE file_sections"))
+            await conn.execute(
+                text(
+                    f"ALTER TABLE file_sections ALTER COLUMN embedding "
+                    f"TYPE {target_type}"
+                )
+            )
+
+        await conn.execute(text("SET LOCAL maintenance_work_mem = '1GB'"))
+        await conn.execute(text(hnsw_index_ddl(mode, dimensions)))
+    logger.info(f"Embedding storage migrated to {mode} ({dimensions} dimensions)")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(migrate())
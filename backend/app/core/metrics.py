@@ -0,0 +1,128 @@
+# core/metrics.py
+import threading
+from typing import Any, Dict, List
+
+
+class CacheStats:
+    """
+    Per-process hit/miss/eviction counters for a named cache.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def record_hit(self, count: int = 1):
+        with self._lock:
+            self.hits += count
+
+    def record_miss(self, count: int = 1):
+        with self._lock:
+            self.misses += count
+
+    def record_eviction(self, count: int = 1):
+        with self._lock:
+            self.evictions += count
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+
+_registry: Dict[str, CacheStats] = {}
+_registry_lock = threading.Lock()
+
+
+def get_cache_stats(name: str) -> CacheStats:
+    """
+    Return the shared CacheStats for `name`, creating it on first use.
+    """
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = CacheStats(name)
+        return _registry[name]
+
+
+def all_cache_stats() -> List[Dict[str, Any]]:
+    with _registry_lock:
+        return [stats.snapshot() for stats in _registry.values()]
+
+
+class PoolStats:
+    """
+    Per-process utilization and wait-time counters for a named connection pool
+    of `size` slots.
+    """
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.acquired = 0
+        self.waited = 0  # acquisitions that found the pool exhausted
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record_acquire(self, wait_seconds: float):
+        with self._lock:
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.acquired += 1
+            if wait_seconds > 0.001:
+                self.waited += 1
+            self.wait_seconds += wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+    def record_release(self):
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "size": self.size,
+            "in_use": self.in_use,
+            "utilization": round(self.in_use / self.size, 4) if self.size else 0.0,
+            "peak_in_use": self.peak_in_use,
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "avg_wait_ms": round(self.wait_seconds / self.acquired * 1000, 3)
+            if self.acquired
+            else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+        }
+
+
+_pool_registry: Dict[str, PoolStats] = {}
+
+
+def get_pool_stats(name: str, size: int) -> PoolStats:
+    """
+    Return the shared PoolStats for `name`, creating it on first use; a pool
+    re-created with another size keeps its counters.
+    """
+    with _registry_lock:
+        if name not in _pool_registry:
+            _pool_registry[name] = PoolStats(name, size)
+        _pool_registry[name].size = size
+        return _pool_registry[name]
+
+
+def all_pool_stats() -> List[Dict[str, Any]]:
+    with _registry_lock:
+        return [stats.snapshot() for stats in _pool_registry.values()]
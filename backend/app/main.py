@@ -8,6 +8,11 @@ from core.curl_cffi_session_manager import CurlCFFIAsyncSession
 from contextlib import asynccontextmanager
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from repositories.websocket_manager import ws_manager
+from repositories.embedding_cache_repository import EmbeddingCacheRepository
+from repositories.stored_file_repository import StoredFileRepository
+from utils.pdf_loader import shutdown_ocr_pool
+from utils.html_extract import shutdown_html_pool
+from utils.code_sandbox import sandbox_pool
 from dependencies.auth_dependencies import (
     auth_user_role,
     get_current_user,
@@ -24,16 +29,26 @@ async def lifespan(app: FastAPI):
     await RedisCache.initialize()
     await CurlCFFIAsyncSession.initialize()
     await ManagementService.get_all_models()
+    await sandbox_pool.start()
     scheduler = AsyncIOScheduler()
     scheduler.add_job(
         scheduled_data_fetch, "interval", seconds=86400
     )  # 86400 seconds = every 24 hours
+    scheduler.add_job(
+        EmbeddingCacheRepository.evict, "interval", seconds=3600
+    )  # keep the embedding cache size-bounded
+    scheduler.add_job(
+        StoredFileRepository.reap, "interval", seconds=60
+    )  # remove chunks of soft-deleted files in throttled batches
     scheduler.start()
     yield
     # --- shutdown ---
     await PostgreSQLDatabase.close_all_connections()
     await RedisCache.close_connection()
     await CurlCFFIAsyncSession.close_session()
+    shutdown_ocr_pool()
+    shutdown_html_pool()
+    await sandbox_pool.close()
     scheduler.shutdown()
 
 
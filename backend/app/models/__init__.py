@@ -4,5 +4,8 @@ from .users_model import Users
 from .ai_models_model import AiModels
 from .chat_history_model import ChatHistory
 from .subscriptions_model import Subscriptions
+from .stored_file_model import StoredFile
 from .user_document_model import UserDocument
-from .document_chunk_model import DocumentChunk
\ No newline at end of file
+from .document_chunk_model import DocumentChunk
+from .file_section_model import FileSection
+from .embedding_cache_model import EmbeddingCache
\ No newline at end of file
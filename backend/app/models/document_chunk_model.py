@@ -2,14 +2,14 @@
 import uuid
 from typing import TYPE_CHECKING
 from datetime import datetime, UTC
-from sqlalchemy import ForeignKey, TIMESTAMP, Index
-from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy import Computed, ForeignKey, Integer, TIMESTAMP, Index, text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR, UUID as PG_UUID
 from sqlalchemy.orm import mapped_column, Mapped, relationship
-from pgvector.sqlalchemy import Vector  # ← pgvector column type
+from core.embedding_storage import embedding_column_type
 from .base import Base
 
 if TYPE_CHECKING:
-    from models.user_document_model import UserDocument
+    from models.stored_file_model import StoredFile
 
 
 class DocumentChunk(Base):
@@ -17,35 +17,51 @@ class DocumentChunk(Base):
 
     # --- Indexes ---
     __table_args__ = (
-        # Approximate Nearest Neighbour index for vector search (cosine distance)
+        # Per-chat scoping (file_id IN the chat's files) and neighbour
+        # lookups (chunks N-k .. N+k of one file)
+        Index("ix_document_chunks_file_ordinal", "file_id", "ordinal"),
+        # Inverted index for keyword / hybrid search
         Index(
-            "ix_document_chunks_embedding_hnsw",
-            "embedding",
-            postgresql_using="hnsw",
-            postgresql_ops={"embedding": "vector_cosine_ops"},
-            postgresql_with={
-                "m": 16,
-                "ef_construction": 64,
-            },  # tuned for medium corpora
+            "ix_document_chunks_content_tsv",
+            "content_tsv",
+            postgresql_using="gin",
         ),
+        # The HNSW index depends on EMBEDDING_STORAGE and is created from
+        # core.embedding_storage.hnsw_index_ddl() at startup.
     )
 
     chunk_id: Mapped[uuid.UUID] = mapped_column(
-        PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+        PG_UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+        server_default=text("gen_random_uuid()"),
     )
-    document_id: Mapped[uuid.UUID] = mapped_column(
+    # Chunks belong to the stored file, shared by every chat it is attached to
+    file_id: Mapped[uuid.UUID] = mapped_column(
         PG_UUID(as_uuid=True),
-        ForeignKey("user_documents.document_id", ondelete="CASCADE"),
+        ForeignKey("stored_files.file_id", ondelete="CASCADE"),
         nullable=False,
-        index=True,  # simple B-tree for equality filter
+    )
+    # Position of the chunk within its file (0-based, in split order)
+    ordinal: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Source location from the loader, e.g. {"page": 3} or {"sheet": "Q1", "rows": "2-40"}
+    chunk_metadata: Mapped[dict] = mapped_column(
+        JSONB, nullable=False, default=dict, server_default=text("'{}'::jsonb")
     )
     content: Mapped[str] = mapped_column(nullable=False)
+    # 'simple' config: no stemming or stopwords, so identifiers match as typed
+    content_tsv: Mapped[str] = mapped_column(
+        TSVECTOR, Computed("to_tsvector('simple', content)", persisted=True)
+    )
     embedding: Mapped[list[float]] = mapped_column(
-        Vector(1536), nullable=False
-    )  # 1536 for OpenAI
+        embedding_column_type(), nullable=False
+    )  # vector / halfvec of EMBEDDING_DIMENSIONS
     created_at: Mapped[datetime] = mapped_column(
-        TIMESTAMP(timezone=True), default=lambda: datetime.now(UTC), nullable=False
+        TIMESTAMP(timezone=True),
+        default=lambda: datetime.now(UTC),
+        server_default=text("timezone('utc', now())"),
+        nullable=False,
     )
 
     # Relationships
-    document: Mapped["UserDocument"] = relationship(back_populates="chunks")
+    stored_file: Mapped["StoredFile"] = relationship(back_populates="chunks")
@@ -0,0 +1,31 @@
+# models/embedding_cache_model.py
+from datetime import datetime, UTC
+from sqlalchemy import Integer, String, TIMESTAMP
+from sqlalchemy.orm import Mapped, mapped_column
+from pgvector.sqlalchemy import Vector
+from core.config import settings
+from .base import Base
+
+
+class EmbeddingCache(Base):
+    """
+    Content-addressed store of chunk embeddings, keyed by
+    sha256(deployment, dimensions, normalized text).
+    """
+
+    __tablename__ = "embedding_cache"
+
+    content_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    embedding: Mapped[list[float]] = mapped_column(
+        Vector(settings.EMBEDDING_DIMENSIONS), nullable=False
+    )
+    hit_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), default=lambda: datetime.now(UTC), nullable=False
+    )
+    last_used_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True),
+        default=lambda: datetime.now(UTC),
+        nullable=False,
+        index=True,  # eviction scans oldest first
+    )
@@ -0,0 +1,47 @@
+# models/file_section_model.py
+import uuid
+from typing import TYPE_CHECKING
+from sqlalchemy import ForeignKey, Index, Integer, SmallInteger, text
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from core.embedding_storage import embedding_column_type
+from .base import Base
+
+if TYPE_CHECKING:
+    from models.stored_file_model import StoredFile
+
+
+class FileSection(Base):
+    """
+    Centroid (mean chunk embedding) of a whole stored file (level 0) or of a run
+    of SECTION_CHUNKS consecutive chunks (level 1), used to narrow a search to the
+    most relevant files and sections before ranking their chunks.
+    """
+
+    __tablename__ = "file_sections"
+    __table_args__ = (Index("ix_file_sections_file_level", "file_id", "level"),)
+
+    FILE_LEVEL = 0
+    SECTION_LEVEL = 1
+
+    section_id: Mapped[uuid.UUID] = mapped_column(
+        PG_UUID(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+        server_default=text("gen_random_uuid()"),
+    )
+    file_id: Mapped[uuid.UUID] = mapped_column(
+        PG_UUID(as_uuid=True),
+        ForeignKey("stored_files.file_id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    level: Mapped[int] = mapped_column(SmallInteger, nullable=False)
+    # Chunk ordinals covered, inclusive
+    ordinal_start: Mapped[int] = mapped_column(Integer, nullable=False)
+    ordinal_end: Mapped[int] = mapped_column(Integer, nullable=False)
+    embedding: Mapped[list[float]] = mapped_column(
+        embedding_column_type(), nullable=False
+    )  # same type as document_chunks.embedding
+
+    # Relationships
+    stored_file: Mapped["StoredFile"] = relationship(back_populates="sections")
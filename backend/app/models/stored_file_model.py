@@ -0,0 +1,71 @@
+# models/stored_file_model.py
+import uuid
+from datetime import datetime, UTC
+from sqlalchemy import ForeignKey, Index, Integer, String, TIMESTAMP, text
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from typing import TYPE_CHECKING
+from .base import Base
+
+if TYPE_CHECKING:
+    from models.users_model import Users
+    from models.user_document_model import UserDocument
+    from models.document_chunk_model import DocumentChunk
+    from models.file_section_model import FileSection
+
+
+class StoredFile(Base):
+    """
+    An ingested file in a user's library, identified by the sha256 of its bytes.
+    Chunks and embeddings belong to the stored file; chats reference it through
+    `UserDocument` links, so the same file is parsed and embedded only once.
+    """
+
+    __tablename__ = "stored_files"
+    __table_args__ = (
+        # One live copy per content; soft-deleted rows may linger until reaped
+        Index(
+            "uq_stored_files_user_digest_live",
+            "user_id",
+            "content_digest",
+            unique=True,
+            postgresql_where=text("deleted_at IS NULL"),
+        ),
+        # Reaper queue
+        Index(
+            "ix_stored_files_deleted_at",
+            "deleted_at",
+            postgresql_where=text("deleted_at IS NOT NULL"),
+        ),
+    )
+
+    file_id: Mapped[uuid.UUID] = mapped_column(
+        PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
+    )
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False
+    )
+    # sha256 hex of the uploaded bytes ("legacy-<id>" for files ingested before hashing)
+    content_digest: Mapped[str] = mapped_column(String(64), nullable=False)
+    file_name: Mapped[str] = mapped_column(String, nullable=False)
+    size_bytes: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    chunk_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), default=lambda: datetime.now(UTC), nullable=False
+    )
+    # Set when no chat uses the file anymore; its chunks are removed in the background
+    deleted_at: Mapped[datetime | None] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=True
+    )
+
+    # Relationships
+    users: Mapped["Users"] = relationship(back_populates="stored_files")
+    links: Mapped[list["UserDocument"]] = relationship(
+        back_populates="stored_file", passive_deletes=True
+    )
+    chunks: Mapped[list["DocumentChunk"]] = relationship(
+        back_populates="stored_file", passive_deletes=True
+    )
+    sections: Mapped[list["FileSection"]] = relationship(
+        back_populates="stored_file", passive_deletes=True
+    )
@@ -1,7 +1,7 @@
 # models/user_document_model.py
 import uuid
 from datetime import datetime, UTC
-from sqlalchemy import ForeignKey, Index, String, TIMESTAMP
+from sqlalchemy import ForeignKey, Index, String, TIMESTAMP, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import TYPE_CHECKING
@@ -10,12 +10,20 @@ from .base import Base
 if TYPE_CHECKING:
     from models.users_model import Users
     from models.chat_history_model import ChatHistory
-    from models.document_chunk_model import DocumentChunk
+    from models.stored_file_model import StoredFile
 
 
 class UserDocument(Base):
+    """
+    Link between a chat and a file of the user's library (`StoredFile`).
+    """
+
     __tablename__ = "user_documents"
-    __table_args__ = (Index("ix_user_documents_user_chat", "user_id", "chat_id"),)
+    __table_args__ = (
+        Index("ix_user_documents_user_chat", "user_id", "chat_id"),
+        UniqueConstraint("chat_id", "file_id", name="uq_user_documents_chat_file"),
+        Index("ix_user_documents_file_id", "file_id"),
+    )
 
     document_id: Mapped[uuid.UUID] = mapped_column(
         PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
@@ -26,9 +34,12 @@ class UserDocument(Base):
     chat_id: Mapped[uuid.UUID] = mapped_column(
         ForeignKey("chat_history.chat_id", ondelete="CASCADE"), nullable=False
     )
+    file_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("stored_files.file_id", ondelete="CASCADE"), nullable=False
+    )
 
     file_name: Mapped[str] = mapped_column(String, nullable=False)
-    file_path: Mapped[str] = mapped_column(String, nullable=False)
+    file_path: Mapped[str | None] = mapped_column(String, nullable=True)
     uploaded_at: Mapped[datetime] = mapped_column(
         TIMESTAMP(timezone=True), default=lambda: datetime.now(UTC), nullable=False
     )
@@ -36,6 +47,4 @@ class UserDocument(Base):
     # Relationships
     users: Mapped["Users"] = relationship(back_populates="documents")
     chat_history: Mapped["ChatHistory"] = relationship(back_populates="documents")
-    chunks: Mapped[list["DocumentChunk"]] = relationship(
-        back_populates="document", cascade="all, delete-orphan"
-    )
+    stored_file: Mapped["StoredFile"] = relationship(back_populates="links")
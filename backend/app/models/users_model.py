@@ -10,6 +10,7 @@ if TYPE_CHECKING:
     from models.chat_history_model import ChatHistory
     from models.subscriptions_model import Subscriptions
     from models.user_document_model import UserDocument
+    from models.stored_file_model import StoredFile
 
 
 class Users(Base):
@@ -40,3 +41,6 @@ class Users(Base):
     documents: Mapped[list["UserDocument"]] = relationship(
         back_populates="users", cascade="all, delete-orphan"
     )
+    stored_files: Mapped[list["StoredFile"]] = relationship(
+        back_populates="users", cascade="all, delete-orphan"
+    )
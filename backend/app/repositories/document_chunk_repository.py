@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, List, Sequence
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.document_chunk_model import DocumentChunk
+
+
+def vector_literal(embedding: Sequence[float]) -> str:
+    """
+    pgvector text representation, e.g. "[0.1,0.2,0.3]".
+    """
+    return "[" + ",".join(str(float(x)) for x in embedding) + "]"
+
+
+class DocumentChunkRepository:
+    # Columns streamed by COPY; ids and timestamps come from server defaults
+    COPY_COLUMNS: List[str] = [
+        "file_id",
+        "ordinal",
+        "chunk_metadata",
+        "content",
+        "embedding",
+    ]
+
+    @staticmethod
+    def _to_csv(rows: Iterable[Dict[str, Any]], columns: Sequence[str]) -> bytes:
+        buffer = io.StringIO()
+        # COPY's CSV format reads an unquoted empty field as NULL: quote every
+        # value so "" stays an empty string, and leave only None unquoted
+        writer = csv.writer(buffer, quoting=csv.QUOTE_NOTNULL)
+        for row in rows:
+            values = []
+            for column in columns:
+                value = row[column]
+                if column == "embedding":
+                    value = vector_literal(value)
+                elif isinstance(value, dict):
+                    value = json.dumps(value)
+                elif isinstance(value, str):
+                    value = value.replace("\x00", "")  # NUL is not valid in text
+                values.append(value)
+            writer.writerow(values)
+        return buffer.getvalue().encode("utf-8")
+
+    @staticmethod
+    async def copy_rows(
+        session: AsyncSession,
+        rows: Sequence[Dict[str, Any]],
+        table: str = DocumentChunk.__tablename__,
+        columns: Sequence[str] = COPY_COLUMNS,
+    ) -> int:
+        """
+        Stream chunk rows into Postgres with COPY on the session's own connection,
+        so they commit or roll back together with the rest of the transaction.
+        Bypasses the ORM unit of work entirely (no identity map, no per-row INSERT).
+
+        Args:
+            session: Active session; pending ORM state is flushed first so FK
+                targets (e.g. the parent StoredFile) exist.
+            rows: Mappings holding a value for every name in `columns`.
+
+        Returns:
+            Number of rows copied.
+        """
+        if not rows:
+            return 0
+        await session.flush()
+        connection = await session.connection()
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection  # asyncpg.Connection
+        await driver_connection.copy_to_table(
+            table,
+            source=io.BytesIO(DocumentChunkRepository._to_csv(rows, columns)),
+            columns=list(columns),
+            format="csv",
+        )
+        return len(rows)
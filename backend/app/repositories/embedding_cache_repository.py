@@ -0,0 +1,115 @@
+import hashlib
+import logging
+from datetime import datetime, UTC
+from typing import Dict, Iterable, List, Sequence
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from core.database import PostgreSQLDatabase
+from core.config import settings
+from core.metrics import get_cache_stats
+from models.embedding_cache_model import EmbeddingCache
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCacheRepository:
+    stats = get_cache_stats("embedding_cache")
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """
+        Collapse all whitespace runs so trivially different copies share a key.
+        """
+        return " ".join(text.split())
+
+    @staticmethod
+    def content_hash(text: str, deployment: str, dimensions: int) -> str:
+        """
+        Key for an already *normalized* text under a given embedding deployment.
+        """
+        digest = hashlib.sha256()
+        digest.update(f"{deployment}\x00{dimensions}\x00".encode("utf-8"))
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    async def get_many(hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """
+        Bulk lookup of cached embeddings. Hits get their `last_used_at` refreshed
+        so eviction keeps the entries that are actually being reused.
+        """
+        keys = list(set(hashes))
+        if not keys:
+            return {}
+        async with PostgreSQLDatabase.get_session() as session:
+            stmt = select(EmbeddingCache.content_hash, EmbeddingCache.embedding).where(
+                EmbeddingCache.content_hash.in_(keys)
+            )
+            rows = (await session.execute(stmt)).all()
+            found = {row.content_hash: list(row.embedding) for row in rows}
+            if found:
+                await session.execute(
+                    update(EmbeddingCache)
+                    .where(EmbeddingCache.content_hash.in_(list(found)))
+                    .values(
+                        last_used_at=datetime.now(UTC),
+                        hit_count=EmbeddingCache.hit_count + 1,
+                    )
+                )
+        EmbeddingCacheRepository.stats.record_hit(len(found))
+        EmbeddingCacheRepository.stats.record_miss(len(keys) - len(found))
+        return found
+
+    @staticmethod
+    async def put_many(entries: Dict[str, Sequence[float]]) -> None:
+        """
+        Store freshly computed embeddings. Concurrent writers of the same key are
+        harmless: the first insert wins and the rest are ignored.
+        """
+        if not entries:
+            return
+        now = datetime.now(UTC)
+        async with PostgreSQLDatabase.get_session() as session:
+            stmt = insert(EmbeddingCache).values(
+                [
+                    {
+                        "content_hash": key,
+                        "embedding": list(embedding),
+                        "created_at": now,
+                        "last_used_at": now,
+                    }
+                    for key, embedding in entries.items()
+                ]
+            )
+            await session.execute(
+                stmt.on_conflict_do_nothing(index_elements=["content_hash"])
+            )
+
+    @staticmethod
+    async def evict(max_entries: int = settings.EMBEDDING_CACHE_MAX_ENTRIES) -> int:
+        """
+        Trim the cache to `max_entries` rows, dropping the least recently used first.
+
+        Returns:
+            Number of evicted rows.
+        """
+        try:
+            async with PostgreSQLDatabase.get_session() as session:
+                cutoff = (
+                    select(EmbeddingCache.last_used_at)
+                    .order_by(EmbeddingCache.last_used_at.desc())
+                    .offset(max_entries)
+                    .limit(1)
+                    .scalar_subquery()
+                )
+                result = await session.execute(
+                    delete(EmbeddingCache).where(EmbeddingCache.last_used_at <= cutoff)
+                )
+                evicted = result.rowcount or 0
+            if evicted:
+                EmbeddingCacheRepository.stats.record_eviction(evicted)
+                logger.info(f"Evicted {evicted} embedding cache entries")
+            return evicted
+        except Exception as ex:
+            logger.error(f"Failed to evict embedding cache: {str(ex)}", exc_info=True)
+            return 0
@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, UTC
+from typing import Iterable, Optional, Tuple
+from sqlalchemy import delete, exists, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.config import settings
+from core.database import PostgreSQLDatabase
+from models.document_chunk_model import DocumentChunk
+from models.stored_file_model import StoredFile
+from models.user_document_model import UserDocument
+
+logger = logging.getLogger(__name__)
+
+
+class StoredFileRepository:
+    @staticmethod
+    async def get_by_digest(
+        session: AsyncSession, user_id: uuid.UUID, content_digest: str
+    ) -> Optional[StoredFile]:
+        stmt = select(StoredFile).where(
+            StoredFile.user_id == user_id,
+            StoredFile.content_digest == content_digest,
+            StoredFile.deleted_at.is_(None),
+        )
+        return (await session.execute(stmt)).scalar_one_or_none()
+
+    @staticmethod
+    async def get_or_create(
+        session: AsyncSession,
+        user_id: uuid.UUID,
+        content_digest: str,
+        file_name: str,
+        size_bytes: int,
+    ) -> Tuple[StoredFile, bool]:
+        """
+        Claim the library entry for a file's content.
+
+        A concurrent upload of the same bytes blocks on the unique key until the
+        first transaction finishes, then sees its (fully ingested) row. If the
+        conflicting row is soft-deleted before it can be read, the unique key
+        (live rows only) no longer applies and the insert is retried.
+
+        Returns:
+            The stored file and whether it was created (and still needs its chunks).
+        """
+        while True:
+            stmt = (
+                insert(StoredFile)
+                .values(
+                    file_id=uuid.uuid4(),
+                    user_id=user_id,
+                    content_digest=content_digest,
+                    file_name=file_name,
+                    size_bytes=size_bytes,
+                    chunk_count=0,
+                )
+                .on_conflict_do_nothing(
+                    index_elements=[StoredFile.user_id, StoredFile.content_digest],
+                    index_where=StoredFile.deleted_at.is_(None),
+                )
+                .returning(StoredFile.file_id)
+            )
+            file_id = (await session.execute(stmt)).scalar_one_or_none()
+            if file_id is not None:
+                return await session.get(StoredFile, file_id), True
+            existing = await StoredFileRepository.get_by_digest(
+                session, user_id, content_digest
+            )
+            if existing is not None:
+                return existing, False
+
+    @staticmethod
+    async def link(
+        session: AsyncSession,
+        stored_file: StoredFile,
+        chat_id: uuid.UUID,
+        file_name: Optional[str] = None,
+        file_path: Optional[str] = None,
+    ) -> Optional[uuid.UUID]:
+        """
+        Attach a stored file to a chat; attaching it twice is a no-op.
+
+        The file row is share-locked for the rest of the transaction, so it
+        cannot be soft-deleted as an orphan between this check and the insert
+        (see `mark_orphans_deleted`).
+
+        Returns:
+            document_id of the chat's link row, or None if the file is deleted.
+        """
+        alive = (
+            await session.execute(
+                select(StoredFile.file_id)
+                .where(
+                    StoredFile.file_id == stored_file.file_id,
+                    StoredFile.deleted_at.is_(None),
+                )
+                .with_for_update(read=True)
+            )
+        ).scalar_one_or_none()
+        if alive is None:
+            return None
+        stmt = (
+            insert(UserDocument)
+            .values(
+                document_id=uuid.uuid4(),
+                user_id=stored_file.user_id,
+                chat_id=chat_id,
+                file_id=stored_file.file_id,
+                file_name=file_name or stored_file.file_name,
+                file_path=file_path,
+            )
+            .on_conflict_do_nothing(constraint="uq_user_documents_chat_file")
+            .returning(UserDocument.document_id)
+        )
+        document_id = (await session.execute(stmt)).scalar_one_or_none()
+        if document_id is None:
+            document_id = (
+                await session.execute(
+                    select(UserDocument.document_id).where(
+                        UserDocument.chat_id == chat_id,
+                        UserDocument.file_id == stored_file.file_id,
+                    )
+                )
+            ).scalar_one()
+        return document_id
+
+    @staticmethod
+    async def mark_orphans_deleted(
+        session: AsyncSession, file_ids: Iterable[uuid.UUID]
+    ) -> int:
+        """
+        Soft-delete stored files that no chat links to anymore. This is a single
+        small UPDATE; their chunks are removed later by `reap`.
+
+        Returns:
+            Number of files marked.
+        """
+        ids = list(set(file_ids))
+        if not ids:
+            return 0
+        # Lock first (in a fixed order), then check for links in a separate
+        # statement: its fresh snapshot sees links committed by a concurrent
+        # `link` that held the row, so a just-attached file is never marked
+        await session.execute(
+            select(StoredFile.file_id)
+            .where(StoredFile.file_id.in_(ids), StoredFile.deleted_at.is_(None))
+            .order_by(StoredFile.file_id)
+            .with_for_update()
+        )
+        result = await session.execute(
+            update(StoredFile)
+            .where(
+                StoredFile.file_id.in_(ids),
+                StoredFile.deleted_at.is_(None),
+                ~exists().where(UserDocument.file_id == StoredFile.file_id),
+            )
+            .values(deleted_at=datetime.now(UTC))
+        )
+        return result.rowcount or 0
+
+    @staticmethod
+    async def reap(
+        batch_rows: int = settings.REAPER_BATCH_ROWS,
+        pause_ms: int = settings.REAPER_BATCH_PAUSE_MS,
+        max_batches: int = settings.REAPER_MAX_BATCHES,
+    ) -> int:
+        """
+        Physically remove soft-deleted files. Chunks go in bounded batches, each
+        in its own short transaction with a pause in between, so a large file
+        never holds locks or produces a WAL burst for long. The file row is
+        dropped once it has no chunks left.
+
+        Returns:
+            Number of chunks deleted in this run.
+        """
+        deleted = 0
+        batches = 0
+        try:
+            while batches < max_batches:
+                async with PostgreSQLDatabase.get_session() as session:
+                    file_id = (
+                        await session.execute(
+                            select(StoredFile.file_id)
+                            .where(StoredFile.deleted_at.is_not(None))
+                            .order_by(StoredFile.deleted_at)
+                            .limit(1)
+                        )
+                    ).scalar_one_or_none()
+                if file_id is None:
+                    break
+                while batches < max_batches:
+                    async with PostgreSQLDatabase.get_session() as session:
+                        batch = (
+                            select(DocumentChunk.chunk_id)
+                            .where(DocumentChunk.file_id == file_id)
+                            .limit(batch_rows)
+                            .scalar_subquery()
+                        )
+                        result = await session.execute(
+                            delete(DocumentChunk).where(DocumentChunk.chunk_id.in_(batch))
+                        )
+                    batches += 1
+                    deleted += result.rowcount or 0
+                    if (result.rowcount or 0) < batch_rows:
+                        break
+                    await asyncio.sleep(pause_ms / 1000)
+                else:
+                    break  # budget used up mid-file; resume next run
+                async with PostgreSQLDatabase.get_session() as session:
+                    await session.execute(
+                        delete(StoredFile).where(
+                            StoredFile.file_id == file_id,
+                            StoredFile.deleted_at.is_not(None),
+                        )
+                    )
+            if deleted:
+                logger.info(f"Reaped {deleted} chunks of deleted files")
+            return deleted
+        except Exception as ex:
+            logger.error(f"Failed to reap deleted files: {str(ex)}", exc_info=True)
+            return deleted
@@ -1,60 +1,118 @@
-import asyncio, os, aiofiles, uuid, tempfile, pickle, shutil
+import asyncio, uuid, pickle
+import numpy as np
 from pathlib import Path
 from itertools import islice
-from typing import Annotated, List, Optional, Sequence
+from typing import Annotated, Dict, Iterator, List, Optional, Sequence, Tuple
 from fastapi import HTTPException, UploadFile, status
 from pydantic import BaseModel, SecretStr
-from sqlalchemy import delete, select
+from sqlalchemy import (
+    and_,
+    delete,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    text,
+    union_all,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.database import PostgreSQLDatabase
 from core.redis_cache import RedisCache
 from core.config import settings
+from core.embedding_storage import quantized
 from models.ai_models_model import AiModels
 from models.response_model import ChatResponse
 from models.chat_history_model import ChatHistory
 from models.user_document_model import UserDocument
+from models.stored_file_model import StoredFile
 from models.document_chunk_model import DocumentChunk
+from models.file_section_model import FileSection
 from langgraph.prebuilt import InjectedState
 from langchain_openai import AzureOpenAIEmbeddings
+from pgvector.sqlalchemy import Vector
 from repositories.websocket_manager import ws_manager
+from repositories.embedding_cache_repository import EmbeddingCacheRepository
+from repositories.document_chunk_repository import DocumentChunkRepository
+from repositories.stored_file_repository import StoredFileRepository
+from utils.query_embedder import query_embedder
+from utils.context_window import ChunkRef, build_windows
+from utils.pdf_loader import load_pdf
+from utils.tabular_loader import TABULAR_EXTENSIONS, iter_table_documents
+from utils.upload_spool import SpooledUpload
+from utils.centroids import CentroidBuilder
+from utils.mmr import as_matrix, cosine_distances, maximal_marginal_relevance
+from utils.tool_memo import forget_chat
 from langchain_core.documents import Document
-from pypdf import PdfReader
 from langchain.text_splitter import (
     RecursiveCharacterTextSplitter,
     Language,  # for code‑aware splitting
     MarkdownTextSplitter,  # optional markdown logic
 )
 from langchain_community.document_loaders import (
-    PyPDFLoader,
-    UnstructuredPDFLoader,  # .pdf with OCR
     UnstructuredWordDocumentLoader,  # .docx
     UnstructuredPowerPointLoader,  # .pptx
-    UnstructuredExcelLoader,  # .xlsx
+    UnstructuredExcelLoader,  # .xls
     UnstructuredEmailLoader,  # .eml / .msg
     UnstructuredHTMLLoader,  # .html / .htm
-    CSVLoader,  # .csv
     TextLoader,  # .txt / any plain‑text
 )
 
 from services.management_service import ManagementService
 
 MAX_BYTES = 30 * 1024 * 1024  # 30 MB
+COPY_BATCH_ROWS = 2048  # rows buffered per COPY round trip
+TS_CONFIG = literal_column("'simple'::regconfig")  # matches content_tsv
+RRF_K = 60  # reciprocal rank fusion damping constant
+HYBRID_CANDIDATE_FACTOR = 4  # candidates per ranking = top_k * factor
+DEFAULT_CONTEXT_CHARS = 6000  # budget for neighbour-expanded results
+MAX_NEIGHBORS = 5
+# Formats whose LangChain loader needs a file on disk (see _pick_loader)
+PATH_LOADER_EXTENSIONS = {
+    ".docx",
+    ".pptx",
+    ".ppt",
+    ".xls",
+    ".html",
+    ".htm",
+    ".eml",
+    ".msg",
+}
+# Loader metadata worth keeping: where in the source file a chunk came from
+SOURCE_METADATA_KEYS = {
+    "page",
+    "page_label",
+    "page_number",
+    "category",
+    "sheet",
+    "rows",
+    "row",
+    "section",
+    "start_index",  # splitter offset, lets neighbouring chunks be merged exactly
+}
 
 
 class DocumentRetrieverTool(BaseModel):
     query: str
     top_k: int
     search_pattern: str
+    neighbors: int = 0
+    max_context_chars: int = DEFAULT_CONTEXT_CHARS
+    diversify: bool = False
+    max_distance: Optional[float] = None
     state: Annotated[dict, InjectedState]
 
 
 class DocumentService:
+    # Embedding clients are reused across requests: (endpoint, deployment, key) -> client
+    _embedding_clients: Dict[tuple, AzureOpenAIEmbeddings] = {}
+
     def __init__(self) -> None:
         self.embedding_model: AzureOpenAIEmbeddings
 
     async def get_llm_from_model(self) -> AzureOpenAIEmbeddings:
         """
-        Initializes and returns an AzureOpenAIEmbeddings instance using the model's details.
+        Returns a (cached) AzureOpenAIEmbeddings instance for the active embedding model.
         """
         available_models: List[AiModels] = await ManagementService.get_all_models()
         embed_model = next(
@@ -67,18 +125,29 @@ class DocumentService:
         )
         if embed_model is None:
             raise Exception("Embedding model is not available atm")
-        return AzureOpenAIEmbeddings(
-            dimensions=1536,
-            azure_endpoint=embed_model.endpoint,
-            api_key=SecretStr(embed_model.api_key),
-            azure_deployment=embed_model.deployment_name,
-            model=embed_model.deployment_name,
-            api_version=settings.AZURE_OPENAI_API_VERSION,
+        client_key = (
+            embed_model.endpoint,
+            embed_model.deployment_name,
+            embed_model.api_key,
         )
+        client = DocumentService._embedding_clients.get(client_key)
+        if client is None:
+            client = AzureOpenAIEmbeddings(
+                dimensions=settings.EMBEDDING_DIMENSIONS,
+                azure_endpoint=embed_model.endpoint,
+                api_key=SecretStr(embed_model.api_key),
+                azure_deployment=embed_model.deployment_name,
+                model=embed_model.deployment_name,
+                api_version=settings.AZURE_OPENAI_API_VERSION,
+            )
+            DocumentService._embedding_clients[client_key] = client
+        return client
 
     async def get_embedding_for_text(self, text: str) -> List[float]:
         """
         Generate embedding for the given text.
+        Goes through the shared query cache, so repeated and concurrent identical
+        queries cost at most one upstream call.
 
         Args:
             text: The input text to generate an embedding for.
@@ -86,8 +155,7 @@ class DocumentService:
         Returns:
             A list of floats representing the embedding.
         """
-        text = text.replace("\n", " ")
-        return await self.embedding_model.aembed_query(text)
+        return await query_embedder.embed(self.embedding_model, text)
 
     async def store_file(
         self,
@@ -96,53 +164,51 @@ class DocumentService:
         file: UploadFile,
         chat_id: Optional[uuid.UUID] = None,
     ) -> ChatResponse:
-        path = ""
+        upload = SpooledUpload(file.filename)
         new_chat_id = None
         try:
             # -----------------------------------------------------------------
             if chat_id is None:
-                async with PostgreSQLDatabase.get_session() as session:
-                    new_chat = ChatHistory(
-                        user_id=user_id,
-                        history_blob=pickle.dumps({}),
-                        chat_title="",
-                        token_count=0,
-                    )
-                    session.add(new_chat)
-                    await session.flush()
-                    new_chat_id = new_chat.chat_id
-                    await session.commit()
+                new_chat_id = await self._create_chat(user_id)
 
             # -----------------------------------------------------------------
-            path = await self._save_file_locally(file)
-            self.embedding_model = await self.get_llm_from_model()
+            await self._read_upload(file, upload)
             async with PostgreSQLDatabase.get_session() as session:
-                doc = UserDocument(
-                    user_id=user_id,
-                    chat_id=chat_id or new_chat_id,
-                    file_name=file.filename,
-                    file_path=path,
-                )
-                session.add(doc)
-                await session.flush()  # we need doc.document_id
-                await ws_manager.send_to_user(
-                    sid=user_id,
-                    message_type="ToolProcess",
-                    data={
-                        "chat_id": str(chat_id if chat_id else user_id),
-                        "content": f"Processing {file.filename}...",
-                    },
+                stored_file, created = await StoredFileRepository.get_or_create(
+                    session, user_id, upload.digest, file.filename, upload.size
                 )
-                await self._embed_and_persist_chunks(path, doc.document_id, session)
-                await ws_manager.send_to_user(
-                    sid=user_id,
-                    message_type="ToolProcess",
-                    data={
-                        "chat_id": str(chat_id if chat_id else user_id),
-                        "content": f"Finished processing {file.filename}.",
-                    },
+                if created:
+                    # New content: parse and embed once for every chat it joins
+                    self.embedding_model = await self.get_llm_from_model()
+                    await ws_manager.send_to_user(
+                        sid=user_id,
+                        message_type="ToolProcess",
+                        data={
+                            "chat_id": str(chat_id if chat_id else user_id),
+                            "content": f"Processing {file.filename}...",
+                        },
+                    )
+                    stored_file.chunk_count = await self._embed_and_persist_chunks(
+                        upload, stored_file, session
+                    )
+                    await ws_manager.send_to_user(
+                        sid=user_id,
+                        message_type="ToolProcess",
+                        data={
+                            "chat_id": str(chat_id if chat_id else user_id),
+                            "content": f"Finished processing {file.filename}.",
+                        },
+                    )
+                document_id = await StoredFileRepository.link(
+                    session, stored_file, chat_id or new_chat_id, file.filename
                 )
+                if document_id is None:
+                    raise ValueError(
+                        f"{file.filename} was deleted while uploading. Please try again."
+                    )
                 await session.commit()
+            if chat_id is not None:
+                await forget_chat(chat_id)  # document tool results are outdated
             return ChatResponse(success=True, chat_id=chat_id or new_chat_id)
         except ValueError as e:
             return ChatResponse(
@@ -153,14 +219,88 @@ class DocumentService:
                 success=False, chat_id=chat_id or new_chat_id, error_message=str(e)
             )
         finally:
-            # Finally delete the uploaded file
-            if path not in ["", None] and os.path.exists(path):
-                os.remove(path)
-                shutil.rmtree(os.path.dirname(path))
+            # Drop the buffer; temp files (large uploads only) go off the event loop
+            await upload.cleanup()
+
+    async def attach_file(
+        self,
+        *,
+        user_id: uuid.UUID,
+        file_id: uuid.UUID,
+        chat_id: Optional[uuid.UUID] = None,
+    ) -> ChatResponse:
+        """
+        Attach a file from the user's library to a chat (a new one when chat_id
+        is None). The file's chunks are shared, so nothing is parsed or embedded.
+        """
+        new_chat_id = None
+        try:
+            async with PostgreSQLDatabase.get_session() as session:
+                stored_file = await session.get(StoredFile, file_id)
+                if (
+                    stored_file is None
+                    or stored_file.user_id != user_id
+                    or stored_file.deleted_at is not None
+                ):
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="File not found",
+                    )
+                if chat_id is not None:
+                    chat = await session.get(ChatHistory, chat_id)
+                    if chat is None or chat.user_id != user_id:
+                        raise HTTPException(
+                            status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Conversation not found",
+                        )
+            if chat_id is None:
+                new_chat_id = await self._create_chat(user_id)
+            async with PostgreSQLDatabase.get_session() as session:
+                # Checks deleted_at again under a row lock: the file may have
+                # been deleted since the lookup above
+                document_id = await StoredFileRepository.link(
+                    session, stored_file, chat_id or new_chat_id
+                )
+                if document_id is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="File not found",
+                    )
+            if chat_id is not None:
+                await forget_chat(chat_id)  # document tool results are outdated
+            return ChatResponse(success=True, chat_id=chat_id or new_chat_id)
+        except HTTPException:
+            raise
+        except Exception as e:
+            return ChatResponse(
+                success=False, chat_id=chat_id or new_chat_id, error_message=str(e)
+            )
 
-    async def get_all_files_for_user(self, user_id: uuid.UUID) -> List[UserDocument]:
+    @staticmethod
+    async def _create_chat(user_id: uuid.UUID) -> uuid.UUID:
+        async with PostgreSQLDatabase.get_session() as session:
+            new_chat = ChatHistory(
+                user_id=user_id,
+                history_blob=pickle.dumps({}),
+                chat_title="",
+                token_count=0,
+            )
+            session.add(new_chat)
+            await session.flush()
+            new_chat_id = new_chat.chat_id
+            await session.commit()
+        return new_chat_id
+
+    async def get_all_files_for_user(self, user_id: uuid.UUID) -> List[StoredFile]:
+        """
+        The user's document library: every ingested file, whichever chats use it.
+        """
         async with PostgreSQLDatabase.get_session() as session:
-            stmt = select(UserDocument).where(UserDocument.user_id == user_id)
+            stmt = (
+                select(StoredFile)
+                .where(StoredFile.user_id == user_id, StoredFile.deleted_at.is_(None))
+                .order_by(StoredFile.created_at.desc())
+            )
             results = await session.execute(stmt)
             return list(results.scalars().unique().all())
 
@@ -176,11 +316,15 @@ class DocumentService:
 
     async def del_files_for_chat(self, user_id: uuid.UUID, chat_id: uuid.UUID):
         async with PostgreSQLDatabase.get_session() as session:
-            stmt = delete(UserDocument).where(
-                UserDocument.user_id == user_id, UserDocument.chat_id == chat_id
+            stmt = (
+                delete(UserDocument)
+                .where(UserDocument.user_id == user_id, UserDocument.chat_id == chat_id)
+                .returning(UserDocument.file_id)
             )
-            await session.execute(stmt)
+            file_ids = (await session.execute(stmt)).scalars().all()
+            await StoredFileRepository.mark_orphans_deleted(session, file_ids)
             await session.commit()
+        await forget_chat(chat_id)
 
     async def delete_file(self, user_id: uuid.UUID, document_id: List[uuid.UUID]):
         async with PostgreSQLDatabase.get_session() as session:
@@ -204,35 +348,54 @@ class DocumentService:
                         detail="You do not have permission to delete one or more files",
                     )
 
-            # Delete the documents
+            # Detach the documents; files no other chat uses are soft-deleted and
+            # their chunks removed in the background (StoredFileRepository.reap)
             await session.execute(
                 delete(UserDocument).where(UserDocument.document_id.in_(document_id))
             )
+            await StoredFileRepository.mark_orphans_deleted(
+                session, [document.file_id for document in documents]
+            )
             await session.commit()
+        for chat_id in {document.chat_id for document in documents}:
+            await forget_chat(chat_id)
 
     async def get_relevant_docs(
         self,
         query: str,
         top_k: int = 3,
         search_pattern: str = "cosine",
+        neighbors: int = 0,
+        max_context_chars: int = DEFAULT_CONTEXT_CHARS,
+        diversify: bool = False,
+        max_distance: Optional[float] = None,
         state: Optional[dict] = None,
     ) -> List[Document]:
         """
-        Retrieve relevant document chunks based on the user's query using either semantic or keyword search.
+        Retrieve relevant document chunks based on the user's query using semantic, keyword or hybrid search.
 
         Args:
             query: The term to search in the documents.
             top_k: Number of most relevant chunks to return.
             search_pattern: Search strategy to use. Options:
                 - "cosine": Use semantic similarity with vector embeddings (recommended for natural language questions).
-                - "simple_keyword_search": Use keyword matching (better for exact phrase lookup or technical terms like unique IDs).
+                - "simple_keyword_search": Use full-text keyword matching (better for exact phrase lookup or technical terms like unique IDs).
+                - "hybrid": Combine semantic and keyword rankings (good when the question mixes natural language with exact terms, names or IDs).
+                - "two_stage": Semantic search that first picks the most relevant files and sections, then ranks only their chunks (fast for chats with many or very large files).
+            neighbors: Number of adjacent chunks (0-5) to include on each side of every match, merged into one continuous passage.
+            max_context_chars: Character budget for all returned passages when neighbors > 0.
+            diversify: Drop near-duplicate chunks (maximal marginal relevance) so each returned chunk adds new information. Not used by "simple_keyword_search".
+            max_distance: Optional cosine distance cutoff (0 = identical, 1 = unrelated); weaker matches are dropped. Not used by "simple_keyword_search".
 
         Returns:
-            A list of Document objects containing the most relevant chunks.
+            A list of Document objects containing the most relevant chunks (or passages), with their position and cosine distance in metadata.
 
         Recommended use:
             - Use "cosine" for general questions, paraphrased queries, or when semantic meaning is important.
             - Use "simple_keyword_search" only when the query is like to unique Identifier, do not require semantic meaning.
+            - Use "hybrid" when the query contains both a question and specific keywords that must appear.
+            - Use "two_stage" instead of "cosine" when the chat has many attached files or very long documents and the question is about one topic.
+            - Use neighbors=1 or 2 when the answer likely spans more than one short fragment (tables, procedures, long paragraphs) instead of searching again.
         """
         if not state:
             return []
@@ -244,135 +407,598 @@ class DocumentService:
                 "content": "Retrieving relevant sections...",
             },
         )
-        self.embedding_model = await self.get_llm_from_model()
-        # Step 1: Generate query embedding
-        query_embedding = await self.get_embedding_for_text(query)
+        query_embedding: List[float] = []
+        if search_pattern != "simple_keyword_search":
+            # Keyword mode never needs the query embedding
+            self.embedding_model = await self.get_llm_from_model()
+            query_embedding = await self.get_embedding_for_text(query)
+
+        # Over-fetch candidates with their vectors for the post-retrieval stage
+        rerank = bool(query_embedding) and (diversify or max_distance is not None)
+        fetch_k = top_k * settings.MMR_FETCH_FACTOR if rerank else top_k
 
         async with PostgreSQLDatabase.get_session() as session:
-            if search_pattern == "simple_keyword_search":
-                stmt = (
-                    select(DocumentChunk.chunk_id, DocumentChunk.content)
-                    .join(
-                        UserDocument,
-                        UserDocument.document_id == DocumentChunk.document_id,
-                    )
-                    .where(
-                        UserDocument.user_id == state["user_id"],
-                        UserDocument.chat_id == uuid.UUID(state["chat_id"]),
-                        DocumentChunk.content.contains(query),
-                    )
-                    .limit(top_k)
+            file_ids = await self._chat_file_ids(
+                session, state["user_id"], uuid.UUID(state["chat_id"])
+            )
+            if not file_ids:
+                return []
+            filters = (DocumentChunk.file_id.in_(file_ids),)
+            if search_pattern == "two_stage":
+                filters = await self._coarse_filters(
+                    session, query_embedding, file_ids
                 )
+            if search_pattern == "simple_keyword_search":
+                stmt = self._keyword_search_stmt(query, top_k, filters)
             else:
-                # Also supports max_inner_product, cosine_distance, l1_distance, hamming_distance, and jaccard_distance
-                distance_expr = DocumentChunk.embedding.cosine_distance(query_embedding)
-                stmt = (
-                    select(
-                        DocumentChunk.chunk_id,
-                        DocumentChunk.content,
-                        distance_expr.label("distance"),
-                    )
-                    .join(
-                        UserDocument,
-                        UserDocument.document_id == DocumentChunk.document_id,
+                exact = await self._prepare_vector_scan(session, filters)
+                if search_pattern == "hybrid":
+                    stmt = self._hybrid_search_stmt(
+                        query, query_embedding, fetch_k, filters, exact, rerank
                     )
-                    .where(
-                        UserDocument.user_id == state["user_id"],
-                        UserDocument.chat_id == uuid.UUID(state["chat_id"]),
+                else:
+                    stmt = self._vector_search_stmt(
+                        query_embedding, fetch_k, filters, exact, rerank
                     )
-                    .order_by(distance_expr.asc())  # closest first = more relevant
-                    .limit(top_k)
-                )
             results = (await session.execute(stmt)).all()
+            distances = {
+                row.chunk_id: float(row.distance)
+                for row in results
+                if "distance" in row._fields
+            }
+            if rerank and results:
+                results, distances = self._rerank(
+                    results, query_embedding, top_k, diversify, max_distance
+                )
+            if neighbors > 0 and results:
+                return await self._expand_neighbors(
+                    session,
+                    results,
+                    distances,
+                    min(neighbors, MAX_NEIGHBORS),
+                    max_context_chars,
+                )
         # Convert each row to a Document object
         return [
             Document(
-                # id=str(row.chunk_id),
+                id=str(row.chunk_id),
                 page_content=row.content,
-                # metadata={
-                #     "distance": float(row.distance)
-                # },
+                metadata={
+                    "file_id": str(row.file_id),
+                    "ordinal": row.ordinal,
+                    **row.chunk_metadata,
+                    **(
+                        {"distance": round(distances[row.chunk_id], 4)}
+                        if row.chunk_id in distances
+                        else {}
+                    ),
+                },
             )
             for row in results
         ]
 
-    async def _save_file_locally(self, file: UploadFile) -> str:
+    @staticmethod
+    def _rerank(
+        rows: Sequence,
+        query_embedding: List[float],
+        top_k: int,
+        diversify: bool,
+        max_distance: Optional[float],
+    ) -> Tuple[List, Dict[uuid.UUID, float]]:
+        """
+        Distance cutoff and MMR diversification over the over-fetched candidates,
+        done on the fetched vectors in NumPy (no extra round trip).
+
+        Returns:
+            The kept rows in result order and their cosine distances.
+        """
+        vectors = as_matrix([row.embedding for row in rows])
+        row_distances = cosine_distances(query_embedding, vectors)
+        keep = np.arange(len(rows))
+        if max_distance is not None:
+            keep = keep[row_distances <= max_distance]
+        if diversify:
+            picked = maximal_marginal_relevance(
+                query_embedding, vectors[keep], top_k, settings.MMR_LAMBDA
+            )
+            keep = keep[picked]
+        else:
+            keep = keep[:top_k]
+        kept = [rows[i] for i in keep]
+        return kept, {rows[i].chunk_id: float(row_distances[i]) for i in keep}
+
+    async def _expand_neighbors(
+        self,
+        session: AsyncSession,
+        hits: Sequence,
+        distances: Dict[uuid.UUID, float],
+        radius: int,
+        max_chars: int,
+    ) -> List[Document]:
+        """
+        Fetch the chunks around every hit in one query and merge them into
+        deduplicated passages under the character budget.
+        """
+        ranges = [
+            and_(
+                DocumentChunk.file_id == hit.file_id,
+                DocumentChunk.ordinal.between(
+                    hit.ordinal - radius, hit.ordinal + radius
+                ),
+            )
+            for hit in hits
+        ]
+        stmt = select(
+            DocumentChunk.file_id,
+            DocumentChunk.ordinal,
+            DocumentChunk.content,
+            DocumentChunk.chunk_metadata,
+        ).where(or_(*ranges))
+        chunks = {
+            (row.file_id, row.ordinal): ChunkRef(
+                row.file_id, row.ordinal, row.content, row.chunk_metadata
+            )
+            for row in (await session.execute(stmt)).all()
+        }
+        windows = build_windows(
+            [(hit.file_id, hit.ordinal) for hit in hits],
+            chunks,
+            radius,
+            max_chars,
+        )
+        # A window is as close as the best hit it contains
+        hit_distances = {
+            (hit.file_id, hit.ordinal): distances[hit.chunk_id]
+            for hit in hits
+            if hit.chunk_id in distances
+        }
+        return [
+            Document(
+                page_content=window.content,
+                metadata={
+                    "file_id": str(window.document_id),
+                    "ordinal_start": window.start,
+                    "ordinal_end": window.end,
+                    **self._merge_chunk_metadata(window.chunk_metadata),
+                    **self._window_distance(window, hit_distances),
+                },
+            )
+            for window in windows
+        ]
+
+    @staticmethod
+    def _window_distance(
+        window, hit_distances: Dict[Tuple[uuid.UUID, int], float]
+    ) -> dict:
+        inside = [
+            distance
+            for (document_id, ordinal), distance in hit_distances.items()
+            if document_id == window.document_id
+            and window.start <= ordinal <= window.end
+        ]
+        return {"distance": round(min(inside), 4)} if inside else {}
+
+    @staticmethod
+    def _merge_chunk_metadata(items: List[dict]) -> dict:
+        """
+        Collapse per-chunk source metadata: a value shared by every chunk is kept
+        as is, differing values become a list (e.g. pages [3, 4]).
+        """
+        merged: dict = {}
+        for item in items:
+            for key, value in item.items():
+                merged.setdefault(key, [])
+                if value not in merged[key]:
+                    merged[key].append(value)
+        return {k: v[0] if len(v) == 1 else v for k, v in merged.items()}
+
+    @staticmethod
+    def _chunk_columns(source=DocumentChunk, with_embedding: bool = False):
+        """
+        Columns every search statement returns, from the model or a CTE's `.c`.
+        """
+        columns = (
+            source.chunk_id,
+            source.content,
+            source.file_id,
+            source.ordinal,
+            source.chunk_metadata,
+        )
+        return (*columns, source.embedding) if with_embedding else columns
+
+    @staticmethod
+    def _ts_query(query: str):
+        # Same 'simple' config as the generated content_tsv column
+        return func.websearch_to_tsquery(TS_CONFIG, query)
+
+    @staticmethod
+    async def _chat_file_ids(
+        session: AsyncSession, user_id, chat_id: uuid.UUID
+    ) -> List[uuid.UUID]:
+        """
+        Live stored files attached to the chat; chunks are scoped by these ids.
+        """
+        stmt = (
+            select(UserDocument.file_id)
+            .join(StoredFile, StoredFile.file_id == UserDocument.file_id)
+            .where(
+                UserDocument.user_id == user_id,
+                UserDocument.chat_id == chat_id,
+                StoredFile.deleted_at.is_(None),
+            )
+        )
+        return list((await session.execute(stmt)).scalars().all())
+
+    @staticmethod
+    async def _coarse_filters(
+        session: AsyncSession, query_embedding: List[float], file_ids: List[uuid.UUID]
+    ) -> tuple:
+        """
+        First stage of "two_stage" search: rank file centroids (when the chat has
+        more than COARSE_TOP_FILES files), then section centroids inside the kept
+        files, and restrict the chunk search to the best sections' ordinal ranges.
+        """
+        if len(file_ids) > settings.COARSE_TOP_FILES:
+            stmt = (
+                select(FileSection.file_id)
+                .where(
+                    FileSection.file_id.in_(file_ids),
+                    FileSection.level == FileSection.FILE_LEVEL,
+                )
+                .order_by(FileSection.embedding.cosine_distance(query_embedding))
+                .limit(settings.COARSE_TOP_FILES)
+            )
+            file_ids = list((await session.execute(stmt)).scalars().all())
+        stmt = (
+            select(
+                FileSection.file_id, FileSection.ordinal_start, FileSection.ordinal_end
+            )
+            .where(
+                FileSection.file_id.in_(file_ids),
+                FileSection.level == FileSection.SECTION_LEVEL,
+            )
+            .order_by(FileSection.embedding.cosine_distance(query_embedding))
+            .limit(settings.COARSE_TOP_SECTIONS)
+        )
+        sections = (await session.execute(stmt)).all()
+        if not sections:
+            # No centroids (yet): fall back to the whole chat
+            return (DocumentChunk.file_id.in_(file_ids),)
+        return (
+            or_(
+                *(
+                    and_(
+                        DocumentChunk.file_id == section.file_id,
+                        DocumentChunk.ordinal.between(
+                            section.ordinal_start, section.ordinal_end
+                        ),
+                    )
+                    for section in sections
+                )
+            ),
+        )
+
+    @staticmethod
+    async def _prepare_vector_scan(session: AsyncSession, filters: Sequence) -> bool:
+        """
+        Pick the plan for a per-chat vector search.
+
+        Small chats are searched exactly (filter first, then sort every candidate),
+        which is both faster and perfectly accurate. Large chats use the HNSW index
+        with iterative scanning, so the index keeps walking until enough rows pass
+        the chat filter instead of returning neighbours from other chats.
+
+        Returns:
+            True when the caller should build the exact-search statement.
+        """
+        chunk_count = (
+            await session.execute(
+                select(func.count()).select_from(DocumentChunk).where(*filters)
+            )
+        ).scalar_one()
+        if chunk_count <= settings.EXACT_SEARCH_MAX_CHUNKS:
+            return True
+        # set_config(..., true) == SET LOCAL: scoped to this transaction only
+        await session.execute(
+            text("SELECT set_config('hnsw.ef_search', :value, true)"),
+            {"value": str(settings.HNSW_EF_SEARCH)},
+        )
+        if settings.HNSW_ITERATIVE_SCAN:
+            await session.execute(
+                text("SELECT set_config('hnsw.iterative_scan', :value, true)"),
+                {"value": settings.HNSW_ITERATIVE_SCAN},
+            )
+        return False
+
+    def _keyword_search_stmt(self, query: str, top_k: int, filters: Sequence):
+        ts_query = self._ts_query(query)
+        rank_expr = func.ts_rank_cd(DocumentChunk.content_tsv, ts_query).label(
+            "ts_rank"
+        )
+        return (
+            select(*self._chunk_columns(), rank_expr)
+            .where(*filters, DocumentChunk.content_tsv.op("@@")(ts_query))
+            .order_by(rank_expr.desc())  # GIN index narrows, rank orders
+            .limit(top_k)
+        )
+
+    def _vector_search_stmt(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        filters: Sequence,
+        exact: bool = False,
+        with_embedding: bool = False,
+    ):
+        if exact:
+            # MATERIALIZED keeps the planner from pushing the ORDER BY into the
+            # HNSW index: rows are fetched through the (file_id, ordinal) B-tree
+            # and every one of them is ranked.
+            scoped = (
+                select(*self._chunk_columns(), DocumentChunk.embedding)
+                .where(*filters)
+                .cte("scoped_chunks")
+                .prefix_with("MATERIALIZED")
+            )
+            distance_expr = scoped.c.embedding.cosine_distance(query_embedding)
+            return (
+                select(
+                    *self._chunk_columns(scoped.c, with_embedding),
+                    distance_expr.label("distance"),
+                )
+                .order_by(distance_expr.asc())
+                .limit(top_k)
+            )
+
+        if settings.EMBEDDING_STORAGE == "binary":
+            # Walk the 1-bit HNSW index by hamming distance, then re-rank the
+            # over-fetched candidates by exact cosine distance
+            query_code = quantized(
+                literal(query_embedding, Vector(settings.EMBEDDING_DIMENSIONS))
+            )
+            hamming_expr = quantized(DocumentChunk.embedding).op("<~>")(query_code)
+            candidates = (
+                select(*self._chunk_columns(), DocumentChunk.embedding)
+                .where(*filters)
+                .order_by(hamming_expr.asc())
+                .limit(top_k * settings.BINARY_RERANK_FACTOR)
+                .cte("bq_candidates")
+                .prefix_with("MATERIALIZED")
+            )
+            distance_expr = candidates.c.embedding.cosine_distance(query_embedding)
+            return (
+                select(
+                    *self._chunk_columns(candidates.c, with_embedding),
+                    distance_expr.label("distance"),
+                )
+                .order_by(distance_expr.asc())
+                .limit(top_k)
+            )
+
+        # Also supports max_inner_product, cosine_distance, l1_distance, hamming_distance, and jaccard_distance
+        distance_expr = DocumentChunk.embedding.cosine_distance(query_embedding)
+        ann_hits = (
+            select(
+                *self._chunk_columns(with_embedding=with_embedding),
+                distance_expr.label("distance"),
+            )
+            .where(*filters)
+            .order_by(distance_expr.asc())  # closest first = more relevant
+            .limit(top_k)
+            .cte("ann_hits")
+            .prefix_with("MATERIALIZED")
+        )
+        # relaxed_order iterative scans may return rows slightly out of order
+        return select(
+            *self._chunk_columns(ann_hits.c, with_embedding), ann_hits.c.distance
+        ).order_by(ann_hits.c.distance.asc())
+
+    def _hybrid_search_stmt(
+        self,
+        query: str,
+        query_embedding: List[float],
+        top_k: int,
+        filters: Sequence,
+        exact: bool = False,
+        with_embedding: bool = False,
+    ):
+        """
+        Reciprocal rank fusion of the vector and full-text rankings, in one query:
+        score = sum(1 / (RRF_K + rank)) over the lists a chunk appears in.
+        """
+        candidates = top_k * HYBRID_CANDIDATE_FACTOR
+
+        vector_hits = self._vector_search_stmt(
+            query_embedding, candidates, filters, exact
+        ).subquery("vector_hits")
+        vector_ranked = select(
+            vector_hits.c.chunk_id,
+            func.row_number().over(order_by=vector_hits.c.distance).label("rank"),
+        )
+
+        keyword_hits = self._keyword_search_stmt(query, candidates, filters).subquery(
+            "keyword_hits"
+        )
+        keyword_ranked = select(
+            keyword_hits.c.chunk_id,
+            func.row_number()
+            .over(order_by=keyword_hits.c.ts_rank.desc())
+            .label("rank"),
+        )
+
+        fused = union_all(vector_ranked, keyword_ranked).subquery("fused")
+        score = func.sum(1.0 / (RRF_K + fused.c.rank)).label("score")
+        return (
+            select(*self._chunk_columns(with_embedding=with_embedding), score)
+            .join(fused, fused.c.chunk_id == DocumentChunk.chunk_id)
+            .group_by(DocumentChunk.chunk_id)  # PK: other columns are dependent
+            .order_by(score.desc())
+            .limit(top_k)
+        )
+
+    async def _read_upload(self, file: UploadFile, upload: SpooledUpload) -> None:
+        """
+        Stream the request body into `upload` (memory for small files, a temp
+        file beyond UPLOAD_SPOOL_MAX_BYTES), hashing it on the way.
+        """
         try:
-            bytes_written = 0
-            temp_dir = tempfile.mkdtemp()
-            path = os.path.join(temp_dir, f"{uuid.uuid4()}_{file.filename}")
-            async with aiofiles.open(path, "wb") as f:
-                while chunk := await file.read(8 * 1024 * 1024):  # 8 MB
-                    bytes_written += len(chunk)
-                    if bytes_written > MAX_BYTES:
-                        raise HTTPException(
-                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                            detail=f"File exceeds {MAX_BYTES / 1024 / 1024} MB limit.",
-                        )
-                    await f.write(chunk)
-            if bytes_written == 0:
+            while chunk := await file.read(1024 * 1024):  # 1 MB
+                if upload.size + len(chunk) > MAX_BYTES:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"File exceeds {MAX_BYTES / 1024 / 1024} MB limit.",
+                    )
+                await upload.write(chunk)
+            await upload.finish()
+            if upload.size == 0:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Empty file upload is not allowed.",
                 )
-            return path
         except Exception as e:
             raise
         finally:
             await file.close()
 
-    async def _load_and_split(self, file_path: str) -> list[Document]:
+    async def _load_and_split(self, upload: SpooledUpload) -> Iterator[Document]:
         """
         Detects file type, loads with the right LangChain loader,
         then returns *already‑split* `Document` chunks.
-        Works for very large files by streaming the load in a thread.
+        Spreadsheets are streamed: the returned iterator reads rows lazily
+        (blocking IO, so pull from it in a worker thread).
+        Small uploads held in memory are parsed straight from their bytes when
+        the format allows it; other parsers get a temp file.
         """
-        loader = self._pick_loader(file_path)
-        # Run blocking IO in a worker thread so FastAPI loop is not blocked
-        raw_docs = await asyncio.to_thread(loader.load)
+        ext = upload.suffix
+        if ext in TABULAR_EXTENSIONS:
+            # Whole rows grouped under their header, never the full file in memory
+            if upload.in_memory:
+                return iter_table_documents(upload.file_name, data=upload.getvalue())
+            return iter_table_documents(await upload.as_path())
+        if ext == ".pdf":
+            # One parse per PDF; OCR only for the pages without a text layer
+            raw_docs = await load_pdf(await upload.as_path())
+        elif upload.in_memory and ext not in PATH_LOADER_EXTENSIONS:
+            # Plain text / markdown / code: no loader, no disk
+            raw_docs = [
+                Document(
+                    page_content=upload.text(), metadata={"source": upload.file_name}
+                )
+            ]
+        else:
+            loader = self._pick_loader(await upload.as_path())
+            # Run blocking IO in a worker thread so FastAPI loop is not blocked
+            raw_docs = await asyncio.to_thread(loader.load)
 
         # Choose a splitter *once* based on extension
-        splitter = self._pick_splitter(file_path)
-        return splitter.split_documents(raw_docs)
+        splitter = self._pick_splitter(upload.file_name)
+        return iter(splitter.split_documents(raw_docs))
 
     async def _embed_and_persist_chunks(
-        self, path: str, document_id: uuid.UUID, session: AsyncSession
-    ):
-        chunks = await self._load_and_split(path)
+        self, upload: SpooledUpload, stored_file: StoredFile, session: AsyncSession
+    ) -> int:
+        """
+        Split, embed and COPY the chunks of a newly stored file.
+
+        Returns:
+            Number of chunks written.
+        """
+        chunks_iter = await self._load_and_split(upload)
 
         batch_size = 64  # keep RAM low for giant docs
-        chunks_iter = iter(chunks)
+        pending_rows = []
+        ordinal = 0
+        centroids = CentroidBuilder(settings.SECTION_CHUNKS)
 
-        while batch := list(islice(chunks_iter, batch_size)):
+        while batch := await asyncio.to_thread(
+            lambda: list(islice(chunks_iter, batch_size))
+        ):
             texts = [c.page_content for c in batch]
-            embeddings = await self.embedding_model.aembed_documents(texts)
-            new_rows = [
-                DocumentChunk(
-                    document_id=document_id,
-                    content=text,
-                    embedding=emb,
+            embeddings = await self._embed_documents_cached(texts)
+            for chunk, text, emb in zip(batch, texts, embeddings):
+                pending_rows.append(
+                    {
+                        "file_id": stored_file.file_id,
+                        "ordinal": ordinal,
+                        "chunk_metadata": self._source_metadata(chunk.metadata),
+                        "content": text,
+                        "embedding": emb,
+                    }
                 )
-                for text, emb in zip(texts, embeddings)
-            ]
-            session.add_all(new_rows)
+                centroids.add(ordinal, emb)
+                ordinal += 1
+            if len(pending_rows) >= COPY_BATCH_ROWS:
+                await DocumentChunkRepository.copy_rows(session, pending_rows)
+                pending_rows = []
+        await DocumentChunkRepository.copy_rows(session, pending_rows)
+
+        # Centroids for two-stage search, in the same transaction as the chunks
+        file_centroid, sections = centroids.finish()
+        if file_centroid is not None:
+            session.add(
+                FileSection(
+                    file_id=stored_file.file_id,
+                    level=FileSection.FILE_LEVEL,
+                    **file_centroid,
+                )
+            )
+            session.add_all(
+                FileSection(
+                    file_id=stored_file.file_id,
+                    level=FileSection.SECTION_LEVEL,
+                    **section,
+                )
+                for section in sections
+            )
+        return ordinal
+
+    @staticmethod
+    def _source_metadata(metadata: dict) -> dict:
+        """
+        JSON-safe subset of loader metadata that locates the chunk in its source
+        (page, sheet, element category...).
+        """
+        return {
+            key: value
+            for key, value in metadata.items()
+            if key in SOURCE_METADATA_KEYS
+            and isinstance(value, (str, int, float, bool))
+        }
+
+    async def _embed_documents_cached(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a batch of chunk texts, only sending texts that are not already in
+        the content-addressed embedding cache (or duplicated within the batch).
+        """
+        deployment = self.embedding_model.deployment or self.embedding_model.model
+        dimensions = self.embedding_model.dimensions or settings.EMBEDDING_DIMENSIONS
+        normalized = [EmbeddingCacheRepository.normalize(t) for t in texts]
+        keys = [
+            EmbeddingCacheRepository.content_hash(t, deployment, dimensions)
+            for t in normalized
+        ]
+        cached = await EmbeddingCacheRepository.get_many(keys)
+
+        # One upstream request per distinct missing text
+        missing = {k: t for k, t in zip(keys, normalized) if k not in cached}
+        if missing:
+            fresh = await self.embedding_model.aembed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), fresh))
+            await EmbeddingCacheRepository.put_many(computed)
+            cached.update(computed)
+        return [cached[k] for k in keys]
 
     def _pick_loader(self, file_path: str):
         ext = Path(file_path).suffix.lower()
 
         match ext:
-            case ".pdf":
-                if self._is_scanned_pdf(file_path):
-                    # Fallback to OCR-only mode (requires Tesseract or built-in pdfminer-OCR)
-                    return UnstructuredPDFLoader(file_path, strategy="ocr_only")
-                return PyPDFLoader(file_path)
             case ".docx":
                 return UnstructuredWordDocumentLoader(file_path)
             case ".pptx" | ".ppt":
                 return UnstructuredPowerPointLoader(file_path)
-            case ".xlsx" | ".xls":
+            case ".xls":
+                # legacy binary workbooks; .xlsx / .csv are streamed instead
                 return UnstructuredExcelLoader(file_path)
-            case ".csv":
-                return CSVLoader(file_path)
             case ".html" | ".htm":
                 return UnstructuredHTMLLoader(file_path)
             case ".eml" | ".msg":
@@ -393,7 +1019,7 @@ class DocumentService:
     def _pick_splitter(self, file_path: str):
         ext = Path(file_path).suffix.lower()
         # Large tables / slides / mail → keep chunks smaller
-        table_like = {".csv", ".xlsx", ".xls", ".pptx", ".ppt", ".eml", ".msg"}
+        table_like = {".xls", ".pptx", ".ppt", ".eml", ".msg"}
         code_like = {".py", ".js", ".ts", ".java", ".go", ".c", ".cpp", ".cs", ".rs"}
 
         if ext in code_like:
@@ -402,29 +1028,21 @@ class DocumentService:
                 language=Language.PYTHON,  # good default for code
                 chunk_size=400,
                 chunk_overlap=40,
+                add_start_index=True,
             )
         if ext in table_like:
-            return RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=20)
+            return RecursiveCharacterTextSplitter(
+                chunk_size=300, chunk_overlap=20, add_start_index=True
+            )
         if ext == ".md":
-            return MarkdownTextSplitter(chunk_size=500, chunk_overlap=50)
+            return MarkdownTextSplitter(
+                chunk_size=500, chunk_overlap=50, add_start_index=True
+            )
 
         # fallback
-        return RecursiveCharacterTextSplitter(chunk_size=512, chunk_overlap=64)
-
-    # helper
-    def _is_scanned_pdf(self, file_path: str, max_pages: int = 3) -> bool:
-        """
-        Heuristic: if first N pages contain <50 printable chars, treat as scanned.
-        """
-        try:
-            reader = PdfReader(file_path)
-            for page in reader.pages[:max_pages]:
-                if len(page.extract_text() or "") > 50:
-                    return False
-            return True
-        except Exception:
-            # On any parsing error assume scanned to be safe
-            return True
+        return RecursiveCharacterTextSplitter(
+            chunk_size=512, chunk_overlap=64, add_start_index=True
+        )
 
     @staticmethod
     def _pg_conn_str() -> str:
@@ -17,6 +17,7 @@ from models.chat_history_model import ChatHistory
 from models.ai_models_model import AiModels
 from models.subscriptions_model import Subscriptions
 from models.user_document_model import UserDocument
+from repositories.stored_file_repository import StoredFileRepository
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -491,11 +492,14 @@ class UserService:
                 )
                 result = await session.execute(update_stmt)
 
-                # Delete any associated files
-                delete_stmt = delete(UserDocument).where(
-                    UserDocument.chat_id == chat_id
+                # Detach any associated files; files no other chat uses are soft-deleted
+                delete_stmt = (
+                    delete(UserDocument)
+                    .where(UserDocument.chat_id == chat_id)
+                    .returning(UserDocument.file_id)
                 )
-                await session.execute(delete_stmt)
+                file_ids = (await session.execute(delete_stmt)).scalars().all()
+                await StoredFileRepository.mark_orphans_deleted(session, file_ids)
 
                 # Return True if exactly 1 row was affected
                 return result.rowcount == 1
@@ -1,9 +1,201 @@
 import re, logging
-from difflib import SequenceMatcher
-from fuzzywuzzy import fuzz
+from typing import List, Optional, Sequence
+import numpy as np
+from rapidfuzz import fuzz, process, utils
+
+WORD_RE = re.compile(r"\b\w+\b")
+YEAR_RE = re.compile(r"\b\d{4}\b")
+# Stands for a result without a "media_type" key (one present with value None
+# is a media type that matches nothing)
+NO_MEDIA_TYPE = object()
+STOPWORDS = frozenset(
+    {
+        "a",
+        "an",
+        "the",
+        "and",
+        "or",
+        "but",
+        "of",
+        "in",
+        "on",
+        "at",
+        "to",
+        "for",
+        "with",
+        "by",
+    }
+)
+
+
+# fuzzywuzzy's force_ascii only removes Latin-1 code points (128-255)
+FORCE_ASCII_TABLE = dict.fromkeys(range(128, 256))
+
+
+def force_ascii(text: str) -> str:
+    """
+    Drop the characters fuzzywuzzy's force_ascii processing drops.
+    """
+    return text if text.isascii() else text.translate(FORCE_ASCII_TABLE)
+
+
+class QueryFeatures:
+    """
+    Everything about the query the scorer needs, computed once per query
+    instead of once per candidate.
+    """
+
+    def __init__(self, query: str):
+        self.text = query.lower().strip()
+        self.words = set(WORD_RE.findall(self.text))
+        self.core_words = [w for w in self.words if w not in STOPWORDS and len(w) > 2]
 
 
 class BestMatchService:
+    @staticmethod
+    def score_titles(
+        features: QueryFeatures,
+        titles: Sequence[str],
+        item_media_types: Sequence[Optional[str]],
+        media_type,
+    ) -> np.ndarray:
+        """
+        Similarity of the query to every title, in one pass.
+
+        The string similarities come from rapidfuzz `cdist` bulk scorers (one
+        call per measure for all titles); the word-level features and bonuses
+        are then combined as arrays. Indel similarity stands in for
+        difflib.SequenceMatcher, whose ratio it bounds from above and usually
+        equals on titles. Token sort matches fuzzywuzzy's default processing,
+        Latin-1 characters included (they are dropped).
+
+        Args:
+            features: Precomputed query features.
+            titles: Lower-cased candidate titles.
+            item_media_types: Each candidate's "media_type" value, or
+                NO_MEDIA_TYPE if it has none.
+            media_type: Requested media type.
+        """
+        count = len(titles)
+        if count == 0:
+            return np.zeros(0)
+        query = features.text
+        seq_similarity = (
+            process.cdist([query], titles, scorer=fuzz.ratio, workers=-1)[0] / 100.0
+        )
+        # fuzzywuzzy semantics: integer percentages, token sort on processed text
+        fuzz_similarity = np.rint(seq_similarity * 100) / 100.0
+        token_similarity = (
+            np.rint(
+                process.cdist(
+                    [force_ascii(query)],
+                    [force_ascii(title) for title in titles],
+                    scorer=fuzz.token_sort_ratio,
+                    processor=utils.default_process,
+                    workers=-1,
+                )[0]
+            )
+            / 100.0
+        )
+
+        word_overlap_ratio = np.zeros(count)
+        core_match_ratio = np.empty(count)
+        missing_words = np.zeros(count)
+        has_year = np.zeros(count, dtype=bool)
+        for i, title in enumerate(titles):
+            title_words = set(WORD_RE.findall(title))
+            if features.words:
+                word_overlap_ratio[i] = len(features.words & title_words) / len(
+                    features.words
+                )
+            if features.core_words:
+                core_match_ratio[i] = sum(
+                    1 for w in features.core_words if w in title_words
+                ) / len(features.core_words)
+            missing_words[i] = sum(1 for w in features.words if w not in title)
+            has_year[i] = YEAR_RE.search(title) is not None
+        if not features.core_words:
+            # If query only has stopwords, fall back to full comparison
+            core_match_ratio = seq_similarity
+
+        similarity = (
+            seq_similarity * 0.2
+            + fuzz_similarity * 0.2
+            + token_similarity * 0.3
+            + word_overlap_ratio * 0.1
+            + core_match_ratio * 0.2
+        )
+
+        # Media type bonus
+        has_media = np.array([t is not NO_MEDIA_TYPE for t in item_media_types])
+        matches_media = np.array([t == str(media_type) for t in item_media_types])
+        year_bonus = (~has_media) & (media_type == 1) & (similarity > 0.0) & has_year
+        similarity = np.where(matches_media | year_bonus, similarity * 1.2, similarity)
+
+        # Exact substring match bonus
+        contains = np.array([query in title for title in titles])
+        similarity = np.where(contains, similarity * 1.3, similarity)
+
+        # Penalize very different lengths
+        lengths = np.array([len(title) for title in titles], dtype=float)
+        longest = np.maximum(lengths, len(query))
+        len_ratio = np.divide(
+            np.minimum(lengths, len(query)),
+            longest,
+            out=np.zeros(count),
+            where=longest > 0,
+        )
+        similarity = np.where(len_ratio < 0.5, similarity * 0.9, similarity)
+
+        # Misleading keywords: halve once per query word missing from the title,
+        # as long as the score is still above 0.3
+        for k in range(int(missing_words.max(initial=0))):
+            similarity = np.where(
+                (similarity > 0.3) & (missing_words > k), similarity * 0.5, similarity
+            )
+
+        showbox = np.array(["showbox" in WORD_RE.findall(title) for title in titles])
+        return np.where(showbox, similarity * 1.01, similarity)
+
+    @staticmethod
+    async def find_matches(
+        query, result_lists: List[list], media_type, threshold=0.4
+    ) -> List[Optional[dict]]:
+        """
+        Best match of one query in each of many result lists, all candidates
+        scored in a single batch.
+
+        Returns:
+            For every list, the dictionary with the highest similarity score, or
+            None if it is below threshold (or the list has no titled results).
+        """
+        if not query:
+            return [None] * len(result_lists)
+        features = QueryFeatures(query)
+        owners, items = [], []
+        for list_index, search_results in enumerate(result_lists):
+            for item in search_results or []:
+                if item.get("title"):
+                    owners.append(list_index)
+                    items.append(item)
+        scores = BestMatchService.score_titles(
+            features,
+            [item["title"].lower() for item in items],
+            [item.get("media_type", NO_MEDIA_TYPE) for item in items],
+            media_type,
+        )
+        best: List[Optional[dict]] = [None] * len(result_lists)
+        best_scores = [0.0] * len(result_lists)
+        for owner, item, score in zip(owners, items, scores):
+            # Strictly greater: ties keep the earlier result
+            if score > best_scores[owner]:
+                best_scores[owner] = score
+                best[owner] = item
+        return [
+            item if item is not None and score >= threshold else None
+            for item, score in zip(best, best_scores)
+        ]
+
     @staticmethod
     async def find_match(query, search_results, media_type, threshold=0.4):
         """
@@ -19,109 +211,8 @@ class BestMatchService:
         """
         if not query or not search_results:
             return None
-
-        query = query.lower().strip()
-        query_words = set(re.findall(r"\b\w+\b", query))
-
-        max_similarity = 0.0
-        best_match = None
-
-        # Define stopwords once outside the loop
-        stopwords = {
-            "a",
-            "an",
-            "the",
-            "and",
-            "or",
-            "but",
-            "of",
-            "in",
-            "on",
-            "at",
-            "to",
-            "for",
-            "with",
-            "by",
-        }
-
-        for item in search_results:
-            if not item.get("title"):
-                continue
-
-            title = item["title"].lower()
-
-            # Extract words using regex to handle special characters better
-            title_words = set(re.findall(r"\b\w+\b", title))
-
-            # Different similarity measures
-            seq_similarity = SequenceMatcher(None, query, title).ratio()
-            fuzz_similarity = fuzz.ratio(query, title) / 100.0
-            token_similarity = fuzz.token_sort_ratio(query, title) / 100.0
-
-            # Word-based matching
-            word_overlap = len(query_words.intersection(title_words))
-            word_overlap_ratio = word_overlap / len(query_words) if query_words else 0
-
-            # Core words matching (ignoring common words)
-            core_query_words = [
-                w for w in query_words if w not in stopwords and len(w) > 2
-            ]
-            core_title_words = [
-                w for w in title_words if w not in stopwords and len(w) > 2
-            ]
-
-            if not core_query_words:
-                # If query only has stopwords, fall back to full comparison
-                core_match_ratio = seq_similarity
-            else:
-                # Check how many important query words are in the title
-                core_matches = sum(1 for w in core_query_words if w in core_title_words)
-                core_match_ratio = core_matches / len(core_query_words)
-
-            # Calculate total similarity score with weights
-            similarity = (
-                seq_similarity * 0.2
-                + fuzz_similarity * 0.2
-                + token_similarity * 0.3
-                + word_overlap_ratio * 0.1
-                + core_match_ratio * 0.2
+        return (
+            await BestMatchService.find_matches(
+                query, [search_results], media_type, threshold
             )
-
-            # Add bonuses
-            if "media_type" in item and item["media_type"] == str(media_type):
-                similarity *= 1.2
-            elif (
-                "media_type" not in item
-                and media_type == 1
-                and similarity > 0.0
-                and re.search(r"\b\d{4}\b", item["title"])
-            ):
-                similarity *= 1.2
-
-            # Exact substring match bonus
-            if query in title:
-                similarity *= 1.3
-
-            # Penalize very different lengths
-            len_ratio = min(len(query), len(title)) / max(len(query), len(title))
-            if len_ratio < 0.5:
-                similarity *= 0.9
-
-            # Filter out obviously wrong matches with misleading keywords
-            for word in query_words:
-                if word not in title and similarity > 0.3:
-                    similarity *= 0.5
-
-            if "showbox" in title_words:
-                similarity *= 1.01
-            # Print for debugging
-            # print(f"{item['title']} - Score: {similarity:.4f}")
-            # Update best match
-            if similarity > max_similarity:
-                max_similarity = similarity
-                best_match = item
-
-        if max_similarity >= threshold and best_match:
-            return best_match
-        else:
-            return None
+        )[0]
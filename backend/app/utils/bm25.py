@@ -0,0 +1,90 @@
+import math, re
+from collections import Counter
+from typing import Dict, List, Sequence
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Terms that carry no relevance signal on their own; dropped from queries and
+# documents alike so they neither match nor count towards document length
+STOPWORDS = frozenset(
+    """
+    a an and are as at be but by for from has have how i if in into is it its
+    of on or that the their then there these they this to was were what when
+    where which who why will with you your
+    """.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS
+    ]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a small, fixed set of documents (the chunks of one page).
+
+    Every document is tokenized once when the index is built; term frequencies,
+    document frequencies and lengths are kept so any number of queries can be
+    scored without touching the text again.
+    """
+
+    def __init__(self, documents: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.documents = list(documents)
+        self.k1 = k1
+        self.b = b
+        self.term_freqs: List[Counter] = [Counter(tokenize(doc)) for doc in documents]
+        self.lengths = [sum(freqs.values()) for freqs in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        doc_freqs: Counter = Counter()
+        for freqs in self.term_freqs:
+            doc_freqs.update(freqs.keys())
+        total = len(self.documents)
+        # "+1" form of the idf: never negative, even for terms in most documents
+        self.idf: Dict[str, float] = {
+            term: math.log(1 + (total - count + 0.5) / (count + 0.5))
+            for term, count in doc_freqs.items()
+        }
+
+    @property
+    def size(self) -> int:
+        return sum(len(doc) for doc in self.documents)
+
+    def scores(self, query: str) -> List[float]:
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        scores = [0.0] * len(self.documents)
+        if not terms or not self.avg_length:
+            return scores
+        for i, freqs in enumerate(self.term_freqs):
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avg_length)
+            score = 0.0
+            for term in terms:
+                freq = freqs.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            scores[i] = score
+        return scores
+
+    def top(self, query: str, top_k: int, max_chars: int) -> List[str]:
+        """
+        Highest-scoring documents matching `query`, at most `top_k` of them and
+        at most `max_chars` characters in total (the best one is always kept),
+        returned in their original order so neighbouring text reads naturally.
+        """
+        scores = self.scores(query)
+        ranked = sorted(
+            (i for i, score in enumerate(scores) if score > 0),
+            key=lambda i: scores[i],
+            reverse=True,
+        )
+        picked, used = [], 0
+        for i in ranked:
+            if len(picked) == top_k:
+                break
+            length = len(self.documents[i])
+            if picked and used + length > max_chars:
+                continue
+            picked.append(i)
+            used += length
+        return [self.documents[i] for i in sorted(picked)]
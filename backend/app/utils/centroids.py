@@ -0,0 +1,68 @@
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+
+class CentroidBuilder:
+    """
+    Running sums of chunk embeddings while a file is ingested, producing the
+    file-level centroid and one centroid per `section_size` consecutive chunks.
+    Chunk embeddings are never kept: memory holds the running sums of the open
+    section and the file, plus one finished centroid per closed section.
+
+    Means are not re-normalized: cosine distance ignores vector length.
+    """
+
+    def __init__(self, section_size: int):
+        self.section_size = section_size
+        self.sections: List[dict] = []
+        self._file_sum: Optional[np.ndarray] = None
+        self._section_sum: Optional[np.ndarray] = None
+        self._section_start = 0
+        self._count = 0
+        self._section_count = 0
+
+    def add(self, ordinal: int, embedding: Sequence[float]) -> None:
+        vector = np.asarray(embedding, dtype=np.float64)
+        if self._file_sum is None:
+            self._file_sum = np.zeros_like(vector)
+        if self._section_sum is None:
+            self._section_sum = np.zeros_like(vector)
+            self._section_start = ordinal
+        self._file_sum += vector
+        self._section_sum += vector
+        self._count += 1
+        self._section_count += 1
+        if self._section_count == self.section_size:
+            self._close_section(ordinal)
+
+    def finish(self) -> Tuple[Optional[dict], List[dict]]:
+        """
+        Close the last section.
+
+        Returns:
+            (whole-file centroid, section centroids), each a mapping of
+            ordinal_start, ordinal_end and embedding; (None, []) for an empty file.
+        """
+        if self._count == 0:
+            return None, []
+        if self._section_sum is not None:
+            self._close_section(self._section_start + self._section_count - 1)
+        file_centroid = {
+            "ordinal_start": self.sections[0]["ordinal_start"],
+            "ordinal_end": self.sections[-1]["ordinal_end"],
+            "embedding": (self._file_sum / self._count).astype(np.float32),
+        }
+        return file_centroid, self.sections
+
+    def _close_section(self, last_ordinal: int) -> None:
+        self.sections.append(
+            {
+                "ordinal_start": self._section_start,
+                "ordinal_end": last_ordinal,
+                "embedding": (self._section_sum / self._section_count).astype(
+                    np.float32
+                ),
+            }
+        )
+        self._section_sum = None
+        self._section_count = 0
@@ -0,0 +1,322 @@
+import asyncio, json, logging, os, shutil, signal, sys, tempfile, time
+from dataclasses import dataclass
+from typing import List, Optional, Set
+from core.config import settings
+from core.metrics import get_pool_stats
+from utils import sandbox_worker
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = os.path.abspath(sandbox_worker.__file__)
+START_TIMEOUT = 60  # seconds a new runner may spend on its imports
+READ_SIZE = 64 * 1024
+# Run as a runner's uid: kill(-1) reaches every process of that uid (but not
+# the caller); a few passes catch processes forked while it runs
+KILL_ALL_SOURCE = """
+import os, signal
+for _ in range(3):
+    try:
+        os.kill(-1, signal.SIGKILL)
+    except ProcessLookupError:
+        break
+"""
+
+
+@dataclass
+class SandboxResult:
+    output: str
+    returncode: Optional[int]
+    timed_out: bool = False
+    truncated: bool = False
+
+    @property
+    def cpu_exceeded(self) -> bool:
+        return self.returncode == -signal.SIGXCPU
+
+
+def _runner_env(workdir: str) -> dict:
+    """
+    Environment of a runner: none of the server's variables, a private home and
+    temp dir, and single-threaded math libraries so the address space limit is
+    not spent on thread stacks.
+
+    This only keeps secrets out of the runner's own environment. A runner with
+    the server's uid can still read them elsewhere (/proc/<pid>/environ, the
+    .env file); SANDBOX_UID_BASE gives every runner an unprivileged uid.
+    """
+    return {
+        "PATH": os.environ.get("PATH", os.defpath),
+        "HOME": workdir,
+        "TMPDIR": workdir,
+        "LANG": "C.UTF-8",
+        "MPLBACKEND": "Agg",
+        "OMP_NUM_THREADS": "1",
+        "OPENBLAS_NUM_THREADS": "1",
+        "MKL_NUM_THREADS": "1",
+    }
+
+
+def _identity(uid: Optional[int]) -> dict:
+    """
+    create_subprocess_exec arguments that run a process as `uid`, in a group of
+    its own and no supplementary ones; empty for None (the server's uid).
+    """
+    if uid is None:
+        return {}
+    return {"user": uid, "group": uid, "extra_groups": []}
+
+
+async def _kill_uid(uid: int):
+    """
+    SIGKILL every process of `uid`, including any that left the runner's
+    session with setsid() and so escaped killpg.
+    """
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-I",
+        "-S",
+        "-c",
+        KILL_ALL_SOURCE,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+        env={},
+        **_identity(uid),
+    )
+    await process.wait()
+
+
+class SandboxWorker:
+    """
+    One runner process with warm imports, in its own session and working
+    directory, optionally under a uid no other runner has at the same time. It
+    runs a single job and is then killed along with anything the job started.
+    """
+
+    def __init__(
+        self, process: asyncio.subprocess.Process, workdir: str, uid: Optional[int]
+    ):
+        self.process = process
+        self.workdir = workdir
+        self.uid = uid
+
+    @classmethod
+    async def spawn(cls, uid: Optional[int] = None) -> "SandboxWorker":
+        # mkdtemp creates it 0700: only the runner's own uid can enter it
+        workdir = tempfile.mkdtemp(prefix="sandbox-")
+        try:
+            if uid is not None:
+                os.chown(workdir, uid, uid)
+            process = await asyncio.create_subprocess_exec(
+                sys.executable,
+                "-I",
+                WORKER_SCRIPT,
+                *settings.SANDBOX_PREIMPORTS,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+                cwd=workdir,
+                env=_runner_env(workdir),
+                start_new_session=True,
+                umask=0o077,  # files it leaves in shared places stay private
+                **_identity(uid),
+            )
+        except Exception:
+            shutil.rmtree(workdir, ignore_errors=True)
+            raise
+        worker = cls(process, workdir, uid)
+        try:
+            async with asyncio.timeout(START_TIMEOUT):
+                # Anything the imports printed comes before the marker
+                while True:
+                    line = await process.stdout.readline()
+                    if not line:
+                        raise RuntimeError("sandbox runner exited during startup")
+                    if line.decode(errors="replace").strip() == sandbox_worker.READY:
+                        break
+        except BaseException:
+            await worker.kill()
+            raise
+        return worker
+
+    async def run(self, code: str) -> SandboxResult:
+        """
+        Send the job and collect at most SANDBOX_MAX_OUTPUT bytes of output within
+        SANDBOX_TIMEOUT seconds; the runner is stopped as soon as either is used up.
+        """
+        job = {
+            "code": code,
+            "cpu_seconds": settings.SANDBOX_CPU_SECONDS,
+            "memory_bytes": settings.SANDBOX_MEMORY_MB * 1024 * 1024,
+            "file_bytes": settings.SANDBOX_MAX_FILE_BYTES,
+        }
+        process = self.process
+        chunks, size, truncated = [], 0, False
+        try:
+            async with asyncio.timeout(settings.SANDBOX_TIMEOUT):
+                process.stdin.write(json.dumps(job).encode() + b"\n")
+                await process.stdin.drain()
+                # The job reads EOF, not a blocking terminal, from stdin
+                process.stdin.close()
+                while True:
+                    chunk = await process.stdout.read(READ_SIZE)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size > settings.SANDBOX_MAX_OUTPUT:
+                        truncated = True
+                        break
+                if not truncated:
+                    await process.wait()
+        except TimeoutError:
+            return SandboxResult(self._decode(chunks), None, timed_out=True)
+        except (BrokenPipeError, ConnectionResetError):
+            # The runner died before taking the job
+            await process.wait()
+        return SandboxResult(
+            self._decode(chunks),
+            None if truncated else process.returncode,
+            truncated=truncated,
+        )
+
+    @staticmethod
+    def _decode(chunks) -> str:
+        output = b"".join(chunks)[: settings.SANDBOX_MAX_OUTPUT]
+        return output.decode("utf-8", errors="replace").strip()
+
+    async def kill(self):
+        try:
+            # The runner leads its own session: this reaches its children too
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await self.process.wait()
+        if self.uid is not None:
+            # Whatever left the session; the uid is then safe to hand out again
+            await _kill_uid(self.uid)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+class SandboxPool:
+    """
+    Pre-started runner processes for untrusted Python code.
+
+    Up to `size` runners wait with their interpreter started and the common
+    packages imported, so a job costs only its own run time. Each runner takes
+    exactly one job and is replaced in the background as soon as it is handed
+    out; jobs beyond `size` concurrent ones wait for a free slot. If no runner
+    is ready, the job starts a cold one rather than waiting.
+
+    With SANDBOX_UID_BASE set, every live runner holds its own uid from a range
+    of 2 * `size` (`size` waiting plus `size` running), so runners cannot
+    signal, trace or read each other; a uid returns to the pool only once every
+    process under it is gone.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.stats = get_pool_stats("code_sandbox", size)
+        self._idle: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._spawning: Set[asyncio.Task] = set()
+        self._closed = False
+        self._free_uids: Optional[List[int]] = None
+        if settings.SANDBOX_UID_BASE:
+            base = settings.SANDBOX_UID_BASE
+            self._free_uids = list(range(base, base + 2 * size))
+
+    async def start(self):
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.size)
+            self._closed = False
+            self._fill()
+
+    async def _spawn(self) -> SandboxWorker:
+        uid = None
+        if self._free_uids is not None:
+            if not self._free_uids:
+                raise RuntimeError("code_sandbox: no free runner uid")
+            uid = self._free_uids.pop()
+        try:
+            return await SandboxWorker.spawn(uid)
+        except BaseException:
+            # A failed spawn has already killed everything it started
+            if uid is not None:
+                self._free_uids.append(uid)
+            raise
+
+    async def _kill(self, worker: SandboxWorker):
+        try:
+            await worker.kill()
+        finally:
+            if worker.uid is not None:
+                self._free_uids.append(worker.uid)
+
+    def _fill(self):
+        """
+        Start runners until `size` are ready or on their way.
+        """
+        for _ in range(self.size - self._idle.qsize() - len(self._spawning)):
+            task = asyncio.create_task(self._spawn_idle())
+            self._spawning.add(task)
+            task.add_done_callback(self._spawning.discard)
+
+    async def _spawn_idle(self):
+        try:
+            worker = await self._spawn()
+        except Exception as e:
+            logger.warning(f"code_sandbox: failed to start a runner: {e}")
+            return
+        if self._closed:
+            await self._kill(worker)
+        else:
+            self._idle.put_nowait(worker)
+
+    async def _take(self) -> SandboxWorker:
+        try:
+            worker = self._idle.get_nowait()
+        except asyncio.QueueEmpty:
+            worker = None
+        self._fill()
+        if worker is None:
+            worker = await self._spawn()
+        elif worker.process.returncode is not None:
+            # Died while idle
+            await self._kill(worker)
+            worker = await self._spawn()
+        return worker
+
+    async def run(self, code: str) -> SandboxResult:
+        await self.start()
+        start = time.perf_counter()
+        async with self._slots:
+            self.stats.record_acquire(time.perf_counter() - start)
+            try:
+                worker = await self._take()
+                try:
+                    return await worker.run(code)
+                finally:
+                    await self._kill(worker)
+            finally:
+                self.stats.record_release()
+
+    async def close(self):
+        """
+        Stop every runner; jobs still running are killed by their own callers.
+        """
+        if self._idle is None:
+            return
+        self._closed = True
+        for task in list(self._spawning):
+            task.cancel()
+        await asyncio.gather(*self._spawning, return_exceptions=True)
+        while not self._idle.empty():
+            await self._kill(self._idle.get_nowait())
+        self._idle = None
+        self._slots = None
+
+
+# Create a singleton instance
+sandbox_pool = SandboxPool(settings.SANDBOX_WORKERS)
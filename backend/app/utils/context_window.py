@@ -0,0 +1,153 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+import uuid
+
+# Splitter offset of a chunk in its source text (add_start_index=True)
+START_INDEX_KEY = "start_index"
+MAX_OVERLAP_CHARS = 256  # larger than any splitter chunk_overlap we use
+# Chunks stored without offsets: shorter boundary matches are taken as chance
+MIN_OVERLAP_CHARS = 24
+
+
+@dataclass
+class ChunkRef:
+    document_id: uuid.UUID
+    ordinal: int
+    content: str
+    chunk_metadata: dict = field(default_factory=dict)
+
+
+@dataclass
+class ContextWindow:
+    document_id: uuid.UUID
+    start: int  # first ordinal, inclusive
+    end: int  # last ordinal, inclusive
+    rank: int  # best (lowest) rank of the hits inside the window
+    content: str = ""
+    chunk_metadata: List[dict] = field(default_factory=list)
+
+
+def merge_overlap(left: str, right: str, overlap: Optional[int] = None) -> str:
+    """
+    Join two consecutive chunks, dropping the text the splitter repeated at the
+    boundary (chunk_overlap).
+
+    Args:
+        overlap: Characters the chunks share according to their splitter offsets.
+            None when unknown; only a match of at least MIN_OVERLAP_CHARS is then
+            treated as splitter overlap.
+    """
+    if overlap is not None:
+        if 0 < overlap <= min(len(left), len(right)) and left.endswith(
+            right[:overlap]
+        ):
+            return left + right[overlap:]
+        return left + "\n" + right
+    limit = min(len(left), len(right), MAX_OVERLAP_CHARS)
+    for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return left + "\n" + right
+
+
+def chunk_overlap(left: ChunkRef, right: ChunkRef) -> Optional[int]:
+    """
+    Characters `right` repeats from the end of `left`, from their splitter
+    offsets; None if either chunk has no offset. Offsets only compare within the
+    same source document (page, sheet...), so 0 across a source boundary.
+    """
+    left_start = left.chunk_metadata.get(START_INDEX_KEY)
+    right_start = right.chunk_metadata.get(START_INDEX_KEY)
+    if not isinstance(left_start, int) or not isinstance(right_start, int):
+        return None
+    if source_metadata(left.chunk_metadata) != source_metadata(right.chunk_metadata):
+        return 0
+    return max(left_start + len(left.content) - right_start, 0)
+
+
+def source_metadata(chunk_metadata: dict) -> dict:
+    """
+    Chunk metadata without the splitter offset.
+    """
+    return {k: v for k, v in chunk_metadata.items() if k != START_INDEX_KEY}
+
+
+def build_windows(
+    hits: Sequence[Tuple[uuid.UUID, int]],
+    chunks: Dict[Tuple[uuid.UUID, int], ChunkRef],
+    radius: int,
+    max_chars: int,
+) -> List[ContextWindow]:
+    """
+    Grow each hit into a window of up to `radius` neighbours per side, keeping the
+    total text under `max_chars`. Windows that touch or overlap in the same
+    document are merged, so no chunk is returned twice.
+
+    Args:
+        hits: (document_id, ordinal) of the retrieved chunks, best first.
+        chunks: Every fetched chunk (hits and neighbours) by (document_id, ordinal).
+        radius: Maximum neighbours to add on each side of a hit.
+        max_chars: Budget for the combined text of all windows.
+
+    Returns:
+        Windows ordered by their best hit.
+    """
+    covered: Dict[Tuple[uuid.UUID, int], int] = {}  # chunk -> window index
+    windows: List[ContextWindow] = []
+    used = 0
+
+    def size(key):
+        return len(chunks[key].content)
+
+    for rank, (document_id, ordinal) in enumerate(hits):
+        key = (document_id, ordinal)
+        if key in covered or key not in chunks:
+            continue
+        if used + size(key) > max_chars:
+            continue
+        window = ContextWindow(document_id, ordinal, ordinal, rank)
+        used += size(key)
+        # Grow outwards one chunk at a time, alternating sides
+        for step in range(1, radius + 1):
+            for candidate in (ordinal - step, ordinal + step):
+                neighbour = (document_id, candidate)
+                if neighbour not in chunks or neighbour in covered:
+                    continue
+                if candidate not in (window.start - 1, window.end + 1):
+                    continue  # would leave a gap
+                if used + size(neighbour) > max_chars:
+                    continue
+                used += size(neighbour)
+                window.start = min(window.start, candidate)
+                window.end = max(window.end, candidate)
+        for position in range(window.start, window.end + 1):
+            covered[(document_id, position)] = len(windows)
+        windows.append(window)
+
+    # Merge windows of the same document that now touch
+    merged: List[ContextWindow] = []
+    for window in sorted(windows, key=lambda w: (str(w.document_id), w.start)):
+        previous = merged[-1] if merged else None
+        if (
+            previous is not None
+            and previous.document_id == window.document_id
+            and window.start <= previous.end + 1
+        ):
+            previous.end = max(previous.end, window.end)
+            previous.rank = min(previous.rank, window.rank)
+        else:
+            merged.append(window)
+
+    for window in merged:
+        parts = [
+            chunks[(window.document_id, position)]
+            for position in range(window.start, window.end + 1)
+        ]
+        content = parts[0].content
+        for previous, part in zip(parts, parts[1:]):
+            content = merge_overlap(
+                content, part.content, chunk_overlap(previous, part)
+            )
+        window.content = content
+        window.chunk_metadata = [source_metadata(part.chunk_metadata) for part in parts]
+    return sorted(merged, key=lambda w: w.rank)
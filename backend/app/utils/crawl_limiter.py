@@ -0,0 +1,45 @@
+import asyncio, urllib.parse
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List
+from core.config import settings
+
+
+class CrawlLimiter:
+    """
+    Process-wide caps on concurrent crawl requests: `max_concurrency` in total
+    and `max_per_host` for any single host, shared by every crawl_url_list call
+    so a burst of tool calls cannot hammer one site or exhaust the client.
+
+    The host slot is taken first, so requests queued behind a busy host do not
+    sit on global slots other hosts could use.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = settings.CRAWL_MAX_CONCURRENCY,
+        max_per_host: int = settings.CRAWL_MAX_PER_HOST,
+    ):
+        self.max_per_host = max_per_host
+        self._global = asyncio.Semaphore(max_concurrency)
+        # host -> [semaphore, number of holders and waiters]
+        self._hosts: Dict[str, List] = {}
+
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[None]:
+        host = (urllib.parse.urlsplit(url).hostname or "").lower()
+        entry = self._hosts.setdefault(
+            host, [asyncio.Semaphore(self.max_per_host), 0]
+        )
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._global:
+                    yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._hosts.pop(host, None)
+
+
+# Create a singleton instance
+crawl_limiter = CrawlLimiter()
@@ -1,8 +1,10 @@
 from typing import Optional, Annotated
 from langgraph.prebuilt import InjectedState
-import sys, io, traceback, contextlib, datetime
+import asyncio, sys, io, traceback, contextlib, datetime
 from pydantic import BaseModel
+from core.config import settings
 from repositories.websocket_manager import ws_manager
+from utils.code_sandbox import sandbox_pool
 
 
 class PythonCodeRunnerInput(BaseModel):
@@ -15,10 +17,31 @@ class CurrentUtcDateTimeInput(BaseModel):
     state: Annotated[dict, InjectedState]
 
 
-import tempfile
-import subprocess
-import os
-import shlex
+async def _install_packages(packages: list[str]) -> str:
+    """
+    pip install `packages` into the runners' interpreter without blocking the
+    event loop. Raises RuntimeError with pip's output if the install fails.
+    """
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-m",
+        "pip",
+        "install",
+        *packages,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+    )
+    try:
+        async with asyncio.timeout(60):
+            stdout, _ = await process.communicate()
+    except TimeoutError:
+        process.kill()
+        await process.wait()
+        raise
+    output = stdout.decode("utf-8", errors="replace")
+    if process.returncode != 0:
+        raise RuntimeError(output)
+    return output
 
 
 async def python_code_runner(
@@ -45,67 +68,37 @@ async def python_code_runner(
                 },
             )
 
-        with tempfile.TemporaryDirectory() as tmpdir:
-            code_file = os.path.join(tmpdir, "user_code.py")
-            with open(code_file, "w") as f:
-                f.write(code)
-
-            # Prepare the command to run the code
-            python_cmd = [sys.executable, code_file]
-
-            # If packages are specified, install them in the subprocess
-            install_output = ""
-            if packages:
-                if state:
-                    await ws_manager.send_to_user(
-                        sid=state["user_id"],
-                        message_type="ToolProcess",
-                        data={
-                            "chat_id": state["chat_id"],
-                            "content": f"Installing packages: {', '.join(packages)}",
-                        },
-                    )
-                # Install packages using pip
-                pip_cmd = [sys.executable, "-m", "pip", "install"] + packages
-                try:
-                    pip_proc = subprocess.run(
-                        pip_cmd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.STDOUT,
-                        timeout=60,
-                        cwd=tmpdir,
-                        check=True,
-                        text=True,
-                    )
-                    install_output = pip_proc.stdout
-                except subprocess.CalledProcessError as e:
-                    return f"Error installing packages:\n{e.output}"
-                except subprocess.TimeoutExpired:
-                    return "Package installation timed out."
-
-            # Run the code in a subprocess with timeout and resource limits
-            try:
-                proc = subprocess.run(
-                    python_cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    timeout=10,
-                    cwd=tmpdir,
-                    check=False,
-                    text=True,
+        # If packages are specified, install them before the run
+        install_output = ""
+        if packages:
+            if state:
+                await ws_manager.send_to_user(
+                    sid=state["user_id"],
+                    message_type="ToolProcess",
+                    data={
+                        "chat_id": state["chat_id"],
+                        "content": f"Installing packages: {', '.join(packages)}",
+                    },
                 )
-                output = proc.stdout.strip()
-                if install_output:
-                    output = f"Package installation output:\n{install_output}\n\nCode output:\n{output}"
-                return (
-                    output
-                    if output
-                    else "Code ran successfully but did not return anything."
-                )
-            except subprocess.TimeoutExpired:
-                return "Code execution timed out."
-            except Exception as e:
-                return f"Error during execution:\n{str(e)}"
+            try:
+                install_output = await _install_packages(packages)
+            except RuntimeError as e:
+                return f"Error installing packages:\n{e}"
+            except TimeoutError:
+                return "Package installation timed out."
+
+        # Run the code in a warm runner with CPU, memory and output limits
+        result = await sandbox_pool.run(code)
+        if result.timed_out:
+            return "Code execution timed out."
+        output = result.output
+        if result.truncated:
+            output += f"\n[output truncated after {settings.SANDBOX_MAX_OUTPUT} bytes]"
+        elif result.cpu_exceeded:
+            output += "\nCode execution exceeded its CPU time limit."
+        if install_output:
+            output = f"Package installation output:\n{install_output}\n\nCode output:\n{output}"
+        return output if output else "Code ran successfully but did not return anything."
 
     except Exception:
         return "Error during execution:\n" + traceback.format_exc()
@@ -0,0 +1,215 @@
+import asyncio, logging, urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+import lxml.html
+from lxml import etree
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Dropped before any text is read
+BOILERPLATE_TAGS = [
+    "script",
+    "style",
+    "noscript",
+    "template",
+    "svg",
+    "iframe",
+    "nav",
+    "footer",
+    "header",
+    "form",
+    "aside",
+]
+# Blocks the main-content search may descend into
+CONTAINER_TAGS = {"body", "div", "section", "article", "main", "td", "center"}
+# Share of a container's non-link text a child must hold to be descended into
+DOMINANT_SHARE = 0.6
+MAX_CONTENT_LINKS = 20
+
+_html_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_html_pool() -> ProcessPoolExecutor:
+    global _html_pool
+    if _html_pool is None:
+        _html_pool = ProcessPoolExecutor(max_workers=settings.HTML_PARSE_WORKERS)
+    return _html_pool
+
+
+def shutdown_html_pool() -> None:
+    global _html_pool
+    if _html_pool is not None:
+        _html_pool.shutdown(wait=False, cancel_futures=True)
+        _html_pool = None
+
+
+def _parse(html: str) -> Optional[etree._Element]:
+    try:
+        return lxml.html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        # Empty document, or a str carrying an XML encoding declaration
+        try:
+            return lxml.html.document_fromstring(html.encode("utf-8"))
+        except etree.ParserError:
+            return None
+
+
+def _has_class(class_name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+def _text(element: etree._Element) -> str:
+    return " ".join(
+        part.strip() for part in element.itertext() if part and part.strip()
+    )
+
+
+def parse_search_results(html: str) -> List[Dict[str, str]]:
+    """
+    Results of a DuckDuckGo HTML results page as {'title', 'url', 'description'}.
+    """
+    root = _parse(html)
+    if root is None:
+        return []
+    results = []
+    for result in root.xpath(f"//div[{_has_class('web-result')}]"):
+        title = result.xpath(f".//a[{_has_class('result__a')}]")
+        url = result.xpath(f".//a[{_has_class('result__url')}]")
+        description = result.xpath(f".//a[{_has_class('result__snippet')}]")
+        if title and url and description:
+            results.append(
+                {
+                    "title": title[0].text_content().strip(),
+                    "url": url[0].text_content().strip(),
+                    "description": description[0].text_content().strip(),
+                }
+            )
+    return results
+
+
+def _text_lengths(root: etree._Element):
+    """
+    Characters of text under every element, and how many of them are link text,
+    computed bottom-up in one pass.
+    """
+    total: Dict[etree._Element, int] = {}
+    linked: Dict[etree._Element, int] = {}
+    for element in reversed(list(root.iter())):
+        own = len((element.text or "").strip())
+        size, links = own, 0
+        for child in element:
+            size += total.get(child, 0) + len((child.tail or "").strip())
+            links += linked.get(child, 0)
+        total[element] = size
+        linked[element] = size if element.tag == "a" else links
+    return total, linked
+
+
+def main_content(root: etree._Element) -> etree._Element:
+    """
+    The element holding the page's main text.
+
+    Prefers an explicit <main>, <article> or role="main" block. Otherwise
+    starts at <body> and keeps descending into the container child that holds
+    most (DOMINANT_SHARE) of the remaining non-link text, which strips layout
+    wrappers, sidebars and link lists that survived the boilerplate removal.
+    """
+    total, linked = _text_lengths(root)
+
+    def body_text(element):
+        return total.get(element, 0) - linked.get(element, 0)
+
+    explicit = root.xpath("//main | //article | //*[@role='main']")
+    if explicit:
+        return max(explicit, key=body_text)
+    node = root.find("body")
+    if node is None:
+        node = root
+    while True:
+        children = [child for child in node if child.tag in CONTAINER_TAGS]
+        if not children:
+            return node
+        best = max(children, key=body_text)
+        if body_text(best) < DOMINANT_SHARE * body_text(node):
+            return node
+        node = best
+
+
+def extract_markdown(html: str, page_url: str) -> str:
+    """
+    Convert a page to Markdown: title, URL, the main content's text and the
+    links found inside the main content (navigation links are left out).
+    """
+    root = _parse(html)
+    if root is None:
+        return (
+            f"## Title:**No Title Found**\n\n## Page URL:{page_url}\n\n"
+            "## Main Content:No Main Content Found\n"
+        )
+    title_element = root.find(".//title")
+    title = (
+        title_element.text_content().strip()
+        if title_element is not None and title_element.text_content().strip()
+        else "No Title Found"
+    )
+    etree.strip_elements(root, etree.Comment, *BOILERPLATE_TAGS, with_tail=False)
+    content = main_content(root)
+    main_text = _text(content) or "No Main Content Found"
+
+    links, seen = [], set()
+    for anchor in content.iter("a"):
+        href = (anchor.get("href") or "").strip()
+        link_text = _text(anchor)
+        if not href or not link_text or href.startswith(("#", "javascript:")):
+            continue
+        href = urllib.parse.urljoin(page_url, href)
+        if href in seen:
+            continue
+        seen.add(href)
+        links.append(f"- [{link_text}]({href})")
+        if len(links) >= MAX_CONTENT_LINKS:
+            break
+
+    markdown = (
+        f"## Title:**{title}**\n\n"
+        f"## Page URL:{page_url}\n\n"
+        f"## Main Content:{main_text}\n"
+    )
+    if links:
+        markdown += "\n## Links\n" + "\n".join(links) + "\n"
+    return markdown
+
+
+def page_chunks(
+    html: str, page_url: str, chunk_size: int, chunk_overlap: int
+) -> List[str]:
+    """
+    Markdown of a page split into chunks. Runs in a worker process.
+    """
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+    return splitter.split_text(extract_markdown(html, page_url))
+
+
+async def _offload(func, html: str, *args):
+    """
+    Run an extraction off the event loop: small pages on a thread (a process
+    hop would cost more than the parse), large ones on the worker processes.
+    """
+    if len(html) < settings.HTML_OFFLOAD_MIN_CHARS:
+        return await asyncio.to_thread(func, html, *args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_html_pool(), func, html, *args)
+
+
+async def extract_page_chunks(
+    html: str, page_url: str, chunk_size: int, chunk_overlap: int
+) -> List[str]:
+    return await _offload(page_chunks, html, page_url, chunk_size, chunk_overlap)
+
+
+async def extract_search_results(html: str) -> List[Dict[str, str]]:
+    return await _offload(parse_search_results, html)
@@ -7,13 +7,18 @@ from .extended_tools import (
     PythonCodeRunnerInput,
     CurrentUtcDateTimeInput,
 )
+from .tool_memo import memoize_tool
 from .web_search import WebSearchService, CrawlUrlListInput, SearchInput
 
 
 def get_tools() -> List[Tool | StructuredTool]:
+    """
+    Tools offered to the model. Each is memoized per chat (see `memoize_tool`)
+    unless it opts out with metadata={"memoize": False}.
+    """
     web = WebSearchService()
     doc = DocumentService()
-    return [
+    tools = [
         StructuredTool.from_function(
             func=web.search,
             coroutine=web.search,
@@ -27,6 +32,11 @@ def get_tools() -> List[Tool | StructuredTool]:
             name=web.crawl_url_list.__getattribute__("__name__"),
             description=web.crawl_url_list.__getattribute__("__doc__"),
             args_schema=CrawlUrlListInput,
+            metadata={
+                # Without a query, chunks are ranked by the user's message
+                "memo_state": ["user_input"],
+                "memo_cacheable": web.is_complete_crawl,
+            },
         ),
         StructuredTool.from_function(
             func=doc.get_relevant_docs,
@@ -43,6 +53,7 @@ def get_tools() -> List[Tool | StructuredTool]:
             description=python_code_runner.__getattribute__("__doc__"),
             return_direct=True,
             args_schema=PythonCodeRunnerInput,
+            metadata={"memoize": False},  # runs user code; may be non-deterministic
         ),
         Tool.from_function(
             func=current_utc_date_time,
@@ -51,5 +62,7 @@ def get_tools() -> List[Tool | StructuredTool]:
             description=current_utc_date_time.__getattribute__("__doc__"),
             return_direct=True,
             args_schema=CurrentUtcDateTimeInput,
+            metadata={"memoize": False},  # time-dependent
         ),
     ]
+    return [memoize_tool(tool) for tool in tools]
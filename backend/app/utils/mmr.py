@@ -0,0 +1,56 @@
+from typing import List, Sequence
+import numpy as np
+
+
+def as_matrix(vectors: Sequence) -> np.ndarray:
+    """
+    Stack pgvector values (numpy arrays, HalfVector objects or lists) into an
+    L2-normalized float32 matrix.
+    """
+    matrix = np.asarray(
+        [v.to_numpy() if hasattr(v, "to_numpy") else v for v in vectors],
+        dtype=np.float32,
+    )
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def cosine_distances(query: Sequence[float], candidates: np.ndarray) -> np.ndarray:
+    """
+    Cosine distance (1 - cosine similarity) of every normalized candidate row to the query.
+    """
+    return 1.0 - candidates @ as_matrix([query])[0]
+
+
+def maximal_marginal_relevance(
+    query: Sequence[float],
+    candidates: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5,
+) -> List[int]:
+    """
+    Greedy MMR over normalized candidate vectors.
+
+    Each step picks the candidate maximizing
+        lambda * sim(query, c) - (1 - lambda) * max(sim(c, already picked))
+    keeping a running max-similarity vector, so a step is one matrix-vector product.
+
+    Returns:
+        Indices into `candidates`, in pick order.
+    """
+    count = len(candidates)
+    if count == 0 or k <= 0:
+        return []
+    relevance = candidates @ as_matrix([query])[0]
+    redundancy = np.full(count, -np.inf, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    picked: List[int] = []
+    for _ in range(min(k, count)):
+        penalty = np.where(np.isinf(redundancy), 0.0, redundancy)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * penalty
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, candidates @ candidates[best])
+    return picked
@@ -0,0 +1,164 @@
+import time, urllib.parse
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from core.config import settings
+from core.metrics import get_cache_stats
+from utils.bm25 import BM25Index
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL for caching: lower-case scheme and host, no default
+    port, no fragment, sorted query parameters and "/" for an empty path.
+    """
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "https"
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urllib.parse.urlencode(
+        sorted(urllib.parse.parse_qsl(parts.query, keep_blank_values=True))
+    )
+    return urllib.parse.urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+@dataclass
+class CachedPage:
+    url: str  # final URL after redirects
+    index: BM25Index  # the page's chunks with their term statistics
+    expires_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    size: int = field(init=False)
+
+    def __post_init__(self):
+        self.size = self.index.size
+
+    @property
+    def chunks(self) -> List[str]:
+        return self.index.documents
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires_at > time.monotonic()
+
+    def validators(self) -> Dict[str, str]:
+        """
+        Conditional request headers for revalidating this page.
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """
+    In-process LRU of crawled pages, holding the extracted markdown chunks (never
+    raw HTML) and their BM25 index, keyed by normalized URL and bounded by total
+    characters.
+
+    A fresh page is served without any request. An expired one keeps its chunks
+    and validators (ETag / Last-Modified) so the crawler can revalidate it with a
+    conditional GET; a 304 renews it without downloading or parsing the page.
+    Expired pages without validators are dropped.
+    """
+
+    def __init__(
+        self,
+        max_chars: int = settings.CRAWL_CACHE_MAX_CHARS,
+        default_ttl: int = settings.CRAWL_CACHE_TTL,
+        domain_ttls: Optional[Dict[str, int]] = None,
+    ):
+        self.max_chars = max_chars
+        self.default_ttl = default_ttl
+        self.domain_ttls = (
+            settings.CRAWL_CACHE_DOMAIN_TTLS if domain_ttls is None else domain_ttls
+        )
+        self.stats = get_cache_stats("crawl_page")
+        self._pages: "OrderedDict[str, CachedPage]" = OrderedDict()
+        self._chars = 0
+
+    def ttl_for(self, url: str) -> int:
+        """
+        TTL of the most specific matching domain override ("docs.python.org"
+        beats "python.org"), else the default.
+        """
+        host = (urllib.parse.urlsplit(url).hostname or "").lower()
+        labels = host.split(".")
+        for i in range(len(labels)):
+            ttl = self.domain_ttls.get(".".join(labels[i:]))
+            if ttl is not None:
+                return ttl
+        return self.default_ttl
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        """
+        Return the page for `url`, fresh or revalidatable, counting a hit only
+        for a fresh one (a stale page still costs a request).
+        """
+        key = normalize_url(url)
+        page = self._pages.get(key)
+        if page is None:
+            self.stats.record_miss()
+            return None
+        if page.fresh:
+            self._pages.move_to_end(key)
+            self.stats.record_hit()
+            return page
+        self.stats.record_miss()
+        if page.etag or page.last_modified:
+            return page
+        self._remove(key)
+        return None
+
+    def put(
+        self,
+        url: str,
+        page_url: str,
+        index: BM25Index,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> CachedPage:
+        key = normalize_url(url)
+        page = CachedPage(
+            url=page_url,
+            index=index,
+            expires_at=time.monotonic() + self.ttl_for(key),
+            etag=etag,
+            last_modified=last_modified,
+        )
+        if page.size > self.max_chars:
+            return page  # would evict everything else
+        self._remove(key)
+        self._pages[key] = page
+        self._chars += page.size
+        while self._chars > self.max_chars:
+            _, evicted = self._pages.popitem(last=False)
+            self._chars -= evicted.size
+            self.stats.record_eviction()
+        return page
+
+    def renew(self, url: str, page: CachedPage) -> CachedPage:
+        """
+        Mark a page fresh again after the origin answered 304 Not Modified.
+        """
+        key = normalize_url(url)
+        page.expires_at = time.monotonic() + self.ttl_for(key)
+        if key in self._pages:
+            self._pages.move_to_end(key)
+        return page
+
+    def _remove(self, key: str):
+        page = self._pages.pop(key, None)
+        if page is not None:
+            self._chars -= page.size
+
+
+# Create a singleton instance
+page_cache = PageCache()
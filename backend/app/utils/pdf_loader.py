@@ -0,0 +1,123 @@
+import asyncio, logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+from langchain_core.documents import Document
+from pypdf import PdfReader
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_ocr_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_ocr_pool() -> ProcessPoolExecutor:
+    global _ocr_pool
+    if _ocr_pool is None:
+        _ocr_pool = ProcessPoolExecutor(max_workers=settings.PDF_OCR_WORKERS)
+    return _ocr_pool
+
+
+def shutdown_ocr_pool() -> None:
+    global _ocr_pool
+    if _ocr_pool is not None:
+        _ocr_pool.shutdown(wait=False, cancel_futures=True)
+        _ocr_pool = None
+
+
+def extract_pages(file_path: str) -> List[Tuple[str, str]]:
+    """
+    Open the PDF once and pull the text layer of every page.
+
+    Returns:
+        (page text, page label) per page. Pages whose text layer is missing or
+        unreadable come back with empty text.
+    """
+    reader = PdfReader(file_path)
+    if reader.is_encrypted:
+        reader.decrypt("")  # most "protected" PDFs only lack an owner password
+    try:
+        labels = reader.page_labels
+    except Exception:
+        labels = []
+    pages = []
+    for number, page in enumerate(reader.pages):
+        try:
+            page_text = page.extract_text() or ""
+        except Exception as e:
+            logger.warning(f"Text extraction failed on page {number} of {file_path}: {e}")
+            page_text = ""
+        label = labels[number] if number < len(labels) else str(number + 1)
+        pages.append((page_text, label))
+    return pages
+
+
+def ocr_page(file_path: str, page_number: int, dpi: int) -> str:
+    """
+    Rasterize one page and OCR it. Runs in a worker process.
+    """
+    from pdf2image import convert_from_path
+    import unstructured_pytesseract
+
+    images = convert_from_path(
+        file_path, dpi=dpi, first_page=page_number + 1, last_page=page_number + 1
+    )
+    return "\n".join(unstructured_pytesseract.image_to_string(image) for image in images)
+
+
+def ocr_document(file_path: str) -> List[Document]:
+    """
+    OCR the whole file, for PDFs pypdf cannot open at all. Runs in a worker
+    process.
+    """
+    from langchain_community.document_loaders import UnstructuredPDFLoader
+
+    return UnstructuredPDFLoader(file_path, strategy="ocr_only").load()
+
+
+async def load_pdf(file_path: str) -> List[Document]:
+    """
+    Load a PDF as one Document per page (PyPDFLoader-compatible metadata).
+
+    The file is parsed a single time; only pages without a usable text layer
+    are OCR'd, in parallel across the OCR process pool, so mixed documents keep
+    their native text and fully scanned ones still get read.
+    """
+    try:
+        pages = await asyncio.to_thread(extract_pages, file_path)
+    except Exception as e:
+        # Unparseable structure: treat as scanned, as the OCR loader may still
+        # read the rendered pages
+        logger.warning(f"Could not parse {file_path}, falling back to OCR: {e}")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_ocr_pool(), ocr_document, file_path)
+    textless = [
+        number
+        for number, (page_text, _) in enumerate(pages)
+        if len(page_text.strip()) < settings.PDF_TEXT_MIN_CHARS
+    ]
+    texts = [page_text for page_text, _ in pages]
+    if textless:
+        loop = asyncio.get_running_loop()
+        pool = _get_ocr_pool()
+        results = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    pool, ocr_page, file_path, number, settings.PDF_OCR_DPI
+                )
+                for number in textless
+            ),
+            return_exceptions=True,
+        )
+        for number, result in zip(textless, results):
+            if isinstance(result, Exception):
+                logger.warning(f"OCR failed on page {number} of {file_path}: {result}")
+            elif len(result.strip()) > len(texts[number].strip()):
+                texts[number] = result
+    return [
+        Document(
+            page_content=page_text,
+            metadata={"source": file_path, "page": number, "page_label": label},
+        )
+        for number, (page_text, (_, label)) in enumerate(zip(texts, pages))
+        if page_text.strip()
+    ]
@@ -0,0 +1,129 @@
+import asyncio, logging, time
+from collections import OrderedDict
+from typing import Dict, List, Set, Tuple
+from langchain_openai import AzureOpenAIEmbeddings
+from core.config import settings
+from core.metrics import get_cache_stats
+
+logger = logging.getLogger(__name__)
+
+# (endpoint, deployment, dimensions)
+ClientKey = Tuple[str, str, int]
+# (endpoint, deployment, dimensions, normalized text)
+QueryKey = Tuple[str, str, int, str]
+
+
+class QueryEmbedder:
+    """
+    Front for query embeddings used by retrieval:
+
+    - LRU cache with TTL keyed by normalized text and deployment
+    - single-flight: concurrent identical queries share one pending result
+    - micro-batching: distinct queries arriving within `batch_window_ms` of each
+      other for the same deployment go upstream as one embeddings request
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.QUERY_EMBEDDING_CACHE_SIZE,
+        ttl_seconds: int = settings.QUERY_EMBEDDING_CACHE_TTL,
+        batch_window_ms: int = settings.QUERY_EMBEDDING_BATCH_WINDOW_MS,
+        max_batch: int = settings.QUERY_EMBEDDING_MAX_BATCH,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch = max_batch
+        self.stats = get_cache_stats("query_embedding")
+        self._cache: "OrderedDict[QueryKey, Tuple[float, List[float]]]" = OrderedDict()
+        self._inflight: Dict[QueryKey, asyncio.Future] = {}
+        self._pending: Dict[ClientKey, List[Tuple[QueryKey, asyncio.Future]]] = {}
+        self._clients: Dict[ClientKey, AzureOpenAIEmbeddings] = {}
+        self._tasks: Set[asyncio.Task] = set()  # keep flush tasks referenced
+
+    @staticmethod
+    def client_key(client: AzureOpenAIEmbeddings) -> ClientKey:
+        return (
+            client.azure_endpoint or "",
+            client.deployment or client.model,
+            client.dimensions or settings.EMBEDDING_DIMENSIONS,
+        )
+
+    async def embed(self, client: AzureOpenAIEmbeddings, text: str) -> List[float]:
+        client_key = self.client_key(client)
+        key: QueryKey = (*client_key, " ".join(text.split()))
+
+        cached = self._cache_get(key)
+        if cached is not None:
+            self.stats.record_hit()
+            return cached
+
+        future = self._inflight.get(key)
+        if future is not None:
+            # Same query already on its way upstream
+            self.stats.record_hit()
+            return await asyncio.shield(future)
+
+        self.stats.record_miss()
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self._clients[client_key] = client
+        queue = self._pending.setdefault(client_key, [])
+        queue.append((key, future))
+        if len(queue) >= self.max_batch:
+            self._start_flush(client_key)
+        elif len(queue) == 1:
+            asyncio.get_running_loop().call_later(
+                self.batch_window, self._start_flush, client_key
+            )
+        # Shield so one cancelled caller does not cancel the shared result
+        return await asyncio.shield(future)
+
+    def _start_flush(self, client_key: ClientKey):
+        batch = self._pending.pop(client_key, None)
+        if batch:
+            task = asyncio.create_task(self._flush(self._clients[client_key], batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _flush(
+        self,
+        client: AzureOpenAIEmbeddings,
+        batch: List[Tuple[QueryKey, asyncio.Future]],
+    ):
+        try:
+            embeddings = await client.aembed_documents([key[3] for key, _ in batch])
+        except Exception as e:
+            logger.error(f"Query embedding batch of {len(batch)} failed: {e}")
+            for key, future in batch:
+                self._inflight.pop(key, None)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (key, future), embedding in zip(batch, embeddings):
+            self._cache_put(key, embedding)
+            self._inflight.pop(key, None)
+            if not future.done():
+                future.set_result(embedding)
+
+    def _cache_get(self, key: QueryKey):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, embedding = entry
+        if expires_at <= time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return embedding
+
+    def _cache_put(self, key: QueryKey, embedding: List[float]):
+        self._cache[key] = (time.monotonic() + self.ttl_seconds, embedding)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+            self.stats.record_eviction()
+
+
+# Create a singleton instance
+query_embedder = QueryEmbedder()
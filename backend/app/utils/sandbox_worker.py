@@ -0,0 +1,57 @@
+"""
+Runner process of the code sandbox (see utils.code_sandbox).
+
+Started as a standalone script in isolated mode (it must not import the app),
+it imports the modules named on its command line, prints READY and blocks until
+one job arrives on stdin as a JSON line. It then applies the job's resource
+limits, runs the code with stderr merged into stdout and exits; a runner never
+takes a second job.
+"""
+
+import importlib, json, os, resource, sys, traceback
+
+READY = "SANDBOX_READY"
+
+
+def preimport(names):
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+
+
+def apply_limits(job: dict):
+    # RLIMIT_CPU counts the whole process, so the time spent on imports is
+    # added to the job's budget; past the soft limit SIGXCPU ends the job
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = int(usage.ru_utime + usage.ru_stime) + job["cpu_seconds"]
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    resource.setrlimit(resource.RLIMIT_AS, (job["memory_bytes"], job["memory_bytes"]))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (job["file_bytes"], job["file_bytes"]))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+def main():
+    preimport(sys.argv[1:])
+    print(READY, flush=True)
+    job = json.loads(sys.stdin.readline())
+    os.dup2(1, 2)
+    apply_limits(job)
+    # Packages may have been installed since this runner started
+    importlib.invalidate_caches()
+    namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+    try:
+        exec(compile(job["code"], "user_code.py", "exec"), namespace)
+    except SystemExit:
+        raise
+    except BaseException:
+        sys.stdout.flush()
+        exc_type, exc, tb = sys.exc_info()
+        # Leave this module's frame out, as if user_code.py had run directly
+        traceback.print_exception(exc_type, exc, tb.tb_next if tb else None)
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import codecs, csv, io
+from itertools import chain
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence
+from langchain_core.documents import Document
+from utils.upload_spool import decode_text
+
+TABULAR_EXTENSIONS = {".csv", ".xlsx"}
+DEFAULT_CHUNK_CHARS = 1200
+CELL_SEPARATOR = " | "
+SNIFF_BYTES = 64 * 1024
+# utf-8 error handler: bytes that are not valid utf-8 are read as latin-1, so a
+# file that only turns out to be legacy-encoded past the sniffed prefix still
+# loads (with its accented characters intact) instead of failing mid-way
+LATIN1_FALLBACK = "tabular_latin1_fallback"
+codecs.register_error(
+    LATIN1_FALLBACK,
+    lambda e: (e.object[e.start : e.end].decode("latin-1"), e.end),
+)
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    return " ".join(str(value).split())  # one physical line per row
+
+
+def _row_cells(values: Iterable) -> List[str]:
+    cells = [_cell(value) for value in values]
+    while cells and not cells[-1]:
+        cells.pop()  # trailing empty cells (ragged rows, formatted blank columns)
+    return cells
+
+
+def _header_cells(cells: Sequence[str]) -> List[str]:
+    return [cell or f"column_{i + 1}" for i, cell in enumerate(cells)]
+
+
+def _open_text(file_path: str, data: Optional[bytes] = None):
+    """
+    Open a text file (or in-memory bytes) as utf-8 (BOM tolerated), falling
+    back to latin-1, which decodes any byte sequence. Only the first
+    SNIFF_BYTES of a file pick the encoding; invalid bytes further into a utf-8
+    file are decoded as latin-1 one by one.
+    """
+    if data is not None:
+        return io.StringIO(decode_text(data), newline="")
+    try:
+        with open(file_path, encoding="utf-8-sig") as probe:
+            probe.read(SNIFF_BYTES)
+        return open(
+            file_path, encoding="utf-8-sig", errors=LATIN1_FALLBACK, newline=""
+        )
+    except UnicodeDecodeError:
+        return open(file_path, encoding="latin-1", newline="")
+
+
+def iter_csv_rows(
+    file_path: str, data: Optional[bytes] = None
+) -> Iterator[List[str]]:
+    with _open_text(file_path, data) as f:
+        sample = f.read(SNIFF_BYTES)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        for row in csv.reader(f, dialect):
+            yield _row_cells(row)
+
+
+def iter_xlsx_sheets(file_path: str, data: Optional[bytes] = None) -> Iterator[tuple]:
+    """
+    (sheet name, row iterator) per worksheet, streamed with openpyxl's read-only
+    mode so only the current row is held in memory.
+    """
+    from openpyxl import load_workbook
+
+    source = io.BytesIO(data) if data is not None else file_path
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            yield sheet.title, (
+                _row_cells(row) for row in sheet.iter_rows(values_only=True)
+            )
+    finally:
+        workbook.close()
+
+
+def iter_row_groups(
+    rows: Iterable[List[str]],
+    source: str,
+    sheet: Optional[str] = None,
+    max_chars: int = DEFAULT_CHUNK_CHARS,
+) -> Iterator[Document]:
+    """
+    Group consecutive whole rows into chunks of about `max_chars`, each prefixed
+    with the header row so it can be read (and retrieved) on its own.
+
+    The first non-empty row is the header. Row numbers in metadata are 1-based
+    positions in the source (header = its own row), e.g. {"rows": "2-41"}.
+    """
+    header: Optional[str] = None
+    group: List[str] = []
+    group_chars = 0
+    first_row = last_row = 0
+
+    def emit() -> Document:
+        metadata = {"source": source, "rows": f"{first_row}-{last_row}"}
+        if sheet is not None:
+            metadata["sheet"] = sheet
+        return Document(
+            page_content="\n".join(chain([header], group)), metadata=metadata
+        )
+
+    for number, cells in enumerate(rows, start=1):
+        if not cells:
+            continue
+        if header is None:
+            header = CELL_SEPARATOR.join(_header_cells(cells))
+            continue
+        line = CELL_SEPARATOR.join(cells)
+        if group and len(header) + group_chars + len(line) + 1 > max_chars:
+            yield emit()
+            group, group_chars = [], 0
+        if not group:
+            first_row = number
+        group.append(line)
+        group_chars += len(line) + 1
+        last_row = number
+    if group:
+        yield emit()
+    elif header is not None:
+        # Header-only table: still index the column names
+        first_row = last_row = 1
+        yield emit()
+
+
+def iter_table_documents(
+    file_path: str,
+    max_chars: int = DEFAULT_CHUNK_CHARS,
+    data: Optional[bytes] = None,
+) -> Iterator[Document]:
+    """
+    Stream a .csv / .xlsx file as header-prefixed row-group chunks. Memory stays
+    bounded by one chunk regardless of the file size. The iterator does blocking
+    file IO; consume it off the event loop.
+
+    Args:
+        file_path: Path on disk, or just the file name when `data` is given.
+        data: Content of a small upload held in memory.
+    """
+    if Path(file_path).suffix.lower() == ".csv":
+        rows = iter_csv_rows(file_path, data)
+        yield from iter_row_groups(rows, file_path, None, max_chars)
+        return
+    for sheet, rows in iter_xlsx_sheets(file_path, data):
+        yield from iter_row_groups(rows, file_path, sheet, max_chars)
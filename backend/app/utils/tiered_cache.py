@@ -0,0 +1,176 @@
+import asyncio, base64, logging, pickle, time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+from core.metrics import get_cache_stats
+from core.redis_cache import RedisCache
+
+logger = logging.getLogger(__name__)
+
+# (fresh until, stale until, value); wall-clock times so both tiers agree
+Entry = Tuple[float, float, Any]
+Loader = Callable[[], Awaitable[Any]]
+
+
+class TieredCache:
+    """
+    Two-tier TTL cache with stale-while-revalidate:
+
+    - tier 1: in-process LRU bounded by `max_entries`
+    - tier 2: Redis (base64 pickle), shared by every worker; optional, a Redis
+      failure only costs the lookup
+    - entries are fresh for `ttl` seconds, then served stale for `stale_ttl` more
+      while one background refresh replaces them
+    - single-flight: concurrent misses for a key share one loader call
+
+    Loader exceptions are never cached; they propagate to the caller on a miss
+    and are logged on a background refresh (the stale value stays in place).
+    """
+
+    def __init__(self, name: str, max_entries: int):
+        self.name = name
+        self.max_entries = max_entries
+        self.stats = get_cache_stats(name)
+        self.redis_stats = get_cache_stats(f"{name}:redis")
+        self._local: "OrderedDict[str, Entry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()  # keep refresh tasks referenced
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Loader,
+        ttl: int,
+        stale_ttl: int = 0,
+        cacheable: Callable[[Any], bool] = lambda value: value is not None,
+    ) -> Any:
+        """
+        Return the cached value for `key`, loading it with `loader` on a miss.
+
+        Args:
+            key: Normalized cache key.
+            loader: Coroutine factory producing the value.
+            ttl: Seconds a loaded value is fresh.
+            stale_ttl: Seconds after `ttl` a value is still served while refreshing.
+            cacheable: Values it rejects (e.g. error payloads) are returned uncached.
+        """
+        entry = self._local_get(key) or await self._redis_get(key)
+        if entry is not None:
+            fresh_until, _, value = entry
+            self.stats.record_hit()
+            if fresh_until <= time.time():
+                self._start_refresh(key, loader, ttl, stale_ttl, cacheable)
+            return value
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats.record_hit()
+            return await asyncio.shield(future)
+
+        self.stats.record_miss()
+        return await asyncio.shield(
+            self._load(key, loader, ttl, stale_ttl, cacheable)
+        )
+
+    async def invalidate(self, key: str):
+        self._local.pop(key, None)
+        try:
+            await RedisCache.get_connection().delete(self._redis_key(key))
+        except Exception as e:
+            logger.warning(f"{self.name}: Redis delete failed: {e}")
+
+    def _load(
+        self,
+        key: str,
+        loader: Loader,
+        ttl: int,
+        stale_ttl: int,
+        cacheable: Callable[[Any], bool],
+    ) -> asyncio.Future:
+        future = asyncio.ensure_future(
+            self._run_loader(key, loader, ttl, stale_ttl, cacheable)
+        )
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return future
+
+    async def _run_loader(
+        self,
+        key: str,
+        loader: Loader,
+        ttl: int,
+        stale_ttl: int,
+        cacheable: Callable[[Any], bool],
+    ) -> Any:
+        value = await loader()
+        if cacheable(value):
+            now = time.time()
+            entry: Entry = (now + ttl, now + ttl + stale_ttl, value)
+            self._local_put(key, entry)
+            await self._redis_put(key, entry)
+        return value
+
+    def _start_refresh(
+        self,
+        key: str,
+        loader: Loader,
+        ttl: int,
+        stale_ttl: int,
+        cacheable: Callable[[Any], bool],
+    ):
+        if key in self._inflight:
+            return
+        task = self._load(key, loader, ttl, stale_ttl, cacheable)
+        self._tasks.add(task)
+        task.add_done_callback(self._refresh_done)
+
+    def _refresh_done(self, task: asyncio.Future):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"{self.name}: background refresh failed: {task.exception()}")
+
+    def _local_get(self, key: str) -> Optional[Entry]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return entry
+
+    def _local_put(self, key: str, entry: Entry):
+        self._local[key] = entry
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+            self.stats.record_eviction()
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.name}:{key}"
+
+    async def _redis_get(self, key: str) -> Optional[Entry]:
+        try:
+            cached = await RedisCache.get_connection().get(self._redis_key(key))
+        except Exception as e:
+            logger.warning(f"{self.name}: Redis read failed: {e}")
+            return None
+        if cached is None:
+            self.redis_stats.record_miss()
+            return None
+        entry: Entry = pickle.loads(base64.b64decode(cached))
+        if entry[1] <= time.time():
+            self.redis_stats.record_miss()
+            return None
+        self.redis_stats.record_hit()
+        self._local_put(key, entry)
+        return entry
+
+    async def _redis_put(self, key: str, entry: Entry):
+        expire = max(int(entry[1] - time.time()), 1)
+        try:
+            encoded = base64.b64encode(pickle.dumps(entry)).decode("utf-8")
+            await RedisCache.get_connection().set(
+                self._redis_key(key), encoded, ex=expire
+            )
+        except Exception as e:
+            logger.warning(f"{self.name}: Redis write failed: {e}")
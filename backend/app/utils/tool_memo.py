@@ -0,0 +1,129 @@
+import functools, hashlib, json, logging, uuid
+from typing import Any, Optional
+from langchain.tools import BaseTool
+from core.config import settings
+from core.redis_cache import RedisCache
+from utils.tiered_cache import TieredCache
+
+logger = logging.getLogger(__name__)
+
+# Shared by every conversation; keys carry the chat id
+tool_memo = TieredCache("tool_memo", settings.TOOL_MEMO_CACHE_SIZE)
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    return value
+
+
+def memo_key(chat_id: str, epoch: str, tool_name: str, kwargs: dict) -> str:
+    """
+    (chat, file-set epoch, tool, arguments) with whitespace-normalized strings
+    and order-independent keyword arguments.
+    """
+    args = json.dumps(_normalize(kwargs), sort_keys=True, default=str)
+    digest = hashlib.sha256(args.encode("utf-8")).hexdigest()
+    return f"{chat_id}:{epoch}:{tool_name}:{digest}"
+
+
+def _epoch_key(chat_id: str) -> str:
+    return f"tool_memo:epoch:{chat_id}"
+
+
+async def _chat_epoch(chat_id: str) -> Optional[str]:
+    """
+    Current memo generation of a chat ("0" until its files first change), or
+    None when Redis cannot tell (callers then skip the memo, since another
+    worker may have invalidated it).
+    """
+    try:
+        epoch = await RedisCache.get_connection().get(_epoch_key(chat_id))
+    except Exception as e:
+        logger.warning(f"tool_memo: Redis read failed: {e}")
+        return None
+    return epoch or "0"
+
+
+async def forget_chat(chat_id: uuid.UUID | str):
+    """
+    Drop every memoized tool result of a chat, e.g. after its files changed.
+    Entries are not deleted; the chat moves to a new, never reused epoch and
+    old keys age out.
+    """
+    try:
+        # A random token rather than a counter: once the key expires, counting
+        # would restart and revive entries written under an earlier epoch.
+        # The key outlives every entry of the previous epoch, so falling back
+        # to "0" on expiry cannot revive anything either.
+        await RedisCache.get_connection().set(
+            _epoch_key(str(chat_id)), uuid.uuid4().hex, ex=settings.TOOL_MEMO_TTL
+        )
+    except Exception as e:
+        logger.warning(f"tool_memo: failed to invalidate chat {chat_id}: {e}")
+
+
+def is_cacheable_result(value: Any) -> bool:
+    """
+    Everything but empty results and the tools' error payloads
+    ({"error": ...} or [{"error": ...}]).
+    """
+    if value is None:
+        return False
+    if isinstance(value, (str, list, tuple, dict)) and not value:
+        return False
+    if isinstance(value, dict):
+        return "error" not in value
+    if isinstance(value, list) and isinstance(value[0], dict):
+        return "error" not in value[0]
+    return True
+
+
+def memoize_tool(tool: BaseTool) -> BaseTool:
+    """
+    Serve repeated calls of `tool` with the same arguments in the same chat from
+    the memo for TOOL_MEMO_TTL seconds. Concurrent identical calls share one run.
+
+    Tools configure this through their metadata:
+    - "memoize": False opts out (anything time-dependent or with side effects)
+    - "memo_state": injected state fields the result depends on, added to the key
+    - "memo_cacheable": predicate a result must also pass to be stored
+    Calls without a chat in their injected state always run.
+    """
+    metadata = tool.metadata or {}
+    if metadata.get("memoize") is False or tool.coroutine is None:
+        return tool
+    coroutine = tool.coroutine
+    state_fields = metadata.get("memo_state", ())
+    tool_cacheable = metadata.get("memo_cacheable")
+
+    def cacheable(value: Any) -> bool:
+        return is_cacheable_result(value) and (
+            tool_cacheable is None or tool_cacheable(value)
+        )
+
+    @functools.wraps(coroutine)
+    async def memoized(*args, **kwargs):
+        state = kwargs.get("state")
+        chat_id = state.get("chat_id") if isinstance(state, dict) else None
+        if args or not chat_id:
+            return await coroutine(*args, **kwargs)
+        epoch = await _chat_epoch(str(chat_id))
+        if epoch is None:
+            return await coroutine(*args, **kwargs)
+        arguments = {name: value for name, value in kwargs.items() if name != "state"}
+        arguments.update({f"state.{name}": state.get(name) for name in state_fields})
+        key = memo_key(str(chat_id), epoch, tool.name, arguments)
+        return await tool_memo.get_or_load(
+            key,
+            lambda: coroutine(*args, **kwargs),
+            ttl=settings.TOOL_MEMO_TTL,
+            cacheable=cacheable,
+        )
+
+    tool.coroutine = memoized
+    return tool
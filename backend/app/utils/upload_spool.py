@@ -0,0 +1,96 @@
+import asyncio, hashlib, io, os, shutil, tempfile, uuid
+from pathlib import Path
+from typing import Optional
+import aiofiles
+from core.config import settings
+
+
+def decode_text(data: bytes) -> str:
+    """
+    utf-8 (BOM tolerated), falling back to latin-1, which decodes any byte sequence.
+    """
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("latin-1")
+
+
+class SpooledUpload:
+    """
+    Upload body kept in memory up to `max_memory` bytes and spilled to a temp
+    file beyond that. The sha256 digest is computed while the bytes stream in,
+    so deduplication never re-reads the content.
+    """
+
+    def __init__(
+        self, file_name: str, max_memory: int = settings.UPLOAD_SPOOL_MAX_BYTES
+    ):
+        self.file_name = Path(file_name).name  # never a client-supplied directory
+        self.suffix = Path(file_name).suffix.lower()
+        self.max_memory = max_memory
+        self.size = 0
+        self.path: Optional[str] = None  # set once the content is on disk
+        self._sha256 = hashlib.sha256()
+        self._buffer: Optional[io.BytesIO] = io.BytesIO()
+        self._file = None
+        self._temp_dir: Optional[str] = None
+
+    @property
+    def digest(self) -> str:
+        return self._sha256.hexdigest()
+
+    @property
+    def in_memory(self) -> bool:
+        return self._buffer is not None
+
+    def getvalue(self) -> bytes:
+        if self._buffer is None:
+            raise RuntimeError("Upload was spilled to disk; use as_path()")
+        return self._buffer.getvalue()
+
+    def text(self) -> str:
+        return decode_text(self.getvalue())
+
+    async def write(self, chunk: bytes) -> None:
+        self._sha256.update(chunk)
+        self.size += len(chunk)
+        if self._buffer is not None and self.size > self.max_memory:
+            await self._spill()
+        if self._file is not None:
+            await self._file.write(chunk)
+        else:
+            self._buffer.write(chunk)
+
+    async def finish(self) -> None:
+        """
+        Close the disk file (if any) once the whole body has been written.
+        """
+        if self._file is not None:
+            await self._file.close()
+            self._file = None
+
+    async def as_path(self) -> str:
+        """
+        Path of the content on disk, writing the in-memory buffer out first when
+        a parser can only read from a file.
+        """
+        if self.path is None:
+            await self._spill()
+            await self.finish()
+        return self.path
+
+    async def cleanup(self) -> None:
+        await self.finish()
+        self._buffer = None
+        if self._temp_dir is not None:
+            # rmtree is blocking filesystem work; keep it off the event loop
+            await asyncio.to_thread(shutil.rmtree, self._temp_dir, True)
+            self._temp_dir = None
+
+    async def _spill(self) -> None:
+        self._temp_dir = await asyncio.to_thread(tempfile.mkdtemp)
+        # Keep the original name: loaders pick the parser from the extension
+        self.path = os.path.join(self._temp_dir, f"{uuid.uuid4()}_{self.file_name}")
+        self._file = await aiofiles.open(self.path, "wb")
+        await self._file.write(self._buffer.getvalue())
+        self._buffer = None
@@ -1,18 +1,34 @@
-from typing import Dict, Optional, List
-import logging, re, urllib.parse, asyncio
+from typing import Dict, Optional, List, Tuple
+import logging, re, urllib.parse, asyncio, hashlib
 from pydantic import BaseModel, Field
 from curl_cffi import ProxySpec
-from bs4 import BeautifulSoup, Tag
+from curl_cffi.requests import AsyncSession
 from typing_extensions import Annotated
 from langgraph.prebuilt import InjectedState
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from core.config import settings
 from core.curl_cffi_session_manager import CurlCFFIAsyncSession
 from repositories.websocket_manager import ws_manager
+from utils.bm25 import BM25Index
+from utils.crawl_limiter import crawl_limiter
+from utils.html_extract import (
+    extract_markdown,
+    extract_page_chunks,
+    extract_search_results,
+)
+from utils.page_cache import page_cache
+from utils.tiered_cache import TieredCache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Starts the one-item list a crawl result holds for a URL that failed
+CRAWL_FAILURE_PREFIX = "Failed to scrap"
+
+# Shared by every WebSearchService instance
+search_cache = TieredCache("web_search", settings.WEB_SEARCH_CACHE_SIZE)
+
+
 class CrawlUrlListInput(BaseModel):
     url_list: List[str]
     query: Optional[str]
@@ -45,10 +61,9 @@ class WebSearchService:
             "Host": "html.duckduckgo.com",
         }
         self.proxies: ProxySpec = {}
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=800,
-            chunk_overlap=100,
-        )
+        # Splitting of crawled markdown, done next to parsing in the HTML workers
+        self.chunk_size = 800
+        self.chunk_overlap = 100
 
     async def search(
         self,
@@ -71,14 +86,8 @@ class WebSearchService:
             Optional[list]: A list of dictionaries containing the search result's title, URL, and description,
                             or None if the search fails.
         """
-        search_result = []
-        params = {
-            "q": query,  # + " site:febbox.com"
-            "kl": region,
-            "df": latest_by,  # d for day, w for week, m for month, y for year
-            # "filter": 0  # uncomment if needed
-        }
-        search_url = self.baseurl + "/?" + urllib.parse.urlencode(params)
+        latest_by = latest_by.strip().lower()
+        region = region.strip().lower()
         try:
             if state:
                 await ws_manager.send_to_user(
@@ -89,55 +98,28 @@ class WebSearchService:
                         "content": "Initiating web search...",
                     },
                 )
-            async with CurlCFFIAsyncSession.get_session() as ssn:
-                request = await ssn.get(
-                    search_url,
-                    headers=self.headers,
-                    impersonate="chrome",
-                    proxies=self.proxies,
-                )  # type: ignore
-                if request.status_code == 200:
-                    response = request.text
-                    soup = BeautifulSoup(response, "html.parser")
-                    results = soup.find_all("div", {"class": "web-result"})
-                    for result in results:
-                        if isinstance(result, Tag):  # Check if result is a Tag object
-                            title = result.find("a", {"class": "result__a"})
-                            url = result.find("a", {"class": "result__url"})
-                            description = result.find("a", {"class": "result__snippet"})
-                            if title and url and description:
-                                search_result.append(
-                                    {
-                                        "title": title.text.strip(),
-                                        "url": url.text.strip(),
-                                        "description": description.text.strip(),
-                                    }
-                                )
-                        else:
-                            raise TypeError(
-                                f"Expected a Tag object, but got {type(result)}"
-                            )
-
-                    if search_result:
-                        if state:
-                            await ws_manager.send_to_user(
-                                sid=state["user_id"],
-                                message_type="ToolProcess",
-                                data={
-                                    "chat_id": state["chat_id"],
-                                    "content": "Retrieved a few relevant search results...",
-                                },
-                            )
-                        return search_result
-                else:
-                    logger.error(
-                        f"Failed to search for {query}. Status code: {request.status_code}"
+            ttl = settings.WEB_SEARCH_CACHE_TTLS.get(
+                latest_by, settings.WEB_SEARCH_CACHE_TTLS.get("", 3600)
+            )
+            search_result = await search_cache.get_or_load(
+                self.search_cache_key(query, region, latest_by),
+                lambda: self._fetch_search_results(query, region, latest_by),
+                ttl=ttl,
+                stale_ttl=int(ttl * settings.WEB_SEARCH_STALE_FACTOR),
+                cacheable=lambda results: bool(results) and "error" not in results[0],
+            )
+            if search_result and "error" not in search_result[0]:
+                if state:
+                    await ws_manager.send_to_user(
+                        sid=state["user_id"],
+                        message_type="ToolProcess",
+                        data={
+                            "chat_id": state["chat_id"],
+                            "content": "Retrieved a few relevant search results...",
+                        },
                     )
-                    return [
-                        {
-                            "error": f"Failed to search for {query}. Status code: {request.status_code}. Try again later."
-                        }
-                    ]
+                return search_result
+            return search_result or None
         except Exception as e:
             logger.exception(f"An error occurred while searching for {query} : {e}")
             return [
@@ -146,6 +128,50 @@ class WebSearchService:
                 }
             ]
 
+    @staticmethod
+    def search_cache_key(query: str, region: str, latest_by: str) -> str:
+        """
+        Cache key of a search: case- and whitespace-insensitive query plus filters.
+        """
+        normalized = " ".join(query.lower().split())
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        return f"{latest_by or '-'}:{region or '-'}:{digest}"
+
+    async def _fetch_search_results(
+        self, query: str, region: str, latest_by: str
+    ) -> list:
+        """
+        Scrape one DuckDuckGo results page.
+
+        Returns:
+            The parsed results, [] if the page had none, or a one-item error list
+            for a non-200 response (never cached).
+        """
+        params = {
+            "q": query,  # + " site:febbox.com"
+            "kl": region,
+            "df": latest_by,  # d for day, w for week, m for month, y for year
+            # "filter": 0  # uncomment if needed
+        }
+        search_url = self.baseurl + "/?" + urllib.parse.urlencode(params)
+        async with CurlCFFIAsyncSession.get_session() as ssn:
+            request = await ssn.get(
+                search_url,
+                headers=self.headers,
+                impersonate="chrome",
+                proxies=self.proxies,
+            )  # type: ignore
+            if request.status_code != 200:
+                logger.error(
+                    f"Failed to search for {query}. Status code: {request.status_code}"
+                )
+                return [
+                    {
+                        "error": f"Failed to search for {query}. Status code: {request.status_code}. Try again later."
+                    }
+                ]
+            return await extract_search_results(request.text)
+
     async def crawl_url_list(
         self, url_list: list[str], query: Optional[str], state: Optional[dict] = None
     ) -> Optional[Dict[str, list[str]]]:
@@ -155,12 +181,13 @@ class WebSearchService:
 
         Args:
             url_list (list[str]): A list of URLs to be crawled.
-            query (str): The search query keywords which will be used to get relevent (simple keyword match) content from crawled data. Try to keep as much relevant keywords as possible in the query to get better results.
+            query (str): The search query keywords which will be used to rank the crawled content by relevance (BM25) and keep only the best chunks of each page. Try to keep as much relevant keywords as possible in the query to get better results.
 
         Returns:
-            Optional[Dict[str, str]]: A dictionary with the crawled content, or None if an error occurred
+            Optional[Dict[str, str]]: A dictionary from each requested URL to its crawled content; a URL that could not be crawled maps to a one-item list describing the failure
         """
         scrap_result = {}
+        urls = list(dict.fromkeys(url_list))
         try:
             if state:
                 await ws_manager.send_to_user(
@@ -168,77 +195,55 @@ class WebSearchService:
                     message_type="ToolProcess",
                     data={
                         "chat_id": state["chat_id"],
-                        "content": "Crawling " + str(len(url_list)) + " Page" + "s"
-                        if len(url_list) > 1
-                        else "" + "...",
+                        "content": f"Crawling {len(urls)} Page"
+                        + ("s" if len(urls) > 1 else "")
+                        + "...",
                     },
                 )
+            user_query = ""
+            if state:
+                user_query = query if query else state["user_input"]
             async with CurlCFFIAsyncSession.get_session() as s:
-                tasks = []
-                for url in url_list:
-                    header = {
-                        "Host": url.replace("https://", "")
-                        .replace("http://", "")
-                        .partition("/")[
-                            0
-                        ],  # hostname from the URL (str.split('/)[0] can be slower if the url has many seperators so used partition())
-                        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-                        "Accept-Language": "en-US,en;q=0.5",
-                        "Accept-Encoding": "gzip, deflate, br, zstd",
-                        "Referer": "https://html.duckduckgo.com/",
-                        "DNT": "1",
-                        "Sec-GPC": "1",
-                        "Connection": "keep-alive",
-                        "Upgrade-Insecure-Requests": "1",
-                        "Sec-Fetch-Dest": "document",
-                        "Sec-Fetch-Mode": "navigate",
-                        "Sec-Fetch-Site": "cross-site",
-                        "Sec-Fetch-User": "?1",
-                        "Priority": "u=0, i",
-                        "sec-ch-ua": '"Not A;Brand";v="99", "Chromium";v="124", "Google Chrome";v="124"',
-                        "sec-ch-ua-mobile": "?0",
-                        "sec-ch-ua-platform": '"Windows"',
-                    }
-                    task = s.get(
-                        url, headers=header, impersonate="chrome", proxies=self.proxies
+                tasks = {
+                    asyncio.create_task(self._crawl_url(s, url, state)): url
+                    for url in urls
+                }
+                try:
+                    # The deadline bounds the whole call; pages finished by then
+                    # are all kept, whatever their order
+                    pending = set()
+                    if tasks:
+                        _, pending = await asyncio.wait(
+                            tasks, timeout=settings.CRAWL_DEADLINE
+                        )
+                finally:
+                    for task in tasks:
+                        if not task.done():
+                            task.cancel()
+                if pending:
+                    logger.warning(
+                        f"Crawl deadline of {settings.CRAWL_DEADLINE}s reached for {url_list}"
                     )
-                    tasks.append(task)
-                results = await asyncio.gather(*tasks)
-                for result in results:
-                    if result.status_code == 200:
-                        user_query = ""
-                        if state:
-                            user_query = query if query else state["user_input"]
-                            await ws_manager.send_to_user(
-                                sid=state["user_id"],
-                                message_type="ToolProcess",
-                                data={
-                                    "chat_id": state["chat_id"],
-                                    "content": f"Summarizing content from {result.url}...",
-                                },
-                            )
-                        markdown = self.markdown_html_content(result.text, result.url)
-                        chunks = self.text_splitter.split_text(markdown)
-                        if user_query:
-                            # Filter top 10 related chunks based on the user's query (simple keyword match)
-                            chunks = [
-                                chunk
-                                for chunk in chunks
-                                if any(
-                                    word in chunk.lower()
-                                    for word in user_query.lower().split()
-                                )
-                            ][:10]
-                        scrap_result[result.url] = chunks
-                    else:
-                        logger.error(
-                            f"Failed to scrap {result.url}. Status code: {result.status_code}"
+                # Keyed by the requested URL, in request order, so every input
+                # has exactly one entry even when several redirect to one page
+                for task, url in tasks.items():
+                    if task in pending:
+                        scrap_result[url] = self.crawl_failure(
+                            url, "no response within the crawl deadline"
+                        )
+                        continue
+                    _, _, index, error = task.result()
+                    if error:
+                        scrap_result[url] = self.crawl_failure(url, error)
+                    elif user_query:
+                        # Most relevant chunks by BM25, within the page budget
+                        scrap_result[url] = index.top(
+                            user_query,
+                            settings.CRAWL_TOP_CHUNKS,
+                            settings.CRAWL_PAGE_MAX_CHARS,
                         )
-                        return {
-                            "error": [
-                                f"Failed to scrap {result.url}. Status code: {result.status_code}. Try again later."
-                            ]
-                        }
+                    else:
+                        scrap_result[url] = index.documents
 
                 if state:
                     await ws_manager.send_to_user(
@@ -254,13 +259,179 @@ class WebSearchService:
             logger.exception(f"Failed to scrap {url_list}: {e}")
             return {"error": [f"Failed to scrap {url_list}. Try again later."]}
 
+    @staticmethod
+    def crawl_failure(url: str, reason: str) -> List[str]:
+        return [f"{CRAWL_FAILURE_PREFIX} {url}: {reason}. Try again later."]
+
+    @staticmethod
+    def is_complete_crawl(result) -> bool:
+        """
+        True if every URL of a crawl_url_list result was crawled; failures are
+        often transient, so only complete results are worth memoizing.
+        """
+        return isinstance(result, dict) and not any(
+            isinstance(value, list)
+            and len(value) == 1
+            and isinstance(value[0], str)
+            and value[0].startswith(CRAWL_FAILURE_PREFIX)
+            for value in result.values()
+        )
+
+    async def _crawl_url(
+        self, s: AsyncSession, url: str, state: Optional[dict]
+    ) -> Tuple[str, str, Optional[BM25Index], Optional[str]]:
+        """
+        Crawl one page within CRAWL_URL_TIMEOUT, turning every failure into a
+        result so one bad URL never discards the others.
+
+        Returns:
+            (requested URL, page URL, page index, error message or None)
+        """
+        try:
+            async with asyncio.timeout(settings.CRAWL_URL_TIMEOUT):
+                status_code, page_url, index = await self._crawl_page(s, url, state)
+        except TimeoutError:
+            logger.error(f"Failed to scrap {url}. Timed out")
+            return url, url, None, f"timed out after {settings.CRAWL_URL_TIMEOUT}s"
+        except Exception as e:
+            logger.error(f"Failed to scrap {url}: {e}")
+            return url, url, None, str(e)
+        if status_code != 200:
+            logger.error(f"Failed to scrap {page_url}. Status code: {status_code}")
+            return url, page_url, None, f"status code {status_code}"
+        return url, page_url, index, None
+
+    @staticmethod
+    def crawl_headers(url: str) -> Dict[str, str]:
+        return {
+            "Host": url.replace("https://", "")
+            .replace("http://", "")
+            .partition("/")[
+                0
+            ],  # hostname from the URL (str.split('/)[0] can be slower if the url has many seperators so used partition())
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "en-US,en;q=0.5",
+            "Accept-Encoding": "gzip, deflate, br, zstd",
+            "Referer": "https://html.duckduckgo.com/",
+            "DNT": "1",
+            "Sec-GPC": "1",
+            "Connection": "keep-alive",
+            "Upgrade-Insecure-Requests": "1",
+            "Sec-Fetch-Dest": "document",
+            "Sec-Fetch-Mode": "navigate",
+            "Sec-Fetch-Site": "cross-site",
+            "Sec-Fetch-User": "?1",
+            "Priority": "u=0, i",
+            "sec-ch-ua": '"Not A;Brand";v="99", "Chromium";v="124", "Google Chrome";v="124"',
+            "sec-ch-ua-mobile": "?0",
+            "sec-ch-ua-platform": '"Windows"',
+        }
+
+    async def _crawl_page(
+        self, s: AsyncSession, url: str, state: Optional[dict]
+    ) -> Tuple[int, str, Optional[BM25Index]]:
+        """
+        Get the markdown chunks of one page, from the page cache when it is fresh
+        or the origin confirms it unchanged (304), else by downloading and
+        converting it.
+
+        Returns:
+            (status code, page URL, BM25 index over all chunks of the page)
+        """
+        cached = page_cache.get(url)
+        if cached is not None and cached.fresh:
+            return 200, cached.url, cached.index
+        header = self.crawl_headers(url)
+        if cached is not None:
+            header.update(cached.validators())
+        async with crawl_limiter.slot(url):
+            async with s.stream(
+                "GET",
+                url,
+                headers=header,
+                impersonate="chrome",
+                proxies=self.proxies,
+                timeout=settings.CRAWL_URL_TIMEOUT,
+            ) as result:
+                if result.status_code != 200:
+                    self._abort_stream(result)
+                    if result.status_code == 304 and cached is not None:
+                        page = page_cache.renew(url, cached)
+                        return 200, page.url, page.index
+                    return result.status_code, result.url, None
+                content_type = (
+                    result.headers.get("Content-Type", "").partition(";")[0].strip()
+                ).lower()
+                if content_type and content_type not in settings.CRAWL_CONTENT_TYPES:
+                    # Decided on headers alone; the body is never downloaded
+                    self._abort_stream(result)
+                    raise ValueError(f"unsupported content type {content_type}")
+                try:
+                    body = await self._read_capped(result, settings.CRAWL_MAX_BYTES)
+                except BaseException:
+                    # Also on cancellation (per-URL timeout, crawl deadline):
+                    # closing the stream alone lets curl finish the download
+                    self._abort_stream(result)
+                    raise
+        if state:
+            await ws_manager.send_to_user(
+                sid=state["user_id"],
+                message_type="ToolProcess",
+                data={
+                    "chat_id": state["chat_id"],
+                    "content": f"Summarizing content from {result.url}...",
+                },
+            )
+        encoding = result.charset_encoding or "utf-8"
+        try:
+            html = body.decode(encoding, errors="replace")
+        except LookupError:
+            html = body.decode("utf-8", errors="replace")
+        chunks = await extract_page_chunks(
+            html, result.url, self.chunk_size, self.chunk_overlap
+        )
+        # Tokenized once here; every later query on this page reuses it
+        index = await asyncio.to_thread(BM25Index, chunks)
+        page_cache.put(
+            url,
+            result.url,
+            index,
+            etag=result.headers.get("ETag"),
+            last_modified=result.headers.get("Last-Modified"),
+        )
+        return 200, result.url, index
+
+    @staticmethod
+    def _abort_stream(response) -> None:
+        """
+        Make curl drop the transfer at its next write instead of finishing it.
+        """
+        if response.quit_now is not None:
+            response.quit_now.set()
+
+    async def _read_capped(self, response, max_bytes: int) -> bytes:
+        """
+        Read a streamed body up to `max_bytes`, then stop the download. A
+        truncated page is still converted: what fits is usually the useful part.
+        """
+        parts: List[bytes] = []
+        size = 0
+        async for part in response.aiter_content():
+            parts.append(part)
+            size += len(part)
+            if size >= max_bytes:
+                logger.info(f"Truncated {response.url} at {max_bytes} bytes")
+                self._abort_stream(response)
+                break
+        return b"".join(parts)[:max_bytes]
+
     def markdown_html_content(self, html_content, page_url):
         """
         Convert HTML content to a Markdown-formatted string.
 
-        This method extracts the title, main content from the <body>, and
-        navigation links from <a> tags within the provided HTML content and
-        formats them as a Markdown string.
+        Extracts the title and the main content of the page, dropping navigation,
+        headers, footers and sidebars, plus the links found inside the main
+        content. Blocking: async callers should use `extract_page_chunks`.
 
         Args:
             html_content: The raw HTML content of the page.
@@ -268,47 +439,6 @@ class WebSearchService:
 
         Returns:
             A Markdown-formatted string containing the title, page URL,
-            main text content, and navigation links.
-        """
-
-        # Parse the HTML content
-        soup = BeautifulSoup(html_content, "html.parser")
-
-        # Remove unnecessary sections
-        for tag in soup(
-            ["script", "style", "nav", "footer", "header", "form", "aside"]
-        ):
-            tag.decompose()
-
-        # Extract the title
-        title = soup.title.string if soup.title else "No Title Found"
-
-        # Extract main text content (from <body>)
-        main_content = ""
-        main_section = soup.find("body")
-        if main_section:
-            main_content = " ".join(main_section.stripped_strings)
-        else:
-            main_content = "No Main Content Found"
-
-        # Extract navigation links (from <a> tags)
-        links = []
-        for a_tag in soup.find_all("a", href=True):
-            if isinstance(a_tag, Tag):
-                link_text = a_tag.get_text(strip=True)
-                link_href = a_tag["href"]
-                if link_text:
-                    links.append(f"- [{link_text}]({link_href})")
-
-        # Format the extracted data as Markdown
-        markdown_output = f"""
-    ## Title:**{title}**
-
-    ## Page URL:{page_url}
-
-    ## Main Content:{main_content}
-
-    ## Navigation Links
-    {chr(10).join(links)}
+            main text content, and in-content links.
         """
-        return markdown_output
+        return extract_markdown(html_content, page_url)